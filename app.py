@@ -1,20 +1,38 @@
 import streamlit as st
 import pandas as pd
-from src.data_preprocessing import load_data, preprocess_data, feature_engineering
+from src.snapshot import load_or_build_snapshot, snapshot_key
+from src.cache import ResultCache
 from src.recommendation_point import recommend_meeting_place_random_checkins
-from src.recommendation_unvisisted import recommend_similar_category_locations
-from src.similarity import compute_user_profile, compute_user_similarity, find_top_similar_users
+from src.spatial_index import VenueIndex
+from src.recommendation_unvisisted import recommend_similar_category_locations, build_category_index
+from src.similarity import compute_user_profile, compute_top_k_similarity, find_top_similar_users
 
 # Load and preprocess data (cached for performance)
 @st.cache_data
 def load_and_prepare_data():
-    raw_data = load_data("data/dataset_NYC.txt")
-    cleaned_data = preprocess_data(raw_data)
-    processed_data = feature_engineering(cleaned_data,'data/categories.csv')
-    user_profiles = compute_user_profile(processed_data)
-    user_similarity_df = compute_user_similarity(user_profiles)
+    processed_data = load_or_build_snapshot("data/dataset_NYC.txt", 'data/categories.csv')
+    user_profiles = compute_user_profile(processed_data, sparse=True)
+    # Keep only the top neighbours per user instead of the dense N x N matrix
+    user_similarity_df = compute_top_k_similarity(user_profiles, k=50)
     return processed_data, user_profiles, user_similarity_df
 
+# Build the venue spatial index once per session (not hashable, so cached as a resource)
+@st.cache_resource
+def load_venue_index():
+    processed_data, _, _ = load_and_prepare_data()
+    return VenueIndex(processed_data)
+
+# Build the category query index once per session
+@st.cache_resource
+def load_category_index():
+    processed_data, _, _ = load_and_prepare_data()
+    return build_category_index(processed_data)
+
+# Results of repeated queries, shared across sessions and tied to the data version
+@st.cache_resource
+def load_result_cache():
+    return ResultCache(version=snapshot_key("data/dataset_NYC.txt", 'data/categories.csv'))
+
 # Main Streamlit app
 def main():
     st.title("Location Recommendation System")
@@ -22,6 +40,9 @@ def main():
     
     # Load data
     processed_data, user_profiles, user_similarity_df = load_and_prepare_data()
+    venue_index = load_venue_index()
+    category_index = load_category_index()
+    result_cache = load_result_cache()
     
     # Menu options
     option = st.sidebar.selectbox(
@@ -36,7 +57,8 @@ def main():
         top_k = st.slider("Number of Recommendations:", 1, 20, 10)
 
         if st.button("Get Recommendations"):
-            recommendations = recommend_similar_category_locations(user_id, category_name, processed_data, top_k)
+            recommendations = recommend_similar_category_locations(user_id, category_name, processed_data, top_k,
+                                                                   index=category_index, cache=result_cache)
             st.write("Recommended Locations:")
             st.dataframe(recommendations)
 
@@ -46,7 +68,7 @@ def main():
         top_n = st.slider("Number of Similar Users:", 1, 20, 10)
 
         if st.button("Find Similar Users"):
-            similar_users = find_top_similar_users(user_id, user_similarity_df, top_n)
+            similar_users = find_top_similar_users(user_id, user_similarity_df, top_n, cache=result_cache)
             st.write("Top Similar Users:")
             st.dataframe(similar_users)
 
@@ -56,7 +78,7 @@ def main():
         user_ids = [uid.strip() for uid in user_ids.split(",")]
 
         if st.button("Get Meeting Place"):
-            selected_checkins, nearest_venues = recommend_meeting_place_random_checkins(user_ids, processed_data, k=1)
+            selected_checkins, nearest_venues = recommend_meeting_place_random_checkins(user_ids, processed_data, k=1, venue_index=venue_index)
             st.write("Recommended Meeting Place:")
             st.dataframe(nearest_venues)
 
@@ -0,0 +1,91 @@
+"""
+Benchmark the per-row feature engineering steps against their vectorized replacements.
+
+Usage:
+    python benchmarks/bench_feature_engineering.py [n_rows ...]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from haversine import haversine, Unit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.data_preprocessing import DAY_NAMES, HOUR_TO_TIME_BUCKET
+from src.utils import haversine_km
+
+
+def make_rows(n_rows, seed=0):
+    """Random check-in rows around NYC with the columns the geo/time steps read."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Latitude': (40.7 + rng.normal(0, 0.1, n_rows)).astype('float32'),
+        'Longitude': (-74.0 + rng.normal(0, 0.1, n_rows)).astype('float32'),
+        'Avg_Latitude': (40.7 + rng.normal(0, 0.05, n_rows)).astype('float32'),
+        'Avg_Longitude': (-74.0 + rng.normal(0, 0.05, n_rows)).astype('float32'),
+        'Local_Time': pd.Timestamp('2012-04-03') + pd.to_timedelta(rng.integers(0, 300 * 86400, n_rows), unit='s'),
+    })
+
+
+def time_bucket(hour):
+    if 5 <= hour < 12:
+        return 'Morning'
+    elif 12 <= hour < 17:
+        return 'Afternoon'
+    elif 17 <= hour < 21:
+        return 'Evening'
+    else:
+        return 'Night'
+
+
+def row_wise(data):
+    """The original implementation: one Python call per check-in."""
+    distance = data.apply(
+        lambda row: haversine(
+            (row['Avg_Latitude'], row['Avg_Longitude']),
+            (row['Latitude'], row['Longitude']),
+            unit=Unit.KILOMETERS
+        ), axis=1
+    )
+    hour = data['Local_Time'].dt.hour
+    bucket = hour.apply(time_bucket)
+    day = data['Local_Time'].dt.day_name()
+    return distance.to_numpy(), bucket.to_numpy(), day.to_numpy()
+
+
+def vectorized(data):
+    """Array kernels and lookup tables, no Python per row."""
+    distance = haversine_km(
+        data['Avg_Latitude'].to_numpy(), data['Avg_Longitude'].to_numpy(),
+        data['Latitude'].to_numpy(), data['Longitude'].to_numpy()
+    )
+    bucket = HOUR_TO_TIME_BUCKET[data['Local_Time'].dt.hour.to_numpy()]
+    day = DAY_NAMES[data['Local_Time'].dt.dayofweek.to_numpy()]
+    return distance, bucket, day
+
+
+def timed(fn, data):
+    start = time.perf_counter()
+    result = fn(data)
+    return result, time.perf_counter() - start
+
+
+def main(sizes):
+    print(f"{'rows':>10} {'row-wise rows/s':>16} {'vectorized rows/s':>18} {'speedup':>8} {'max |dkm|':>10}")
+    for n_rows in sizes:
+        data = make_rows(n_rows)
+        (old_dist, old_bucket, old_day), old_time = timed(row_wise, data)
+        (new_dist, new_bucket, new_day), new_time = timed(vectorized, data)
+
+        assert (old_bucket == new_bucket).all() and (old_day == new_day).all()
+        max_diff = np.abs(old_dist - new_dist).max()
+
+        print(f"{n_rows:>10} {n_rows / old_time:>16,.0f} {n_rows / new_time:>18,.0f} "
+              f"{old_time / new_time:>7.0f}x {max_diff:>10.1e}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 500_000])
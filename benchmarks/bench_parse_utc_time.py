@@ -0,0 +1,52 @@
+"""
+Benchmark the fixed-width UTC_Time parser against pandas' strptime path.
+
+Usage:
+    python benchmarks/bench_parse_utc_time.py [n_rows ...]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.data_preprocessing import parse_utc_time, UTC_TIME_FORMAT
+
+
+def make_times(n_rows, distinct_share, seed=0):
+    """UTC_Time strings in the dump's layout, with roughly `distinct_share` of them unique."""
+    rng = np.random.default_rng(seed)
+    n_distinct = max(1, int(n_rows * distinct_share))
+    seconds = rng.integers(0, 300 * 86400, n_distinct)
+    distinct = (pd.Timestamp('2012-04-03') + pd.to_timedelta(seconds, unit='s')).strftime('%a %b %d %H:%M:%S +0000 %Y')
+    return pd.Series(np.asarray(distinct, dtype=object)[rng.integers(0, n_distinct, n_rows)])
+
+
+def timed(fn, times):
+    start = time.perf_counter()
+    result = fn(times)
+    return result, time.perf_counter() - start
+
+
+def with_pandas(times):
+    return pd.to_datetime(times, format=UTC_TIME_FORMAT, errors='coerce', utc=True).dt.tz_convert(None).to_numpy()
+
+
+def main(sizes):
+    print(f"{'rows':>10} {'distinct':>9} {'pandas rows/s':>14} {'fixed-width rows/s':>19} {'speedup':>8}")
+    for n_rows in sizes:
+        for distinct_share in [0.9, 0.1]:
+            times = make_times(n_rows, distinct_share)
+            expected, old_time = timed(with_pandas, times)
+            parsed, new_time = timed(parse_utc_time, times)
+            assert (expected == parsed).all()
+
+            print(f"{n_rows:>10} {distinct_share:>9.0%} {n_rows / old_time:>14,.0f} "
+                  f"{n_rows / new_time:>19,.0f} {old_time / new_time:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 500_000])
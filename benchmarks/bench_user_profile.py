@@ -0,0 +1,69 @@
+"""
+Benchmark dense vs sparse user profiles at multiples of the NYC user count.
+
+Usage:
+    python benchmarks/bench_user_profile.py [scale ...]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.similarity import compute_user_profile, compute_top_k_similarity
+
+# Users and distinct categories in the Foursquare NYC dump
+NYC_USERS = 1083
+NYC_CATEGORIES = 400
+
+# Top-k similarity over dense profiles is O(n_users^2 x n_features); skip it above this size
+MAX_DENSE_SIMILARITY_USERS = 20_000
+
+
+def make_users(n_users, seed=0):
+    """Per-user rows with the columns compute_user_profile reads, with Zipf-skewed categories."""
+    rng = np.random.default_rng(seed)
+    categories = np.array([f"Category {i}" for i in range(NYC_CATEGORIES)], dtype=object)
+    return pd.DataFrame({
+        'User_ID': np.arange(n_users).astype(str),
+        'Category_Name_Preferred': categories[(rng.zipf(1.3, n_users) - 1) % NYC_CATEGORIES],
+        'Time_Bucket_Preferred': rng.choice(['Morning', 'Afternoon', 'Evening', 'Night'], n_users),
+        'Avg_Latitude': 40.7 + rng.normal(0, 0.1, n_users),
+        'Avg_Longitude': -74.0 + rng.normal(0, 0.1, n_users),
+    })
+
+
+def measure(fn, *args, **kwargs):
+    """Return (result, seconds, peak MiB allocated while running fn)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**20
+
+
+def main(scales):
+    print(f"{'users':>8} {'mode':>6} {'profile s':>10} {'profile MiB':>12} {'top-k s':>8} {'top-k MiB':>10}")
+    for scale in scales:
+        users = make_users(NYC_USERS * scale)
+        for sparse in (False, True):
+            profile, profile_time, profile_mem = measure(compute_user_profile, users, sparse=sparse)
+
+            if sparse or len(users) <= MAX_DENSE_SIMILARITY_USERS:
+                _, topk_time, topk_mem = measure(compute_top_k_similarity, profile, k=10)
+                topk = f"{topk_time:>8.2f} {topk_mem:>10.1f}"
+            else:
+                topk = f"{'-':>8} {'-':>10}"
+
+            print(f"{len(users):>8} {'sparse' if sparse else 'dense':>6} "
+                  f"{profile_time:>10.3f} {profile_mem:>12.1f} {topk}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1, 10, 100])
@@ -0,0 +1,153 @@
+"""
+Open-loop load generator for the recommendation service (src/service.py).
+
+Requests are scheduled at a fixed rate regardless of how fast responses come back,
+and latency is measured from each request's scheduled send time, so a slow server
+cannot hide queueing delay by slowing the client down.
+
+Usage:
+    python -m src.service --port 8080 &
+    python benchmarks/load_generator.py --qps 200 --duration 30 --endpoint category [dataset] [categories]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.snapshot import load_or_build_snapshot
+
+ENDPOINTS = {
+    'category': '/recommend/category',
+    'similar-users': '/recommend/similar-users',
+    'meeting-place': '/recommend/meeting-place',
+}
+
+
+def make_payloads(data, endpoint, n, seed=0):
+    """Request bodies for `endpoint` drawn from users and categories present in the data."""
+    rng = np.random.default_rng(seed)
+    user_ids = np.asarray(data['User_ID'].unique(), dtype=object)
+    categories = np.asarray(data['Category_Name'].astype(str).unique(), dtype=object)
+
+    payloads = []
+    for _ in range(n):
+        user_id = str(rng.choice(user_ids))
+        if endpoint == 'category':
+            payloads.append({'user_id': user_id, 'category_name': str(rng.choice(categories)), 'top_k': 10})
+        elif endpoint == 'similar-users':
+            payloads.append({'user_id': user_id, 'top_n': 10})
+        else:
+            group = rng.choice(user_ids, size=int(rng.integers(2, 6)), replace=False)
+            payloads.append({'user_ids': [str(member) for member in group], 'k': 1})
+    return payloads
+
+
+async def _request(connection, host, path, body):
+    reader, writer = connection
+    payload = json.dumps(body).encode()
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(payload)}\r\n\r\n".encode('latin-1') + payload)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def run_load(host, port, path, payloads, qps, duration, connections=64):
+    """
+    Send `qps * duration` requests at a fixed rate.
+
+    Returns:
+        dict: Request counts, achieved rate and latency percentiles in milliseconds.
+    """
+    pool = asyncio.Queue()
+    for _ in range(connections):
+        pool.put_nowait(await asyncio.open_connection(host, port))
+
+    n_requests = int(qps * duration)
+    latencies = np.full(n_requests, np.nan)
+    statuses = np.zeros(n_requests, dtype=np.int64)
+
+    async def one(i, scheduled):
+        connection = await pool.get()
+        try:
+            statuses[i] = await _request(connection, host, path, payloads[i % len(payloads)])
+            pool.put_nowait(connection)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            connection[1].close()
+            pool.put_nowait(await asyncio.open_connection(host, port))
+        latencies[i] = time.perf_counter() - scheduled
+
+    start = time.perf_counter()
+    tasks = []
+    for i in range(n_requests):
+        scheduled = start + i / qps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(i, scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    while not pool.empty():
+        pool.get_nowait()[1].close()
+
+    latencies_ms = latencies * 1000
+    return {
+        'path': path,
+        'target_qps': qps,
+        'requests': n_requests,
+        'ok': int((statuses == 200).sum()),
+        'errors': int((statuses != 200).sum()),
+        'achieved_qps': round(n_requests / elapsed, 1),
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 2),
+        'p90_ms': round(float(np.percentile(latencies_ms, 90)), 2),
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 2),
+        'max_ms': round(float(latencies_ms.max()), 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('dataset', nargs='?', default='data/dataset_NYC.zip')
+    parser.add_argument('categories', nargs='?', default='data/categories.zip')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='category')
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help='Requests per call; above 1 the /batch variant is used.')
+    parser.add_argument('--qps', type=float, default=100)
+    parser.add_argument('--duration', type=float, default=10, help='Seconds.')
+    parser.add_argument('--connections', type=int, default=64)
+    parser.add_argument('--json', help='Also write the report to this file.')
+    args = parser.parse_args()
+
+    data = load_or_build_snapshot(args.dataset, args.categories)
+    payloads = make_payloads(data, args.endpoint, 1000)
+    path = ENDPOINTS[args.endpoint]
+    if args.batch_size > 1:
+        path += '/batch'
+        payloads = [{'requests': payloads[i:i + args.batch_size]}
+                    for i in range(0, len(payloads) - args.batch_size + 1, args.batch_size)]
+
+    report = asyncio.run(run_load(args.host, args.port, path, payloads, args.qps, args.duration, args.connections))
+    report['batch_size'] = args.batch_size
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w') as handle:
+            json.dump(report, handle, indent=2)
@@ -0,0 +1,32 @@
+"""
+Per-column memory of the processed dataset with default vs compact dtypes.
+
+Usage:
+    python benchmarks/memory_report.py [dataset_path] [categories_path]
+"""
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.data_preprocessing import load_data, preprocess_data, feature_engineering, memory_report
+
+
+def main(filepath, categories_path):
+    default = feature_engineering(preprocess_data(load_data(filepath)), categories_path)
+    compact = feature_engineering(preprocess_data(load_data(filepath, compact=True)), categories_path, compact=True)
+
+    report = memory_report(default, compact)
+    report['MiB_before'] = (report['bytes_before'] / 2**20).round(2)
+    report['MiB_after'] = (report['bytes_after'] / 2**20).round(2)
+
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(f"{len(default):,} check-ins from {filepath}")
+        print(report[['dtype_before', 'dtype_after', 'MiB_before', 'MiB_after', 'reduction']])
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "data/dataset_NYC.zip",
+         sys.argv[2] if len(sys.argv) > 2 else "data/categories.zip")
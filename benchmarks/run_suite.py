@@ -0,0 +1,288 @@
+"""
+End-to-end scaling benchmark over synthetic check-in dumps.
+
+Every pipeline stage (load_data, preprocess_data, feature_engineering,
+compute_user_profile, compute_user_similarity, compute_top_k_similarity, the
+visit histograms, the recommenders and the co-visitation model) is timed and
+its peak RSS growth sampled, once per dataset size. Each size runs in a fresh worker process so sizes do not share heap.
+Dumps come from benchmarks/synthetic.py and are cached under --data-dir.
+
+Usage:
+    python benchmarks/run_suite.py [--sizes 10k 100k 1M 10M] [--output results.json]
+                                   [--baseline benchmarks/baseline.json] [--tolerance 0.25]
+                                   [--save-baseline]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.synthetic import CATEGORIES_PATH, write_checkins
+from src.collaborative import CoVisitationModel
+from src.data_preprocessing import load_data, preprocess_data, feature_engineering
+from src.instrumentation import rss_bytes
+from src.recommendation_point import (recommend_meeting_place, recommend_meeting_place_random_checkins,
+                                      recommend_meeting_places)
+from src.recommendation_unvisisted import recommend_similar_category_locations, build_category_index
+from src.similarity import compute_user_profile, compute_user_similarity, compute_top_k_similarity, find_top_similar_users
+from src.spatial_index import VenueIndex, UserLocationIndex
+from src.temporal import VisitHistogram
+
+DEFAULT_SIZES = ['10k', '100k', '1M', '10M']
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# The dense N x N similarity matrix needs 8 * n_users^2 bytes; skip it above this size
+MAX_DENSE_SIMILARITY_USERS = 20_000
+
+# Groups planned in one bulk meeting-place call
+BULK_GROUPS = 1000
+
+# Users recommended for in one batched co-visitation call
+BATCH_USERS = 1000
+
+# Differences below these are noise, whatever the ratio
+MIN_SECONDS_DELTA = 0.05
+MIN_MEMORY_DELTA_MB = 16
+
+
+def parse_size(text):
+    """'10k' -> 10000, '1M' -> 1000000, '2500' -> 2500."""
+    multipliers = {'k': 10**3, 'm': 10**6}
+    text = text.strip().lower()
+    if text[-1:] in multipliers:
+        return int(float(text[:-1]) * multipliers[text[-1]])
+    return int(text)
+
+
+class _PeakRss:
+    """Sample RSS on a background thread while the block runs; `peak_mb` is the growth over the start."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak_mb = 0.0
+
+    def __enter__(self):
+        self._start = self._peak = rss_bytes()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            self._peak = max(self._peak, rss_bytes())
+
+    def __exit__(self, *exc):
+        self._done.set()
+        self._thread.join()
+        self._peak = max(self._peak, rss_bytes())
+        self.peak_mb = (self._peak - self._start) / 2**20
+        return False
+
+
+class _Recorder:
+    """Runs the stages of one dataset size and collects their results."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.results = []
+
+    def stage(self, name, fn, *args, output_rows=len, **kwargs):
+        """Time fn(*args, **kwargs) and record it; returns fn's result."""
+        with _PeakRss() as memory:
+            cpu_start, start = time.process_time(), time.perf_counter()
+            result = fn(*args, **kwargs)
+            seconds, cpu_seconds = time.perf_counter() - start, time.process_time() - cpu_start
+        self.results.append({
+            'rows': self.rows, 'stage': name, 'status': 'ok',
+            'seconds': round(seconds, 4), 'cpu_seconds': round(cpu_seconds, 4),
+            'peak_rss_mb': round(memory.peak_mb, 1), 'output_rows': int(output_rows(result)),
+        })
+        print(f"{self.rows:>10} {name:<40} {seconds:>9.3f}s {memory.peak_mb:>9.1f} MiB", flush=True)
+        return result
+
+    def queries(self, name, fn, arguments):
+        """Time one call per argument tuple and record the total plus latency percentiles."""
+        def run():
+            latencies = []
+            for args in arguments:
+                start = time.perf_counter()
+                fn(*args)
+                latencies.append(time.perf_counter() - start)
+            return latencies
+
+        latencies = self.stage(name, run)
+        self.results[-1].update({
+            'p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 3),
+            'p99_ms': round(float(np.percentile(latencies, 99)) * 1000, 3),
+        })
+
+    def skip(self, name, reason):
+        self.results.append({'rows': self.rows, 'stage': name, 'status': 'skipped', 'reason': reason})
+        print(f"{self.rows:>10} {name:<40} skipped: {reason}", flush=True)
+
+
+def run_size(rows, data_dir, seed=0, n_queries=50):
+    """
+    Run every stage on a synthetic dump of `rows` check-ins.
+
+    Returns:
+        list: One result dict per stage.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f'synthetic_{rows}_{seed}.txt')
+    if not os.path.exists(path):
+        write_checkins(path + '.partial', rows, seed)
+        os.replace(path + '.partial', path)
+
+    # Deprecation notices from the recommenders would repeat once per query
+    warnings.simplefilter('ignore', FutureWarning)
+
+    recorder = _Recorder(rows)
+    raw = recorder.stage('load_data', load_data, path)
+    cleaned = recorder.stage('preprocess_data', preprocess_data, raw)
+    del raw
+    # The normalized layout is what snapshots and the service load
+    data = recorder.stage('feature_engineering', feature_engineering, cleaned, CATEGORIES_PATH, normalized=True)
+    del cleaned
+
+    profiles = recorder.stage('compute_user_profile', compute_user_profile, data)
+    if len(profiles) <= MAX_DENSE_SIMILARITY_USERS:
+        recorder.stage('compute_user_similarity', compute_user_similarity, profiles)
+    else:
+        recorder.skip('compute_user_similarity', f"{len(profiles)} users > {MAX_DENSE_SIMILARITY_USERS}")
+    del profiles
+
+    sparse_profiles = recorder.stage('compute_user_profile[sparse]', compute_user_profile, data, sparse=True)
+    similarity = recorder.stage('compute_top_k_similarity', compute_top_k_similarity, sparse_profiles, k=50,
+                                output_rows=lambda result: len(result.index))
+    recorder.stage('VisitHistogram', VisitHistogram, data)
+    category_index = recorder.stage('build_category_index', build_category_index, data, output_rows=lambda _: len(data))
+    venue_index = recorder.stage('VenueIndex', VenueIndex, data)
+
+    # Queries for random users in the most common categories
+    rng = np.random.default_rng(seed)
+    users = data.users['User_ID'].to_numpy()
+    categories = data.checkins['Category_Name'].value_counts().index[:20].astype(str)
+    query_users = rng.choice(users, n_queries)
+    category_queries = [(user_id, rng.choice(categories), data, 10, category_index) for user_id in query_users]
+    recorder.queries('recommend_similar_category_locations', recommend_similar_category_locations, category_queries)
+    recorder.queries('recommend_similar_category_locations[proximity]',
+                     lambda *args: recommend_similar_category_locations(*args, proximity=True), category_queries)
+    recorder.queries('recommend_similar_category_locations[at_time]',
+                     lambda *args: recommend_similar_category_locations(*args, at_time='2012-04-06 21:00'),
+                     category_queries)
+    recorder.queries('find_top_similar_users', find_top_similar_users,
+                     [(user_id, similarity, 10) for user_id in query_users])
+    recorder.queries('recommend_meeting_place_random_checkins', recommend_meeting_place_random_checkins,
+                     [(list(rng.choice(users, 5, replace=False)), data, 3, venue_index) for _ in range(n_queries)])
+
+    location_index = recorder.stage('UserLocationIndex', UserLocationIndex, data)
+    groups = [list(rng.choice(users, 5, replace=False)) for _ in range(BULK_GROUPS)]
+    recorder.stage('recommend_meeting_places', recommend_meeting_places, groups, data, k=3, seed=seed,
+                   venue_index=venue_index, location_index=location_index, output_rows=lambda result: len(result[0]))
+
+    covisitation = recorder.stage('CoVisitationModel', CoVisitationModel, data, output_rows=lambda model: model.similarity.nnz)
+    recorder.stage('CoVisitationModel.recommend', covisitation.recommend, list(rng.choice(users, BATCH_USERS)), k=10)
+    recorder.queries('recommend_meeting_place[median]', recommend_meeting_place,
+                     [(list(rng.choice(users, 5, replace=False)), data, 3, 'median', venue_index, location_index)
+                      for _ in range(n_queries)])
+    return recorder.results
+
+
+#------------------------------
+# Baseline comparison
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    Compare results against a baseline run, stage by stage.
+
+    A stage regresses when its time or peak memory grows by more than `tolerance`
+    (a fraction) and by more than the noise floor (MIN_SECONDS_DELTA, MIN_MEMORY_DELTA_MB).
+
+    Returns:
+        list: (rows, stage, metric, baseline, current) for every regression.
+    """
+    previous = {(result['rows'], result['stage']): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get((result['rows'], result['stage']))
+        if before is None or result['status'] != 'ok' or before['status'] != 'ok':
+            continue
+        for metric, floor in (('seconds', MIN_SECONDS_DELTA), ('peak_rss_mb', MIN_MEMORY_DELTA_MB)):
+            if result[metric] > before[metric] * (1 + tolerance) and result[metric] - before[metric] > floor:
+                regressions.append((result['rows'], result['stage'], metric, before[metric], result[metric]))
+    return regressions
+
+
+def unbaselined(results, baseline):
+    """(rows, stage) of every successful stage the baseline has no entry for, so compare() cannot check it."""
+    previous = {(result['rows'], result['stage']) for result in baseline['results'] if result['status'] == 'ok'}
+    return [(result['rows'], result['stage']) for result in results
+            if result['status'] == 'ok' and (result['rows'], result['stage']) not in previous]
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def main(args):
+    results = []
+    for rows in [parse_size(size) for size in args.sizes]:
+        # A fresh process per size, so peak memory is not hidden by an earlier size's heap
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            results.extend(executor.submit(run_size, rows, args.data_dir, args.seed, args.queries).result())
+
+    report = {'environment': environment(), 'seed': args.seed, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(report, handle, indent=1)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as handle:
+            json.dump(report, handle, indent=1)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline) as handle:
+        baseline = json.load(handle)
+    regressions = compare(results, baseline, args.tolerance)
+    for rows, stage, metric, before, after in regressions:
+        print(f"REGRESSION {rows:>10} {stage:<40} {metric}: {before} -> {after}")
+    for rows, stage in unbaselined(results, baseline):
+        print(f"NO BASELINE {rows:>9} {stage:<40} (not checked; refresh with --save-baseline)")
+    if not regressions:
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--queries', type=int, default=50, help="Calls timed per recommender.")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="Where synthetic dumps are cached.")
+    parser.add_argument('--output', help="Write the results as JSON.")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed fractional slowdown or growth.")
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the baseline.")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,119 @@
+"""
+Seeded synthetic check-in dumps in the 8-column TSV layout load_data reads.
+
+The shape follows the Foursquare NYC dump: about 210 check-ins per user and 6 per
+venue, Zipf-skewed user activity, venue popularity and category frequency, venues
+clustered around a handful of neighbourhoods, a day/night rhythm in the timestamps,
+and a small share of exact duplicate rows for preprocess_data to drop.
+
+Usage:
+    python benchmarks/synthetic.py n_rows output.txt [--seed SEED]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+CATEGORIES_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'categories.zip')
+
+CHECKINS_PER_USER = 210
+CHECKINS_PER_VENUE = 6
+DUPLICATE_SHARE = 0.002
+START = pd.Timestamp('2012-04-03')
+DAYS = 320
+
+# Relative check-in volume per local hour (quiet nights, lunch and evening peaks)
+HOURLY_VOLUME = np.array([3, 2, 1, 1, 1, 1, 2, 4, 6, 6, 6, 7, 9, 8, 7, 7, 8, 9, 10, 10, 9, 7, 5, 4], dtype=float)
+
+
+def _zipf_weights(n, exponent, rng):
+    """Shuffled Zipf probabilities over n items."""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+class CheckinGenerator:
+    """Users, venues and categories for one (n_rows, seed), sampled into rows chunk by chunk."""
+
+    def __init__(self, n_rows, seed=0, categories_path=CATEGORIES_PATH):
+        rng = np.random.default_rng(seed)
+        self.n_rows = n_rows
+        self.seed = seed
+        self.n_users = max(10, n_rows // CHECKINS_PER_USER)
+        self.n_venues = max(20, n_rows // CHECKINS_PER_VENUE)
+
+        categories = pd.read_csv(categories_path).drop_duplicates('Category ID')
+        category_weights = _zipf_weights(len(categories), 1.1, rng)
+        venue_categories = rng.choice(len(categories), self.n_venues, p=category_weights)
+        self.venue_category_ids = categories['Category ID'].to_numpy(dtype=object)[venue_categories]
+        self.venue_category_names = categories['Category Name'].to_numpy(dtype=object)[venue_categories]
+
+        # Venues around a few neighbourhood centres
+        centres = np.column_stack([40.70 + rng.normal(0, 0.08, 12), -73.95 + rng.normal(0, 0.08, 12)])
+        around = centres[rng.integers(0, len(centres), self.n_venues)]
+        self.venue_coords = around + rng.normal(0, 0.015, (self.n_venues, 2))
+        self.venue_ids = np.array([f'{value:024x}' for value in rng.integers(0, 2**63, self.n_venues)], dtype=object)
+
+        self.user_weights = _zipf_weights(self.n_users, 0.8, rng)
+        self.venue_weights = _zipf_weights(self.n_venues, 0.9, rng)
+        self.hour_weights = HOURLY_VOLUME / HOURLY_VOLUME.sum()
+
+    def chunks(self, chunk_rows=1_000_000):
+        """Yield DataFrames in load_data's raw column layout, n_rows in total."""
+        for index, start in enumerate(range(0, self.n_rows, chunk_rows)):
+            yield self._chunk(min(chunk_rows, self.n_rows - start), np.random.default_rng((self.seed, index)))
+
+    def _chunk(self, n, rng):
+        users = rng.choice(self.n_users, n, p=self.user_weights)
+        venues = rng.choice(self.n_venues, n, p=self.venue_weights)
+
+        # Local time with a daily rhythm, converted to UTC with the NYC offset of the day
+        local = (START + pd.to_timedelta(rng.integers(0, DAYS, n), unit='D')
+                 + pd.to_timedelta(rng.choice(24, n, p=self.hour_weights), unit='h')
+                 + pd.to_timedelta(rng.integers(0, 3600, n), unit='s'))
+        offsets = np.where((local >= pd.Timestamp('2012-11-04')) & (local < pd.Timestamp('2013-03-10')), -300, -240)
+        utc = local - pd.to_timedelta(offsets, unit='m')
+
+        chunk = pd.DataFrame({
+            'User_ID': (users + 1).astype(str),
+            'Venue_ID': self.venue_ids[venues],
+            'Venue_Category_ID': self.venue_category_ids[venues],
+            'Category_Name': self.venue_category_names[venues],
+            'Latitude': self.venue_coords[venues, 0].round(6),
+            'Longitude': self.venue_coords[venues, 1].round(6),
+            'Timezone_Offset': offsets,
+            'UTC_Time': utc.strftime('%a %b %d %H:%M:%S +0000 %Y'),
+        })
+
+        # Exact duplicates of earlier rows in the chunk
+        n_duplicates = int(n * DUPLICATE_SHARE)
+        if n_duplicates:
+            targets = rng.integers(1, n, n_duplicates)
+            chunk.iloc[targets] = chunk.iloc[rng.integers(0, targets)].to_numpy()
+        return chunk
+
+    def write(self, path, chunk_rows=1_000_000):
+        """Write the dump as a headerless TSV, one chunk in memory at a time."""
+        with open(path, 'w', encoding='ISO-8859-1', errors='replace', newline='') as handle:
+            for chunk in self.chunks(chunk_rows):
+                chunk.to_csv(handle, sep='\t', header=False, index=False)
+        return path
+
+
+def write_checkins(path, n_rows, seed=0):
+    """Write a synthetic dump of `n_rows` check-ins to `path`."""
+    return CheckinGenerator(n_rows, seed).write(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('n_rows', type=int)
+    parser.add_argument('output')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    write_checkins(args.output, args.n_rows, args.seed)
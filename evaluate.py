@@ -1,13 +1,17 @@
+import argparse
+import os
+
+import numpy as np
 import pandas as pd
-from src.data_preprocessing import load_data, preprocess_data, feature_engineering
-from src.similarity import compute_user_profile, compute_user_similarity, find_top_similar_users
+from src.evaluation import evaluate_recommender, write_report, RECOMMENDERS
+from src.snapshot import load_or_build_snapshot
+from src.similarity import compute_user_profile, compute_user_similarity, compute_top_k_similarity, \
+    compute_preference_incidence, find_top_similar_users
 from src.recommendation_unvisisted import recommend_similar_category_locations
 from src.recommendation_point import recommend_meeting_place_random_checkins
 
 def load_and_prepare_data():
-    raw_data = load_data("data/dataset_NYC.txt")
-    cleaned_data = preprocess_data(raw_data)
-    processed_data = feature_engineering(cleaned_data,'data/categories.csv')
+    processed_data = load_or_build_snapshot("data/dataset_NYC.txt", 'data/categories.csv')
     user_profiles = compute_user_profile(processed_data)
     user_similarity_df = compute_user_similarity(user_profiles)
     return processed_data, user_profiles, user_similarity_df
@@ -27,30 +31,58 @@ def evaluate_recommend_unvisited(data, user_id, category_name, top_k=10):
     print(f"Diversity: {diversity:.2f}")
     print(f"Recommended Locations:\n{recommendations[['Venue_ID', 'Category_Name', 'Score']]}")
 
-def evaluate_user_similarity(data, user_id, user_similarity_df, top_n=10):
+def evaluate_user_similarity(data, user_id, user_similarity_df, top_n=10, incidence=None):
+    """
+    Print the mean similarity and (category, time bucket) preference overlap of a user's top_n neighbours.
+
+    Args:
+        data (pd.DataFrame or StarSchema): The processed check-ins.
+        user_id (str): The user to evaluate.
+        user_similarity_df (pd.DataFrame or TopKSimilarity): As for find_top_similar_users.
+        top_n (int): Neighbours evaluated.
+        incidence (PreferenceIncidence, optional): Precomputed compute_preference_incidence(data);
+            pass it when evaluating many users.
+    """
     # Get similar users
     similar_users = find_top_similar_users(user_id, user_similarity_df, top_n)
 
     # Average similarity score
     avg_similarity = similar_users.mean()
 
-    # Calculate overlaps
-    overlaps = []
-    user_pref = data[data['User_ID'] == user_id][['Category_Name', 'Time_Bucket']].drop_duplicates()
-
-    for similar_user in similar_users.index:
-        similar_user_pref = data[data['User_ID'] == similar_user][['Category_Name', 'Time_Bucket']].drop_duplicates()
-
-        # Calculate intersection of preferences
-        overlap = pd.merge(user_pref, similar_user_pref, on=['Category_Name', 'Time_Bucket']).shape[0]
-        overlaps.append(overlap)
+    # Shared (Category_Name, Time_Bucket) pairs with each similar user, from one sparse product
+    if incidence is None:
+        incidence = compute_preference_incidence(data)
+    overlaps = incidence.overlap(user_id, similar_users.index)
 
-    avg_overlap = sum(overlaps) / len(overlaps) if overlaps else 0
+    avg_overlap = overlaps.mean() if len(overlaps) else 0
 
     # Print metrics
     print(f"Average Similarity Score: {avg_similarity:.2f}")
     print(f"Average Preference Overlap: {avg_overlap:.2f}")
 
+def evaluate_neighbor_overlap(data, similarity, top_n=10, incidence=None):
+    """
+    Preference overlap of every user with their top_n neighbours.
+
+    Args:
+        data (pd.DataFrame or StarSchema): The processed check-ins.
+        similarity (TopKSimilarity): Output of compute_top_k_similarity.
+        top_n (int): Neighbours per user.
+        incidence (PreferenceIncidence, optional): Precomputed compute_preference_incidence(data).
+
+    Returns:
+        pd.DataFrame: Per user, the mean similarity and mean overlap of their neighbours.
+    """
+    if incidence is None:
+        incidence = compute_preference_incidence(data)
+    overlaps = incidence.neighbor_overlap(similarity, top_n)
+    top_n = overlaps.shape[1]
+    return pd.DataFrame({
+        'User_ID': similarity.index,
+        'Avg_Similarity': similarity.scores[:, :top_n].mean(axis=1) if top_n else np.nan,
+        'Avg_Overlap': overlaps.mean(axis=1) if top_n else np.nan,
+    })
+
 
 from geopy.distance import geodesic
 
@@ -90,21 +122,64 @@ def evaluate_meeting_place(data, user_ids, k=3):
 
 
 
-# Main function to run all computations
-def main():
-    data, user_profiles, user_similarity_df = load_and_prepare_data()
+def evaluate_population(data, categories_path, k=10, test_fraction=0.2, output_dir='evaluation', n_jobs=-1):
+    """
+    Score every recommender for every user on a chronological holdout and write the reports.
 
-    print('evaluate_recommend_unvisited')
-    evaluate_recommend_unvisited(data, user_id="20", category_name="Bar", top_k=10)
+    Args:
+        data (pd.DataFrame): The processed (or cleaned) check-ins.
+        categories_path (str): Category mapping table.
+        k (int): Recommendations per user.
+        test_fraction (float): Share of each user's latest check-ins held out.
+        output_dir (str): One subdirectory per recommender with summary.json and per_user.csv.
+        n_jobs (int): Worker processes; -1 uses all cores.
+
+    Returns:
+        pd.DataFrame: One summary row per recommender.
+    """
+    summaries = []
+    for recommender in RECOMMENDERS:
+        summary, per_user = evaluate_recommender(data, categories_path, k=k, test_fraction=test_fraction,
+                                                 recommender=recommender, n_jobs=n_jobs)
+        write_report(summary, per_user, os.path.join(output_dir, recommender))
+        summaries.append(summary)
+    return pd.DataFrame(summaries)
 
-    print('evaluate_user_similarity')
-    user_profiles = compute_user_profile(data)
-    user_similarity_df = compute_user_similarity(user_profiles)
-    evaluate_user_similarity(data, user_id="20", user_similarity_df=user_similarity_df, top_n=10)
 
-    evaluate_meeting_place(data, user_ids=['470', '979', '69', '395', '87'], k=1)
+# Main function to run all computations
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the recommenders.")
+    parser.add_argument('dataset', nargs='?', default='data/dataset_NYC.zip')
+    parser.add_argument('categories', nargs='?', default='data/categories.zip')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--test-fraction', type=float, default=0.2)
+    parser.add_argument('--output', default='evaluation', help="Directory for the summary and per-user reports.")
+    parser.add_argument('--jobs', type=int, default=-1)
+    parser.add_argument('--examples', action='store_true', help="Also print the single-user and group examples.")
+    args = parser.parse_args()
+
+    data = load_or_build_snapshot(args.dataset, args.categories, n_jobs=args.jobs)
+
+    print('evaluate_population')
+    summaries = evaluate_population(data, args.categories, k=args.k, test_fraction=args.test_fraction,
+                                    output_dir=args.output, n_jobs=args.jobs)
+    print(summaries.to_string(index=False))
+    print(f"Reports written to {args.output}/")
+
+    if args.examples:
+        print('evaluate_recommend_unvisited')
+        evaluate_recommend_unvisited(data, user_id="20", category_name="Bar", top_k=10)
+
+        print('evaluate_user_similarity')
+        user_profiles = compute_user_profile(data, sparse=True)
+        similarity = compute_top_k_similarity(user_profiles, k=10, n_jobs=args.jobs)
+        incidence = compute_preference_incidence(data)
+        evaluate_user_similarity(data, user_id="20", user_similarity_df=similarity, top_n=10, incidence=incidence)
+        neighbor_overlap = evaluate_neighbor_overlap(data, similarity, top_n=10, incidence=incidence)
+        print(f"Average Preference Overlap (all users): {neighbor_overlap['Avg_Overlap'].mean():.2f}")
+
+        evaluate_meeting_place(data, user_ids=['470', '979', '69', '395', '87'], k=1)
 
 
 if __name__ == "__main__":
     main()
-
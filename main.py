@@ -1,40 +1,40 @@
 import pandas as pd
-from src.data_preprocessing import load_data, preprocess_data, feature_engineering
-from src.similarity import compute_user_profile, compute_user_similarity, find_top_similar_users
-from src.recommendation_unvisisted import recommend_similar_category_locations
-from src.recommendation_point import recommend_meeting_place_random_checkins
-from src.utils import save_to_csv
+from src.snapshot import load_or_build_snapshot
+from src.similarity import compute_user_profile, compute_top_k_similarity, find_top_similar_users
+from src.recommendation_unvisisted import recommend_similar_category_locations, build_category_index
+from src.recommendation_point import recommend_meeting_place
+from src.spatial_index import VenueIndex, UserLocationIndex
+from src.instrumentation import TRACER
 
 # Main function to run all computations
 def main():
-    # Step 1: Load Data
+    # Step 1-2: Load the processed data (built once per set of input files, then memory-mapped)
     filepath = "data/dataset_NYC.zip"
-    print("Loading data...")
-    data = load_data(filepath)
-
-    # Step 2: Preprocess and Feature Engineer
-    #print("Preprocessing data...")
-    data = preprocess_data(data)
     categories_path= "data/categories.zip"
-    #print("Feature engineering...")
-    data = feature_engineering(data,categories_path)
-    
-    #Save for future use
-    #save_to_csv(data, "data/processed_data.csv")
+    print("Loading data...")
+    data = load_or_build_snapshot(filepath, categories_path, n_jobs=-1)
 
     # Step 3: Compute User Profiles
     #print("Computing user profiles...")
-    user_profiles = compute_user_profile(data)
+    user_profiles = compute_user_profile(data, sparse=True)
 
     # Step 4: Compute User Similarity
     #print("Computing user similarity...")
-    user_similarity_df = compute_user_similarity(user_profiles)
+    # Keep only the top neighbours per user instead of the dense N x N matrix
+    user_similarity_df = compute_top_k_similarity(user_profiles, k=50)
+
+    # Build the venue spatial index and the users' check-in locations once for all meeting-place queries
+    venue_index = VenueIndex(data)
+    location_index = UserLocationIndex(data)
+
+    # Build the category query index once for all unvisited-location queries
+    category_index = build_category_index(data)
 
     # Step 5: Recommendation - Unvisited Locations
     user_id = "20"
     category_name = "Bar"
     print(f"Recommending unvisited locations for User {user_id} in category {category_name}...")
-    recommendations = recommend_similar_category_locations(user_id, category_name, data, top_k=10)
+    recommendations = recommend_similar_category_locations(user_id, category_name, data, top_k=10, index=category_index)
     print("Recommendations:")
     print(recommendations)
 
@@ -47,16 +47,20 @@ def main():
     # Step 7: Recommendation - Meeting Place
     user_ids=['470', '979', '69', '395', '87']
     print(f"Recommending meeting place for users {user_ids}...")
-    selected_checkins, nearest_venues = recommend_meeting_place_random_checkins(user_ids, data, k=3)
+    members, nearest_venues = recommend_meeting_place(user_ids, data, k=3, venue_index=venue_index,
+                                                      location_index=location_index)
     print("Recommended meeting place:")
     print(nearest_venues)
 
     # Step 8: Visualization
     #print("Visualizing meeting place...")
-    #combined_map = visualize_random_checkins_and_venues(selected_checkins, nearest_venues)
+    #combined_map = visualize_random_checkins_and_venues(members, nearest_venues)
     #combined_map.save("meeting_place_map.html")
     #print("Map saved to meeting_place_map.html")
 
+    # Time, CPU and memory per stage and recommender call
+    print(pd.DataFrame(TRACER.summary()).to_string(index=False))
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,143 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def _result_bytes(value):
+    """Approximate memory held by a cached result."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(_result_bytes(item) for item in value)
+    return sys.getsizeof(value)
+
+def _copy(value):
+    """Hand out copies of mutable pandas results so callers cannot alter the cached entry."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    if isinstance(value, tuple):
+        return tuple(_copy(item) for item in value)
+    return value
+
+
+class ResultCache:
+    """
+    Bounded LRU cache of recommender results, with an optional time-to-live.
+
+    Entries are keyed by a namespace (which recommender), the normalized call
+    arguments and the version of the data they were computed from. Moving the
+    cache to a new version (a rebuilt snapshot, an incremental batch) drops
+    every entry of the old one. Least recently used entries are evicted once
+    either `max_entries` or `max_bytes` is exceeded. Safe to share between threads.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 2**20, ttl_seconds=None, version=None, clock=time.monotonic):
+        """
+        Args:
+            max_entries (int): Most results kept.
+            max_bytes (int): Most bytes of results kept (see `bytes` in stats()).
+            ttl_seconds (float, optional): Expire entries this long after they were computed.
+            version: Version of the data the cache currently serves.
+            clock (callable): Time source for the TTL, in seconds.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.version = version
+        self._clock = clock
+        self._entries = OrderedDict()   # key -> (value, size, expires_at)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def set_version(self, version):
+        """Serve `version` from now on, dropping entries computed from any other version."""
+        with self._lock:
+            self._set_version(version)
+
+    def _set_version(self, version):
+        if version == self.version:
+            return
+        self.version = version
+        for key in [key for key in self._entries if key[1] != version]:
+            self._drop(key)
+            self.invalidations += 1
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def get_or_compute(self, namespace, args, compute, version=None):
+        """
+        Return the cached result for (namespace, args) or compute and store it.
+
+        Args:
+            namespace (str): Which recommender the result belongs to.
+            args (tuple): Normalized, hashable call arguments.
+            compute (callable): Produces the result on a miss. Exceptions propagate
+                and nothing is cached.
+            version (optional): Data version of the caller; switches the cache to it
+                (see set_version). Defaults to the cache's current version.
+
+        Returns:
+            The result (a copy, for pandas objects).
+        """
+        with self._lock:
+            if version is not None:
+                self._set_version(version)
+            key = (namespace, self.version, args)
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= self._clock():
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _copy(entry[0])
+            self.misses += 1
+
+        # Compute outside the lock; concurrent misses on one key may both compute
+        value = compute()
+        size = _result_bytes(value)
+        expires_at = self._clock() + self.ttl_seconds if self.ttl_seconds is not None else None
+
+        with self._lock:
+            if key[1] == self.version and size <= self.max_bytes:
+                if key in self._entries:
+                    self._drop(key)
+                self._entries[key] = (value, size, expires_at)
+                self.bytes += size
+                while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                    self._drop(next(iter(self._entries)))
+                    self.evictions += 1
+        return _copy(value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'version': self.version,
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
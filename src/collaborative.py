@@ -0,0 +1,216 @@
+"""
+Item-item collaborative filtering over the user x venue visit matrix.
+
+Two venues are similar when the same users check in at both (co-visitation),
+measured by cosine similarity over users. A user's score for a venue is the
+sum of its similarities to the venues they visited, weighted by log(1 + visits),
+so recommending for a block of users is one sparse product followed by an
+argpartition over the dense block of scores.
+
+    model = CoVisitationModel(data)
+    recommendations = model.recommend(['20', '470'], k=10)
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import sparse as sp
+
+from src.data_preprocessing import StarSchema
+from src.instrumentation import traced
+from src.utils import coerce_user_id
+
+
+def _top_per_row(rows, values, n):
+    """Positions of the n largest of the (positive) values of every row, ties by position, grouped by row."""
+    # Positive float32 bit patterns order like the values, so one stable integer sort
+    # orders the entries by row and then by value, highest first
+    descending = np.int64(0x7FFFFFFF) - values.astype(np.float32).view(np.int32)
+    order = np.argsort((rows.astype(np.int64) << 31) | descending, kind='stable')
+    rows = rows[order]
+    changes = np.r_[True, rows[1:] != rows[:-1]]
+    positions = np.arange(len(rows))
+    starts = np.maximum.accumulate(np.where(changes, positions, 0))
+    return order[positions - starts < n]
+
+
+# Matrices shared with pool workers (set once per worker by the initializer)
+_worker_matrices = None
+
+def _init_worker(matrices):
+    global _worker_matrices
+    _worker_matrices = matrices
+
+def _recommend_block(rows, k, exclude_visited, matrices=None):
+    """Top-k venue positions and scores for the given user rows (-1 / nan pads users with fewer candidates)."""
+    weights, similarity = _worker_matrices if matrices is None else matrices
+    block = weights[rows]
+    scores = (block @ similarity).toarray()
+    if exclude_visited:
+        visited_rows, visited_venues = block.nonzero()
+        scores[visited_rows, visited_venues] = -np.inf
+
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((len(rows), 0), dtype=np.int64), np.empty((len(rows), 0), dtype=np.float32)
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    # Highest score first, ties by venue position
+    candidates.sort(axis=1)
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+    venues = np.take_along_axis(candidates, order, axis=1)
+    venue_scores = np.take_along_axis(candidate_scores, order, axis=1)
+
+    # Venues no visited venue leads to are not recommendations
+    empty = ~(venue_scores > 0)
+    venues[empty] = -1
+    venue_scores[empty] = np.nan
+    return venues, venue_scores
+
+
+class CoVisitationModel:
+    """
+    Venue-to-venue similarities learned from who visits what.
+
+    Attributes:
+        user_ids (pd.Index): User IDs, one per row of `visits`.
+        venue_ids (pd.Index): Venue IDs, one per column of `visits` and row of `similarity`.
+        visits (scipy.sparse.csr_matrix): (n_users, n_venues) float32 check-in counts.
+        weights (scipy.sparse.csr_matrix): log(1 + visits), the weight of each visited venue in a user's scores.
+        similarity (scipy.sparse.csr_matrix): (n_venues, n_venues) float32 cosine similarity
+            of each venue to its most similar venues (at most `neighbors` per row).
+    """
+
+    def __init__(self, data, neighbors=50, max_history=200, max_memory_mb=256):
+        """
+        Args:
+            data (pd.DataFrame or StarSchema): Check-ins with User_ID and Venue_ID.
+            neighbors (int): Similar venues kept per venue.
+            max_history (int): Distinct venues per user counted as co-visited (their most
+                visited ones). Pairs grow with the square of a user's history, so this
+                bounds the training cost of the few users with thousands of venues.
+            max_memory_mb (float): Bound on the scratch memory of one training or scoring block.
+        """
+        if isinstance(data, StarSchema):
+            user_keys = data.checkins['user_key'].to_numpy()
+            venue_keys = data.checkins['venue_key'].to_numpy()
+            self.user_ids = pd.Index(data.users['User_ID'].to_numpy(), name='User_ID')
+            self.venue_ids = pd.Index(data.venues['Venue_ID'].to_numpy(), name='Venue_ID')
+        else:
+            user_keys, user_ids = pd.factorize(data['User_ID'])
+            venue_keys, venue_ids = pd.factorize(data['Venue_ID'])
+            self.user_ids = pd.Index(user_ids, name='User_ID')
+            self.venue_ids = pd.Index(venue_ids, name='Venue_ID')
+
+        shape = (len(self.user_ids), len(self.venue_ids))
+        self.visits = sp.csr_matrix((np.ones(len(user_keys), dtype=np.float32), (user_keys, venue_keys)), shape=shape)
+        self.visits.sum_duplicates()
+        # Repeat visits count with diminishing returns in the scores
+        self.weights = self.visits.copy()
+        self.weights.data = np.log1p(self.weights.data)
+        self.max_memory_mb = max_memory_mb
+        self.similarity = self._train(neighbors, max_history)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    @traced('CoVisitationModel.train', rows=lambda similarity: similarity.shape[0])
+    def _train(self, neighbors, max_history):
+        n_users, n_venues = self.visits.shape
+        rows = np.repeat(np.arange(n_users), np.diff(self.visits.indptr))
+
+        # Binary history of each user's max_history most visited venues
+        kept = np.sort(_top_per_row(rows, self.visits.data, max_history))
+        history = sp.csr_matrix(
+            (np.ones(len(kept), dtype=np.float32), (rows[kept], self.visits.indices[kept])), shape=self.visits.shape
+        )
+        history_by_venue = history.T.tocsr()
+        venue_users = np.diff(history_by_venue.indptr).astype(np.float64)
+        norms = np.sqrt(venue_users)
+
+        # Rows of the co-visitation matrix are built in blocks of bounded size: a venue's
+        # row has at most as many entries as the histories of its visitors add up to, and
+        # each entry costs about 64 bytes across the product, its COO copy and the sort
+        row_cost = history_by_venue @ np.diff(history.indptr).astype(np.float64)
+        budget = max(1.0, self.max_memory_mb * 2**20 / 64)
+        n_blocks = int(np.ceil(row_cost.sum() / budget))
+        bounds = np.unique(np.r_[0, np.searchsorted(np.cumsum(row_cost), budget * np.arange(1, n_blocks)), n_venues])
+
+        parts = []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            counts = (history_by_venue[start:stop] @ history).tocoo()
+            block_rows, columns = counts.row + start, counts.col
+            off_diagonal = block_rows != columns
+            block_rows, columns = block_rows[off_diagonal], columns[off_diagonal]
+            cosine = counts.data[off_diagonal] / (norms[block_rows] * norms[columns])
+            top = _top_per_row(block_rows, cosine, neighbors)
+            parts.append((block_rows[top], columns[top], cosine[top].astype(np.float32)))
+
+        if parts:
+            block_rows, columns, cosine = (np.concatenate(values) for values in zip(*parts))
+        else:
+            block_rows = columns = np.array([], dtype=np.int64)
+            cosine = np.array([], dtype=np.float32)
+        return sp.csr_matrix((cosine, (block_rows, columns)), shape=(n_venues, n_venues))
+
+    def positions(self, user_ids):
+        """Row positions of the given users; raises ValueError for an unknown user."""
+        user_ids = [coerce_user_id(user_id, self.user_ids.dtype) for user_id in user_ids]
+        positions = self.user_ids.get_indexer(user_ids)
+        if (positions < 0).any():
+            raise ValueError(f"User ID {user_ids[int(np.argmax(positions < 0))]} not found in the dataset.")
+        return positions
+
+    @traced('CoVisitationModel.recommend', rows=len)
+    def recommend(self, user_ids, k=10, exclude_visited=True, n_jobs=1):
+        """
+        Recommend venues for many users at once.
+
+        Args:
+            user_ids (list): Users to recommend for.
+            k (int): Venues per user; users whose visited venues lead to fewer get fewer.
+            exclude_visited (bool): Leave out venues the user has already checked in at.
+            n_jobs (int): Worker processes; 1 scores in-process, -1 uses all cores.
+
+        Returns:
+            pd.DataFrame: User_ID, Rank (1 = best), Venue_ID and Score, users in the given order.
+        """
+        positions = self.positions(user_ids)
+        venues, scores = self.recommend_positions(positions, k, exclude_visited, n_jobs)
+
+        owner, rank = np.nonzero(venues >= 0)
+        return pd.DataFrame({
+            'User_ID': self.user_ids[positions[owner]],
+            'Rank': rank + 1,
+            'Venue_ID': self.venue_ids[venues[owner, rank]],
+            'Score': scores[owner, rank],
+        })
+
+    def recommend_positions(self, positions, k=10, exclude_visited=True, n_jobs=1):
+        """
+        recommend() on user row positions, as arrays.
+
+        Returns:
+            tuple: (n, k) venue positions (-1 where a user has fewer than k) and their scores.
+        """
+        if n_jobs == -1:
+            n_jobs = os.cpu_count() or 1
+
+        # One dense (block x n_venues) score matrix, its negation and argpartition's int64 indices, per worker
+        bytes_per_row = 16 * max(1, self.visits.shape[1])
+        block_size = max(1, int(self.max_memory_mb * 2**20 // (bytes_per_row * n_jobs)))
+        blocks = [positions[start:start + block_size] for start in range(0, len(positions), block_size)]
+
+        if n_jobs > 1 and len(blocks) > 1:
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                     initargs=((self.weights, self.similarity),)) as executor:
+                results = list(executor.map(_recommend_block, blocks, [k] * len(blocks),
+                                            [exclude_visited] * len(blocks)))
+        else:
+            results = [_recommend_block(rows, k, exclude_visited, (self.weights, self.similarity)) for rows in blocks]
+
+        if not results:
+            width = min(k, self.visits.shape[1])
+            return np.empty((0, width), dtype=np.int64), np.empty((0, width), dtype=np.float32)
+        return np.vstack([venues for venues, _ in results]), np.vstack([scores for _, scores in results])
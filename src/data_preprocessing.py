@@ -1,9 +1,48 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
-from haversine import haversine, Unit
 
+from src.instrumentation import span, traced
+from src.utils import haversine_km
+
+# Day names indexed by `Series.dt.dayofweek` (Monday=0)
+DAY_NAMES = np.array(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'], dtype=object)
+
+# Time bucket for each hour of the day (e.g., Morning, Afternoon, Evening, Night)
+HOUR_TO_TIME_BUCKET = np.array(
+    ['Night'] * 5 + ['Morning'] * 7 + ['Afternoon'] * 5 + ['Evening'] * 4 + ['Night'] * 3,
+    dtype=object
+)
+
+
+# Shared dictionaries for the low-cardinality string columns in compact mode
+TIME_BUCKET_DTYPE = pd.CategoricalDtype(['Afternoon', 'Evening', 'Morning', 'Night'])
+DAY_OF_WEEK_DTYPE = pd.CategoricalDtype(list(DAY_NAMES))
+TIME_BUCKET_COLUMNS = ['Time_Bucket', 'Time_Bucket_Preferred', 'Busy_TimeBucket']
+CATEGORY_NAME_COLUMNS = ['Category_Name', 'Category_Name_Preferred']
+
+
+@traced(rows=lambda data: len(data) if isinstance(data, pd.DataFrame) else None)
+def load_data(filepath, compact=False, chunksize=None):
+    """
+    Load the raw dataset.
+
+    Args:
+        filepath (str): Raw check-in dataset (TSV or zip).
+        compact (bool): Read ids as categoricals instead of Python strings and convert
+            numeric User_IDs to int32 (see compact_dtypes).
+        chunksize (int, optional): Read the file lazily in chunks of this many rows.
+
+    Returns:
+        pd.DataFrame: The raw check-ins, or a reader yielding them chunk by chunk
+            (also usable with `get_chunk(n)`) when `chunksize` is given.
+    """
+    if compact and chunksize is not None:
+        raise ValueError("compact=True needs the whole file; convert each chunk with compact_dtypes instead.")
+    id_dtype = 'category' if compact else 'str'
 
-def load_data(filepath):
-    """Load the raw dataset."""
     # Load dataset
     data = pd.read_csv(
         filepath,
@@ -13,50 +52,277 @@ def load_data(filepath):
         names=['User_ID', 'Venue_ID', 'Venue_Category_ID', 'Category_Name',
             'Latitude', 'Longitude', 'Timezone_Offset', 'UTC_Time'],
         dtype={
-            'User_ID': 'str',
-            'Venue_ID': 'str',
-            'Venue_Category_ID': 'str',
+            'User_ID': id_dtype,
+            'Venue_ID': id_dtype,
+            'Venue_Category_ID': id_dtype,
             'Category_Name': 'category',
             'Latitude': 'float32',
             'Longitude': 'float32',
             'Timezone_Offset': 'int16',
             'UTC_Time': 'str'
-        }
+        },
+        chunksize=chunksize
     )
+    if chunksize is not None:
+        return data
+
+    if compact:
+        data = compact_dtypes(data)
 
     return data
 
-def preprocess_data(data):
-    """Clean and preprocess the dataset."""
-    # Remove duplicates
-    data = data.drop_duplicates()
-    data.reset_index(drop=True, inplace=True)
+def _compact_user_ids(user_ids):
+    """int32 User_IDs when every id is a decimal integer in range, categorical otherwise."""
+    categories = user_ids.cat.categories if isinstance(user_ids.dtype, pd.CategoricalDtype) else None
+    values = categories if categories is not None else user_ids
+    numeric = pd.to_numeric(pd.Series(values.astype(str)), errors='coerce')
+    info = np.iinfo(np.int32)
+
+    if len(numeric) and numeric.notna().all() and numeric.between(info.min, info.max).all() \
+            and (numeric.astype(np.int64).astype(str).to_numpy() == np.asarray(values, dtype=str)).all():
+        numeric = numeric.to_numpy(dtype=np.int32)
+        if categories is not None:
+            return pd.Series(numeric[user_ids.cat.codes.to_numpy()], index=user_ids.index)
+        return pd.Series(numeric, index=user_ids.index)
+
+    return user_ids.astype('category')
+
+def compact_dtypes(data):
+    """
+    Convert ids and low-cardinality columns to compact dtypes.
+
+    - User_ID becomes int32 when all ids are decimal integers (categorical otherwise).
+    - Venue_ID, Venue_Category_ID and Broader_Category become categoricals (integer codes).
+    - Category_Name and Category_Name_Preferred share one category dictionary, and the
+      three time-bucket columns share TIME_BUCKET_DTYPE; Day_of_Week uses DAY_OF_WEEK_DTYPE.
+    - Hour and Is_Weekend become int8.
+
+    Columns that are not present are skipped, so this works at any pipeline stage.
+
+    Args:
+        data (pd.DataFrame): Raw, cleaned or processed check-ins.
+
+    Returns:
+        pd.DataFrame: A copy with compact dtypes.
+    """
+    data = data.copy()
+
+    if 'User_ID' in data.columns:
+        data['User_ID'] = _compact_user_ids(data['User_ID'])
+
+    for column in ['Venue_ID', 'Venue_Category_ID', 'Broader_Category']:
+        if column in data.columns:
+            data[column] = data[column].astype('category')
+
+    category_columns = [column for column in CATEGORY_NAME_COLUMNS if column in data.columns]
+    if category_columns:
+        names = pd.Index([])
+        for column in category_columns:
+            values = data[column]
+            uniques = values.cat.categories if isinstance(values.dtype, pd.CategoricalDtype) else values.dropna().unique()
+            names = names.union(pd.Index(uniques))
+        shared = pd.CategoricalDtype(names)
+        for column in category_columns:
+            data[column] = data[column].astype(object).astype(shared)
+
+    for column in TIME_BUCKET_COLUMNS:
+        if column in data.columns:
+            data[column] = data[column].astype(TIME_BUCKET_DTYPE)
+
+    if 'Day_of_Week' in data.columns:
+        data['Day_of_Week'] = data['Day_of_Week'].astype(DAY_OF_WEEK_DTYPE)
+
+    for column in ['Hour', 'Is_Weekend']:
+        if column in data.columns:
+            data[column] = data[column].astype(np.int8)
 
-    # Handle missing values
-    data = data.dropna()
+    return data
 
+def memory_report(before, after):
+    """
+    Per-column memory usage of a dataset before and after compact_dtypes.
+
+    Args:
+        before (pd.DataFrame): Dataset with the default dtypes.
+        after (pd.DataFrame): The same dataset with compact dtypes.
+
+    Returns:
+        pd.DataFrame: Dtypes, bytes before/after and the reduction factor per column,
+            with a TOTAL row.
+    """
+    before_bytes = before.memory_usage(deep=True, index=False)
+    after_bytes = after.memory_usage(deep=True, index=False).reindex(before_bytes.index)
+
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'dtype_after': after.dtypes.reindex(before.columns).astype(str),
+        'bytes_before': before_bytes,
+        'bytes_after': after_bytes,
+    })
+    report.loc['TOTAL'] = ['', '', before_bytes.sum(), after_bytes.sum()]
+    report['reduction'] = (report['bytes_before'] / report['bytes_after']).round(1)
+    return report
+
+# Layout of UTC_Time, e.g. 'Tue Apr 03 18:00:09 +0000 2012'
+UTC_TIME_FORMAT = "%a %b %d %H:%M:%S %z %Y"
+_UTC_TIME_WIDTH = 30
+_UTC_TIME_SEPARATORS = {3: ' ', 7: ' ', 10: ' ', 13: ':', 16: ':', 19: ' ', 25: ' '}
+_UTC_TIME_DIGITS = [8, 9, 11, 12, 14, 15, 17, 18, 21, 22, 23, 24, 26, 27, 28, 29]
+_MONTH_ABBREVIATIONS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+_MONTH_DAYS = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+def _pack3(codepoints):
+    """One int64 per three-letter name, from its code points."""
+    codepoints = codepoints.astype(np.int64)
+    return (codepoints[..., 0] << 42) | (codepoints[..., 1] << 21) | codepoints[..., 2]
+
+_WEEKDAY_KEYS = _pack3(np.array([[ord(c) for c in name[:3]] for name in DAY_NAMES], dtype=np.int64))
+_MONTH_KEYS = _pack3(np.array([[ord(c) for c in name] for name in _MONTH_ABBREVIATIONS], dtype=np.int64))
+_MONTH_ORDER = np.argsort(_MONTH_KEYS)
+
+def _two_digits(chars, start):
+    return (chars[:, start] - 48) * 10 + (chars[:, start + 1] - 48)
+
+def _days_from_civil(year, month, day):
+    """Days since 1970-01-01 of proleptic Gregorian dates (vectorized)."""
+    year = year - (month <= 2)
+    era = np.floor_divide(year, 400)
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+def _parse_fixed_width(strings):
+    """
+    Parse UTC_Time strings in the exact canonical layout.
+
+    Returns:
+        tuple: UTC datetime64[ns] values and a mask of the strings that had the canonical
+            layout with in-range fields; everything else is left for the generic parser.
+    """
+    lengths = pd.Series(strings, dtype=object).str.len().to_numpy(dtype=np.float64, na_value=-1)
+    text = np.asarray(strings).astype(f'U{_UTC_TIME_WIDTH}')
+    chars = text.view(np.int32).reshape(len(text), _UTC_TIME_WIDTH)
+
+    valid = lengths == _UTC_TIME_WIDTH
+    for position, separator in _UTC_TIME_SEPARATORS.items():
+        valid &= chars[:, position] == ord(separator)
+    digits = chars[:, _UTC_TIME_DIGITS]
+    valid &= ((digits >= 48) & (digits <= 57)).all(axis=1)
+    valid &= (chars[:, 20] == ord('+')) | (chars[:, 20] == ord('-'))
+
+    valid &= np.isin(_pack3(chars[:, 0:3]), _WEEKDAY_KEYS)
+    month_keys = _pack3(chars[:, 4:7])
+    valid &= np.isin(month_keys, _MONTH_KEYS)
+    month = _MONTH_ORDER[np.minimum(np.searchsorted(_MONTH_KEYS, month_keys, sorter=_MONTH_ORDER), 11)] + 1
+
+    day, hour, minute, second = (_two_digits(chars, start) for start in (8, 11, 14, 17))
+    offset_hours, offset_minutes = _two_digits(chars, 21), _two_digits(chars, 23)
+    year = _two_digits(chars, 26) * 100 + _two_digits(chars, 28)
+
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_days = _MONTH_DAYS[month - 1] + (leap & (month == 2))
+    valid &= (day >= 1) & (day <= month_days) & (hour < 24) & (minute < 60) & (second < 60)
+    valid &= (offset_hours < 24) & (offset_minutes < 60)
+    # Stay well inside the datetime64[ns] range; the generic parser handles the edges
+    valid &= (year >= 1700) & (year <= 2200)
+
+    offset = np.where(chars[:, 20] == ord('-'), -1, 1) * (offset_hours * 60 + offset_minutes)
+    seconds = ((_days_from_civil(year, month, day).astype(np.int64) * 24 + hour) * 60 + minute) * 60 + second - offset * 60
+    utc = np.where(valid, seconds, 0).astype('datetime64[s]').astype('datetime64[ns]')
+    return utc, valid
+
+def parse_utc_time(utc_time):
+    """
+    Parse UTC_Time strings into naive UTC timestamps.
+
+    Same result as `pd.to_datetime(utc_time, format=UTC_TIME_FORMAT, errors='coerce', utc=True)`
+    without the timezone: each distinct string is parsed once, strings in the canonical
+    fixed-width layout are sliced straight into datetime64, and anything else (including
+    malformed values, which become NaT) goes through pandas.
+
+    Args:
+        utc_time (pd.Series or array-like): Timestamp strings; missing values allowed.
+
+    Returns:
+        np.ndarray: datetime64[ns] values, NaT where a string does not parse.
+    """
+    codes, uniques = pd.factorize(np.asarray(utc_time, dtype=object))
+    uniques = np.asarray(uniques, dtype=object)
+
+    parsed, valid = _parse_fixed_width(uniques)
+    if not valid.all():
+        others = pd.to_datetime(pd.Series(uniques[~valid], dtype=object), format=UTC_TIME_FORMAT,
+                                errors='coerce', utc=True)
+        parsed[~valid] = others.dt.tz_convert(None).to_numpy(dtype='datetime64[ns]')
+
+    # Missing values have code -1 and pick up the trailing NaT
+    return np.append(parsed, np.datetime64('NaT', 'ns'))[codes]
+
+def _parse_local_time(data):
+    """Replace UTC_Time and Timezone_Offset by Local_Time (NaT where UTC_Time does not parse)."""
     #------------------------
-    # Convert UTC time
-    data['UTC_Time'] = pd.to_datetime(data['UTC_Time'], format="%a %b %d %H:%M:%S %z %Y", errors='coerce')
-    data = data.dropna(subset=['UTC_Time'])
-
-    # Add timezone and local time
-    data['Timezone_Offset'] = pd.to_timedelta(data['Timezone_Offset'], unit='m')
-    data['Local_Time'] = data['UTC_Time'] + data['Timezone_Offset']
-
-    # Remove UTC label after applying the offset
-    data['Local_Time'] = data['Local_Time'].dt.tz_convert(None)
+    # Convert UTC time and apply the timezone offset (in minutes)
+    utc_time = parse_utc_time(data['UTC_Time'])
+    offset = data['Timezone_Offset'].to_numpy().astype('timedelta64[m]').astype('timedelta64[ns]')
+    data['Local_Time'] = utc_time + offset
 
     # Drop unnecessary columns
-    data = data.drop(columns=['UTC_Time', 'Timezone_Offset'])
-    
-    return data
-
-def feature_engineering(data, categories_path):
-    """Add engineered features like time buckets, user profiles, etc."""
+    return data.drop(columns=['UTC_Time', 'Timezone_Offset'])
+
+def _deduplicate_and_parse(data):
+    """Partition worker for preprocess_data: drop duplicates and parse times, keeping the row labels."""
+    # A shallow copy detaches the partition from its parent frame before columns are replaced
+    return _parse_local_time(data.drop_duplicates().copy(deep=False))
+
+def _hash_partitions(data, keys, n_partitions):
+    """Split `data` by `keys` modulo `n_partitions`, keeping row order within each partition."""
+    partition = (keys % n_partitions).astype(np.int64)
+    order = np.argsort(partition, kind='stable')
+    bounds = np.cumsum(np.bincount(partition, minlength=n_partitions))[:-1]
+    return [data.iloc[rows] for rows in np.split(order, bounds)]
+
+@traced(rows=len)
+def preprocess_data(data, n_jobs=1):
+    """
+    Clean and preprocess the dataset.
+
+    Args:
+        data (pd.DataFrame): Raw check-ins (output of load_data).
+        n_jobs (int): Worker processes; 1 runs in-process, -1 uses all cores. Rows are
+            hash-partitioned by User_ID (duplicates always share a partition) and the
+            result is identical to the in-process one.
+
+    Returns:
+        pd.DataFrame: Deduplicated check-ins with Local_Time instead of UTC_Time and
+            Timezone_Offset, without rows that have missing values or unparseable times.
+    """
+    if n_jobs == -1:
+        n_jobs = os.cpu_count() or 1
+
+    if n_jobs == 1:
+        # Remove duplicates
+        data = data.drop_duplicates()
+        data.reset_index(drop=True, inplace=True)
+
+        # Handle missing values
+        data = data.dropna()
+
+        data = _parse_local_time(data)
+        return data.dropna(subset=['Local_Time'])
+
+    keys = pd.util.hash_array(data['User_ID'].to_numpy(dtype=object))
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        parts = list(executor.map(_deduplicate_and_parse, _hash_partitions(data, keys, n_jobs)))
+
+    # Back in file order, labelled by position among the deduplicated rows as above;
+    # an unparseable time is NaT by now, so one dropna covers both filters
+    data = pd.concat(parts).sort_index()
+    data.reset_index(drop=True, inplace=True)
+    return data.dropna()
 
-    #print('Add Broader Categories')
-    # Load category mapping
+def load_category_table(categories_path):
+    """Load the category mapping table, keyed by Venue_Category_ID."""
     category_table = pd.read_csv(categories_path)
 
     # Add missing categories dynamically if needed
@@ -67,105 +333,236 @@ def feature_engineering(data, categories_path):
     })
     category_table = pd.concat([category_table, missing_category], ignore_index=True)
 
-    # Rename and merge
+    # Rename for the merge
     category_table.rename(columns={'Category ID': 'Venue_Category_ID'}, inplace=True)
-    data = data.merge(category_table, on='Venue_Category_ID', how='left')
-
-    # Extract broader categories
-    data['Broader_Category'] = data['Category Label'].str.split(' > ').str[0]
+    return category_table
 
-    # Keep only the relevant columns
-    data = data.drop(columns=['Category Label','Category Name'])
+def add_broader_category(data, category_table):
+    """Add the top-level Broader_Category of each check-in's venue category."""
+    # Extract broader categories once per category rather than once per check-in
+    broader_categories = category_table.drop_duplicates('Venue_Category_ID').set_index('Venue_Category_ID')
+    broader_categories = broader_categories['Category Label'].str.split(' > ').str[0]
 
-    #------------------------
-    #print("Derive Temporal Features")
+    data = data.reset_index(drop=True)
+    data['Broader_Category'] = data['Venue_Category_ID'].map(broader_categories)
+    return data
 
+def add_temporal_features(data):
+    """Add day of week, weekend flag, hour and time bucket columns derived from Local_Time."""
     # Extract day of the week
-    data['Day_of_Week'] = data['Local_Time'].dt.day_name()
+    day_of_week = data['Local_Time'].dt.dayofweek.to_numpy()
+    data['Day_of_Week'] = DAY_NAMES[day_of_week]
 
     # Identify if the visit was on a weekend
-    data['Is_Weekend'] = data['Day_of_Week'].isin(['Saturday', 'Sunday']).astype(int)
+    data['Is_Weekend'] = (day_of_week >= 5).astype(int)
 
     # Extract hour to categorize the time of visit
     data['Hour'] = data['Local_Time'].dt.hour
 
-    # Create time buckets (e.g., Morning, Afternoon, Evening, Night)
-    def time_bucket(hour):
-        if 5 <= hour < 12:
-            return 'Morning'
-        elif 12 <= hour < 17:
-            return 'Afternoon'
-        elif 17 <= hour < 21:
-            return 'Evening'
-        else:
-            return 'Night'
-
-    data['Time_Bucket'] = data['Hour'].apply(time_bucket)
-
-    #------------------------------
-    #print("Create User Profiles")
-    # Most visited category for each user
-    user_top_category = (
-        data.groupby(['User_ID', 'Category_Name'])
-        .size()
-        .reset_index(name='Visit_Count')
-        .sort_values(['User_ID', 'Visit_Count'], ascending=[True, False])
-        .drop_duplicates('User_ID')
-    )
-    data = data.merge(user_top_category[['User_ID', 'Category_Name']], on='User_ID', how='left', suffixes=('', '_Preferred'))
+    # Map each hour to its time bucket with a lookup table
+    data['Time_Bucket'] = HOUR_TO_TIME_BUCKET[data['Hour'].to_numpy()]
+
+    return data
 
-    # Most frequent time bucket for each user
-    user_top_time = (
-        data.groupby(['User_ID', 'Time_Bucket'])
+# Check-in columns of the wide frame, in order, followed by the per-user and per-venue columns
+CHECKIN_COLUMNS = ['User_ID', 'Venue_ID', 'Venue_Category_ID', 'Category_Name', 'Latitude', 'Longitude',
+                   'Local_Time', 'Broader_Category', 'Day_of_Week', 'Is_Weekend', 'Hour', 'Time_Bucket']
+WIDE_COLUMNS = CHECKIN_COLUMNS + ['Category_Name_Preferred', 'Time_Bucket_Preferred', 'Popularity_Score',
+                                  'totalVisits', 'Busy_TimeBucket', 'Avg_Latitude', 'Avg_Longitude',
+                                  'Distance_From_Center']
+
+# String columns of the check-in table stored as categoricals in the star schema
+_FACT_CATEGORICAL_COLUMNS = ['Venue_Category_ID', 'Broader_Category', 'Day_of_Week', 'Time_Bucket']
+
+
+class StarSchema:
+    """
+    Processed check-ins as a slim fact table plus user and venue dimension tables.
+
+    Attributes:
+        checkins (pd.DataFrame): One row per check-in, keyed by integer user_key and
+            venue_key, with the per-check-in columns (low-cardinality strings as categoricals).
+        users (pd.DataFrame): One row per user_key: User_ID, Category_Name_Preferred,
+            Time_Bucket_Preferred, Avg_Latitude, Avg_Longitude.
+        venues (pd.DataFrame): One row per venue_key: Venue_ID, Popularity_Score,
+            totalVisits, Busy_TimeBucket.
+    """
+
+    def __init__(self, checkins, users, venues):
+        self.checkins = checkins
+        self.users = users
+        self.venues = venues
+
+    def __len__(self):
+        return len(self.checkins)
+
+    @property
+    def empty(self):
+        return self.checkins.empty
+
+    def to_wide(self, columns=None):
+        """
+        Reproduce the wide frame returned by feature_engineering(normalized=False).
+
+        Args:
+            columns (list, optional): Only build these wide columns (in the given order).
+
+        Returns:
+            pd.DataFrame: One row per check-in with user and venue attributes repeated.
+        """
+        columns = WIDE_COLUMNS if columns is None else columns
+        user_keys = self.checkins['user_key'].to_numpy()
+        venue_keys = self.checkins['venue_key'].to_numpy()
+
+        wide = {}
+        for column in columns:
+            if column in self.users.columns:
+                values = self.users[column].take(user_keys)
+            elif column in self.venues.columns:
+                values = self.venues[column].take(venue_keys)
+            elif column in _FACT_CATEGORICAL_COLUMNS:
+                values = self.checkins[column].astype(object)
+            else:
+                values = self.checkins[column]
+            wide[column] = values.to_numpy() if not isinstance(values.dtype, pd.CategoricalDtype) else values.array
+
+        return pd.DataFrame(wide, index=pd.RangeIndex(len(self.checkins)))
+
+
+def _most_frequent(data, key, column):
+    """Most frequent value of `column` per `key`; ties go to the value groupby sorts first."""
+    return (
+        data.groupby([key, column], observed=True)
         .size()
         .reset_index(name='Visit_Count')
-        .sort_values(['User_ID', 'Visit_Count'], ascending=[True, False])
-        .drop_duplicates('User_ID')
+        .sort_values([key, 'Visit_Count'], ascending=[True, False])
+        .drop_duplicates(key)
+        .set_index(key)[column]
     )
-    data = data.merge(user_top_time[['User_ID', 'Time_Bucket']], on='User_ID', how='left', suffixes=('', '_Preferred'))
-    #---------------------------------
-    #print("Compute venue popularity")
-
-    # Compute venue popularity
-    venue_popularity = data.groupby('Venue_ID')['User_ID'].count().reset_index(name='totalVisits')
-
-    # Normalize popularity
-    venue_popularity['Popularity_Score'] = venue_popularity['totalVisits'] / venue_popularity['totalVisits'].max()
-
-    # Merge popularity back into the main dataset
-    data = data.merge(venue_popularity[['Venue_ID', 'Popularity_Score']], on='Venue_ID', how='left')
-    data = data.merge(venue_popularity[['Venue_ID', 'totalVisits']], on='Venue_ID', how='left')
 
-    #-----------------------------
-        # Count visits per venue and time bucket
-    venue_time_bucket_visits = data.groupby(['Venue_ID', 'Time_Bucket']).size().reset_index(name='Visit_Count')
+def _user_aggregates(data):
+    """Per-user_key preferred category and time bucket plus mean coordinates."""
+    aggregates = data.groupby('user_key')[['Latitude', 'Longitude']].mean()
+    return pd.DataFrame({
+        # Most visited category and most frequent time bucket for each user
+        'Category_Name_Preferred': _most_frequent(data, 'user_key', 'Category_Name'),
+        'Time_Bucket_Preferred': _most_frequent(data, 'user_key', 'Time_Bucket'),
+        # User's average latitude and longitude
+        'Avg_Latitude': aggregates['Latitude'],
+        'Avg_Longitude': aggregates['Longitude'],
+    })
 
-    # Identify the most popular time bucket for each venue
-    venue_top_time_bucket = venue_time_bucket_visits.sort_values(['Venue_ID', 'Visit_Count'], ascending=[True, False])\
-        .drop_duplicates('Venue_ID')\
-        .rename(columns={'Time_Bucket': 'Busy_TimeBucket', 'Visit_Count': 'Max_Visit_Count'})
+def _venue_aggregates(data):
+    """Per-venue_key most popular time bucket."""
+    return pd.DataFrame({'Busy_TimeBucket': _most_frequent(data, 'venue_key', 'Time_Bucket')})
+
+def _aggregate_partitions(executor, func, data, key, n_partitions):
+    """Run `func` on each hash partition of `data` by `key` and stack the per-key results."""
+    if executor is None:
+        return func(data)
+    parts = _hash_partitions(data, data[key].to_numpy(), n_partitions)
+    return pd.concat(executor.map(func, parts))
+
+def build_star_schema(data, categories_path, n_jobs=1):
+    """
+    Engineer features into a StarSchema without merging aggregates back onto every check-in.
+
+    Args:
+        data (pd.DataFrame): Cleaned check-ins (output of preprocess_data).
+        categories_path (str): Category mapping table.
+        n_jobs (int): Worker processes for the user and venue aggregates; 1 runs
+            in-process, -1 uses all cores. Check-ins are partitioned by user for the
+            user aggregates and by venue for the venue ones, so every group is
+            aggregated whole and the result is identical to the in-process one.
+
+    Returns:
+        StarSchema: Check-in fact table plus user and venue dimension tables.
+    """
+    if n_jobs == -1:
+        n_jobs = os.cpu_count() or 1
+
+    with span('feature_engineering.broader_category', rows=len(data)):
+        # Load category mapping
+        category_table = load_category_table(categories_path)
+        data = add_broader_category(data, category_table)
 
-    # Merge the most popular time bucket back into the main dataset
-    data = data.merge(venue_top_time_bucket[['Venue_ID', 'Busy_TimeBucket']], on='Venue_ID', how='left')
-    #print(data[['Venue_ID', 'Category_Name', 'Busy_TimeBucket']].head(10))
+    #------------------------
+    with span('feature_engineering.temporal_features', rows=len(data)):
+        data = add_temporal_features(data)
+
+    # Integer surrogate keys, in order of first appearance
+    user_keys, user_ids = pd.factorize(data['User_ID'])
+    venue_keys, venue_ids = pd.factorize(data['Venue_ID'])
+    data['user_key'] = user_keys.astype(np.int32)
+    data['venue_key'] = venue_keys.astype(np.int32)
+
+    # Only what the aggregates read, with time buckets as small integer codes
+    # (TIME_BUCKET_DTYPE keeps the alphabetical order that breaks ties)
+    slim = data[['user_key', 'venue_key', 'Category_Name', 'Latitude', 'Longitude']].copy()
+    slim['Time_Bucket'] = data['Time_Bucket'].astype(TIME_BUCKET_DTYPE)
+
+    executor = ProcessPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else None
+    try:
+        #------------------------------
+        with span('feature_engineering.user_profiles', rows=len(user_ids)):
+            users = pd.DataFrame({'User_ID': user_ids}, index=pd.RangeIndex(len(user_ids), name='user_key'))
+            user_aggregates = _aggregate_partitions(executor, _user_aggregates, slim, 'user_key', n_jobs)
+            for column in user_aggregates.columns:
+                users[column] = user_aggregates[column]
+            users['Time_Bucket_Preferred'] = users['Time_Bucket_Preferred'].astype(object)
+
+        #---------------------------------
+        with span('feature_engineering.venue_popularity', rows=len(venue_ids)):
+            venues = pd.DataFrame({'Venue_ID': venue_ids}, index=pd.RangeIndex(len(venue_ids), name='venue_key'))
+
+            # Compute and normalize venue popularity
+            total_visits = np.bincount(venue_keys, minlength=len(venue_ids)).astype(np.int64)
+            venues['Popularity_Score'] = total_visits / total_visits.max() if len(total_visits) else total_visits
+            venues['totalVisits'] = total_visits
+
+            # Identify the most popular time bucket for each venue
+            venue_aggregates = _aggregate_partitions(executor, _venue_aggregates, slim, 'venue_key', n_jobs)
+            venues['Busy_TimeBucket'] = venue_aggregates['Busy_TimeBucket'].astype(object)
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
     #--------------------------------
-    #print("Compute Geographic Features")
-
-    # Compute user's average latitude and longitude
-    user_location_center = data.groupby('User_ID')[['Latitude', 'Longitude']].mean().reset_index()
-    user_location_center.rename(columns={'Latitude': 'Avg_Latitude', 'Longitude': 'Avg_Longitude'}, inplace=True)
-
-    # Merge user's central location into the main dataset
-    data = data.merge(user_location_center, on='User_ID', how='left')
-
-    # Compute distance from the user's central location
-    data['Distance_From_Center'] = data.apply(
-        lambda row: haversine(
-            (row['Avg_Latitude'], row['Avg_Longitude']),
-            (row['Latitude'], row['Longitude']),
-            unit=Unit.KILOMETERS
-        ), axis=1
-    )
-
-    return data
\ No newline at end of file
+    with span('feature_engineering.geographic_features', rows=len(data)):
+        # Compute distance from the user's central location
+        data['Distance_From_Center'] = haversine_km(
+            users['Avg_Latitude'].to_numpy()[user_keys], users['Avg_Longitude'].to_numpy()[user_keys],
+            data['Latitude'].to_numpy(), data['Longitude'].to_numpy()
+        )
+
+    # Slim fact table: keys instead of ids, repeated strings as categoricals
+    checkins = data[['user_key', 'venue_key'] + CHECKIN_COLUMNS[2:] + ['Distance_From_Center']]
+    checkins = checkins.astype({column: 'category' for column in _FACT_CATEGORICAL_COLUMNS})
+
+    return StarSchema(checkins, users.reset_index(), venues.reset_index())
+
+@traced(rows=len)
+def feature_engineering(data, categories_path, normalized=False, compact=False, n_jobs=1):
+    """
+    Add engineered features like time buckets, user profiles, etc.
+
+    Args:
+        data (pd.DataFrame): Cleaned check-ins (output of preprocess_data).
+        categories_path (str): Category mapping table.
+        normalized (bool): Return a StarSchema (slim check-ins plus users and venues
+            tables) instead of the wide frame with user and venue attributes on every row.
+        compact (bool): Convert the output to compact dtypes (see compact_dtypes).
+        n_jobs (int): Worker processes for the user and venue aggregates (see build_star_schema).
+
+    Returns:
+        pd.DataFrame or StarSchema: The engineered dataset.
+    """
+    schema = build_star_schema(data, categories_path, n_jobs=n_jobs)
+    if normalized:
+        if compact:
+            schema = StarSchema(compact_dtypes(schema.checkins), compact_dtypes(schema.users),
+                                compact_dtypes(schema.venues))
+        return schema
+
+    data = schema.to_wide()
+    return compact_dtypes(data) if compact else data
@@ -0,0 +1,265 @@
+"""
+Offline evaluation of the venue recommenders on a chronological holdout.
+
+Each user's check-ins are split in time: the earliest ones train the features
+and indexes, the latest ones are held out. A recommender then ranks unvisited
+venues for every user, and the ranking is scored against the venues the user
+went on to visit for the first time in the holdout (precision@k, recall@k,
+NDCG@k), plus catalog and user coverage over the whole population.
+
+Recommenders are expressed as ranked venue lists plus the list each user reads
+(their preferred broader category's list, the global popularity list, their own
+co-visitation list), so
+the per-user scoring is a handful of vectorized array operations over a block
+of users, sharded across worker processes.
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.collaborative import CoVisitationModel
+from src.data_preprocessing import StarSchema, CHECKIN_COLUMNS, feature_engineering
+from src.instrumentation import traced
+from src.recommendation_unvisisted import build_category_index
+from src.utils import contains_sorted, first_unvisited
+
+# The columns of a cleaned check-in (output of preprocess_data)
+CLEANED_COLUMNS = CHECKIN_COLUMNS[:7]
+
+# Users scored per task when sharding over processes
+USERS_PER_SHARD = 2048
+
+
+def chronological_split(data, test_fraction=0.2):
+    """
+    Hold out the latest check-ins of every user.
+
+    Args:
+        data (pd.DataFrame): Cleaned check-ins with User_ID and Local_Time.
+        test_fraction (float): Share of each user's check-ins held out (rounded down,
+            so users with few check-ins keep all of them for training).
+
+    Returns:
+        tuple: (train, test) DataFrames, each in the original row order.
+    """
+    if not 0 < test_fraction < 1:
+        raise ValueError("test_fraction must be between 0 and 1.")
+
+    user_codes = pd.factorize(data['User_ID'])[0]
+    # Stable sort by time within user, so equal timestamps keep dataset order
+    order = np.lexsort((data['Local_Time'].to_numpy(), user_codes))
+    counts = np.bincount(user_codes)
+    first = np.cumsum(counts) - counts
+    rank = np.empty(len(data), dtype=np.int64)
+    rank[order] = np.arange(len(data)) - np.repeat(first, counts)
+
+    n_test = np.floor(counts * test_fraction).astype(np.int64)
+    is_test = rank >= (counts - n_test)[user_codes]
+    return data[~is_test], data[is_test]
+
+
+#------------------------------
+# Recommenders as ranked venue lists
+
+def _category_lists(schema, venue_ids, k):
+    """
+    One list per broader category, ordered like CategoryIndex serves it; each user
+    reads the list of their preferred category's broader category.
+    """
+    index = build_category_index(schema)
+    broader_names = list(index.venues_by_broader)
+    lists = [venue_ids.get_indexer(index.venues_by_broader[broader]['Venue_ID']) for broader in broader_names]
+
+    preferred = schema.users['Category_Name_Preferred'].astype(str).str.lower()
+    broader_of_user = preferred.map(index.broader_by_category)
+    user_list = pd.Index(broader_names).get_indexer(broader_of_user)
+    return lists, user_list
+
+def _popularity_lists(schema, venue_ids, k):
+    """Every user reads one list of all venues, most visited first (ties by first appearance)."""
+    visits = schema.venues.set_index('Venue_ID')['totalVisits'].reindex(venue_ids).to_numpy()
+    order = np.argsort(-visits, kind='stable')
+    return [order], np.zeros(len(schema.users), dtype=np.int64)
+
+def _covisitation_lists(schema, venue_ids, k):
+    """Every user reads their own top-k list from a CoVisitationModel trained on the schema."""
+    model = CoVisitationModel(schema)
+    venues, _ = model.recommend_positions(np.arange(len(model)), k)
+    return [row[row >= 0] for row in venues], np.arange(len(model))
+
+# Ranked-list builder of each recommender: (schema, venue_ids, k) -> (lists, list read by each user)
+LIST_BUILDERS = {
+    'category': _category_lists,
+    'popularity': _popularity_lists,
+    'covisitation': _covisitation_lists,
+}
+
+RECOMMENDERS = tuple(LIST_BUILDERS)
+
+
+#------------------------------
+# Vectorized scoring of a block of users
+
+# Arrays shared with pool workers (set once per worker by the initializer)
+_worker_arrays = None
+
+def _init_worker(arrays):
+    global _worker_arrays
+    _worker_arrays = arrays
+
+def _score_block(start, stop, k, arrays=None):
+    """
+    Top-k unvisited venues and their hits for users start:stop.
+
+    Returns:
+        tuple: Per-user recommendation counts, hits and DCG, and the distinct venues recommended.
+    """
+    arrays = _worker_arrays if arrays is None else arrays
+    n_venues = arrays['n_venues']
+    users = np.arange(start, stop)
+    lists = arrays['user_list'][users]
+    has_list = lists >= 0
+    users, lists = users[has_list], lists[has_list]
+
+    requests, items, rank = first_unvisited(users, arrays['list_offsets'][lists], arrays['list_offsets'][lists + 1],
+                                            arrays['list_venues'], arrays['visited_keys'], arrays['visited_counts'],
+                                            n_venues, k)
+    owner, venues = users[requests], arrays['list_venues'][items]
+    keys = owner.astype(np.int64) * n_venues + venues
+
+    hits = contains_sorted(arrays['relevant_keys'], keys)
+    local = owner - start
+    n_users = stop - start
+    return (
+        np.bincount(local, minlength=n_users),
+        np.bincount(local, weights=hits, minlength=n_users),
+        np.bincount(local, weights=hits / np.log2(rank + 2), minlength=n_users),
+        np.unique(venues),
+    )
+
+
+@traced(rows=lambda result: len(result[1]))
+def evaluate_recommender(data, categories_path, k=10, test_fraction=0.2, recommender='category', n_jobs=1):
+    """
+    Score a recommender for every user on a chronological holdout.
+
+    Args:
+        data (pd.DataFrame or StarSchema): Cleaned check-ins (output of preprocess_data)
+            or a processed dataset; only the cleaned check-in columns are used, and the
+            features are rebuilt from the training part alone.
+        categories_path (str): Category mapping table.
+        k (int): Recommendations per user.
+        test_fraction (float): Share of each user's latest check-ins held out.
+        recommender (str): 'category' (recommend_similar_category_locations with the
+            user's preferred category), 'popularity' (most visited unvisited venues) or
+            'covisitation' (CoVisitationModel).
+        n_jobs (int): Worker processes for the training features and the scoring; 1 runs
+            in-process, -1 uses all cores.
+
+    Returns:
+        tuple: Summary dict (mean precision@k, recall@k, NDCG@k over users with at least
+            one relevant venue, catalog and user coverage, sizes and timing) and a
+            per-user DataFrame.
+    """
+    if recommender not in RECOMMENDERS:
+        raise ValueError(f"Unknown recommender '{recommender}'; use one of {', '.join(RECOMMENDERS)}.")
+    if n_jobs == -1:
+        n_jobs = os.cpu_count() or 1
+    started = time.perf_counter()
+
+    data = data.to_wide(CLEANED_COLUMNS) if isinstance(data, StarSchema) else data[CLEANED_COLUMNS]
+    train, test = chronological_split(data, test_fraction)
+    schema = feature_engineering(train, categories_path, normalized=True, n_jobs=n_jobs)
+
+    # Users and venues as the integer keys of the training schema
+    user_ids = pd.Index(schema.users['User_ID'])
+    venue_ids = pd.Index(schema.venues['Venue_ID'])
+    n_venues = len(venue_ids)
+    train_user = schema.checkins['user_key'].to_numpy().astype(np.int64)
+    visited_keys = np.unique(train_user * n_venues + schema.checkins['venue_key'].to_numpy())
+
+    # Relevant: venues each user visits in the holdout and never in training
+    # (every user with held-out check-ins keeps at least one for training, so test users are known)
+    test_pairs = test[['User_ID', 'Venue_ID']].drop_duplicates()
+    test_user = user_ids.get_indexer(test_pairs['User_ID'])
+    test_venue = venue_ids.get_indexer(test_pairs['Venue_ID'])
+    test_venue, test_user = test_venue[test_user >= 0], test_user[test_user >= 0]
+    novel = (test_venue < 0) | ~contains_sorted(visited_keys, test_user.astype(np.int64) * n_venues + test_venue)
+    relevant_counts = np.bincount(test_user[novel], minlength=len(user_ids))
+    reachable = novel & (test_venue >= 0)
+    relevant_keys = np.unique(test_user[reachable].astype(np.int64) * n_venues + test_venue[reachable])
+
+    lists, user_list = LIST_BUILDERS[recommender](schema, venue_ids, k)
+    arrays = {
+        'n_venues': n_venues,
+        'user_list': np.asarray(user_list, dtype=np.int64),
+        'list_offsets': np.r_[0, np.cumsum([len(venues) for venues in lists])].astype(np.int64),
+        'list_venues': np.concatenate(lists).astype(np.int64) if lists else np.array([], dtype=np.int64),
+        'visited_counts': np.bincount(visited_keys // n_venues, minlength=len(user_ids)),
+        'visited_keys': visited_keys,
+        'relevant_keys': relevant_keys,
+    }
+
+    blocks = [(start, min(start + USERS_PER_SHARD, len(user_ids))) for start in range(0, len(user_ids), USERS_PER_SHARD)]
+    if n_jobs > 1 and len(blocks) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(arrays,)) as executor:
+            results = list(executor.map(_score_block, *zip(*blocks), [k] * len(blocks)))
+    else:
+        results = [_score_block(start, stop, k, arrays) for start, stop in blocks]
+
+    recommended = np.concatenate([result[0] for result in results]) if results else np.array([], dtype=np.int64)
+    hits = np.concatenate([result[1] for result in results]) if results else np.array([])
+    dcg = np.concatenate([result[2] for result in results]) if results else np.array([])
+    covered = np.unique(np.concatenate([result[3] for result in results])) if results else np.array([])
+
+    # Ideal DCG: all min(k, relevant) slots filled with hits
+    discounts = np.r_[0.0, np.cumsum(1 / np.log2(np.arange(k) + 2))]
+    ideal = discounts[np.minimum(relevant_counts, k)]
+    test_codes = user_ids.get_indexer(test['User_ID'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        per_user = pd.DataFrame({
+            'User_ID': user_ids,
+            'Train_Checkins': np.bincount(train_user, minlength=len(user_ids)),
+            'Test_Checkins': np.bincount(test_codes[test_codes >= 0], minlength=len(user_ids)),
+            'Relevant': relevant_counts,
+            'Recommended': recommended,
+            'Hits': hits.astype(np.int64),
+            'Precision': np.where(recommended > 0, hits / k, 0.0),
+            'Recall': np.where(relevant_counts > 0, hits / relevant_counts, np.nan),
+            'NDCG': np.where(relevant_counts > 0, dcg / ideal, np.nan),
+        })
+
+    evaluated = per_user[per_user['Relevant'] > 0]
+    summary = {
+        'recommender': recommender,
+        'k': k,
+        'test_fraction': test_fraction,
+        'users': len(per_user),
+        'users_evaluated': len(evaluated),
+        'train_checkins': len(train),
+        'test_checkins': len(test),
+        f'precision@{k}': float(evaluated['Precision'].mean()) if len(evaluated) else 0.0,
+        f'recall@{k}': float(evaluated['Recall'].mean()) if len(evaluated) else 0.0,
+        f'ndcg@{k}': float(evaluated['NDCG'].mean()) if len(evaluated) else 0.0,
+        'catalog_coverage': len(covered) / n_venues if n_venues else 0.0,
+        'user_coverage': float((per_user['Recommended'] > 0).mean()) if len(per_user) else 0.0,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    return summary, per_user
+
+def write_report(summary, per_user, output_dir):
+    """
+    Write summary.json and per_user.csv for one evaluation run.
+
+    Returns:
+        str: The output directory.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, 'summary.json'), 'w') as handle:
+        json.dump(summary, handle, indent=1)
+    per_user.to_csv(os.path.join(output_dir, 'per_user.csv'), index=False)
+    return output_dir
@@ -0,0 +1,266 @@
+import numpy as np
+import pandas as pd
+
+from src.data_preprocessing import load_category_table, add_broader_category, add_temporal_features
+from src.utils import haversine_km
+
+# Time buckets in the order groupby sorts them, so argmax breaks ties like feature_engineering
+TIME_BUCKETS = np.array(['Afternoon', 'Evening', 'Morning', 'Night'], dtype=object)
+
+
+def _grow(array, size):
+    """Return `array` with room for at least `size` rows (zero-filled, doubling capacity)."""
+    if size <= len(array):
+        return array
+    capacity = max(size, 2 * len(array), 16)
+    grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def _kahan_add(sums, compensation, rows, values):
+    """
+    Add `values` into `sums[rows]` with Kahan compensation, row by row in input order.
+
+    This replays the float32 Kahan summation pandas uses for groupby means, so
+    running means match a full recompute bit for bit. Rows for distinct
+    targets are added together; repeated targets are handled in rounds.
+    """
+    order = np.argsort(rows, kind='stable')
+    sorted_rows = rows[order]
+    starts = np.flatnonzero(np.r_[True, sorted_rows[1:] != sorted_rows[:-1]])
+    rank = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)]))
+
+    by_round = np.argsort(rank, kind='stable')
+    round_sizes = np.bincount(rank)
+    for positions in np.split(order[by_round], np.cumsum(round_sizes)[:-1]):
+        target = rows[positions]
+        y = values[positions] - compensation[target]
+        t = sums[target] + y
+        compensation[target] = (t - sums[target]) - y
+        sums[target] = t
+
+
+class IncrementalFeatureStore:
+    """
+    Running per-user and per-venue aggregates behind feature_engineering.
+
+    Feed it check-ins in the shape returned by preprocess_data, in as many
+    batches as they arrive. Each `apply_batch` costs time proportional to the
+    batch (plus the users and venues it touches), not to the full history, and
+    leaves the store describing exactly what feature_engineering would compute
+    over all check-ins seen so far, including ties.
+
+    Popularity_Score is derived at read time from totalVisits and the running
+    maximum, so it stays normalized when a batch raises the global max.
+
+    Every batch bumps `version`; a ResultCache given to the store follows it, so
+    results cached before a batch are never served after it.
+    """
+
+    def __init__(self, categories_path, cache=None):
+        """
+        Args:
+            categories_path (str): Category mapping table used to derive Broader_Category.
+            cache (ResultCache, optional): Cache of results computed from this store's features.
+        """
+        self.category_table = load_category_table(categories_path)
+        self.version = 0
+        self.cache = cache
+        if cache is not None:
+            cache.set_version(self.version)
+        self.n_checkins = 0
+
+        # Users
+        self._user_rows = {}
+        self.user_ids = []
+        self._user_bucket_counts = np.zeros((0, len(TIME_BUCKETS)), dtype=np.int64)
+        self._user_coord_sums = np.zeros((0, 2), dtype=np.float32)
+        self._user_coord_compensation = np.zeros((0, 2), dtype=np.float32)
+        self._user_counts = np.zeros(0, dtype=np.int64)
+        self._user_category_counts = {}
+        self._user_top_category = {}
+        self._category_codes = {}
+        self.category_names = []
+
+        # Venues
+        self._venue_rows = {}
+        self.venue_ids = []
+        self._venue_bucket_counts = np.zeros((0, len(TIME_BUCKETS)), dtype=np.int64)
+        self._venue_totals = np.zeros(0, dtype=np.int64)
+        self.max_visits = 0
+
+    @staticmethod
+    def _rows_for(ids, rows, id_list):
+        """Map ids to row numbers, registering unseen ids."""
+        codes, uniques = pd.factorize(ids)
+        for key in uniques:
+            if key not in rows:
+                rows[key] = len(id_list)
+                id_list.append(key)
+        unique_rows = np.fromiter((rows[key] for key in uniques), dtype=np.int64, count=len(uniques))
+        return unique_rows[codes]
+
+    def _update_top_categories(self, user_rows, categories):
+        """Fold (user, category) visit counts into the running most-visited category per user."""
+        # One int key per (user, category) pair keeps the counts dict small
+        codes = self._rows_for(categories, self._category_codes, self.category_names)
+        keys, deltas = np.unique((user_rows << 32) | codes, return_counts=True)
+
+        counts = self._user_category_counts
+        top = self._user_top_category
+        names = self.category_names
+        for key, delta in zip(keys.tolist(), deltas.tolist()):
+            count = counts.get(key, 0) + delta
+            counts[key] = count
+
+            user, category = key >> 32, key & 0xFFFFFFFF
+            best = top.get(user)
+            # Counts only grow, so comparing against the live best is enough;
+            # ties go to the name groupby sorts first, as in feature_engineering
+            if best is None or best[1] == category or count > best[0] or \
+                    (count == best[0] and names[category] < names[best[1]]):
+                top[user] = (count, category)
+
+    def apply_batch(self, batch, enrich=True):
+        """
+        Add a batch of new check-ins.
+
+        Args:
+            batch (pd.DataFrame): New check-ins as returned by preprocess_data.
+            enrich (bool): Attach the user and venue features to the returned batch.
+                When False, the batch gets integer user_key and venue_key columns
+                (store rows, in order of first appearance) instead.
+
+        Returns:
+            pd.DataFrame: The batch with every engineered column, computed against
+                the aggregates after the update.
+        """
+        batch = add_broader_category(batch, self.category_table)
+        batch = add_temporal_features(batch)
+        if batch.empty:
+            if not enrich:
+                batch['user_key'] = batch['venue_key'] = np.zeros(0, dtype=np.int32)
+                return batch
+            return self.enrich(batch)
+
+        bucket_codes = np.searchsorted(TIME_BUCKETS, batch['Time_Bucket'].to_numpy())
+
+        #------------------------------
+        # Users: category and time bucket counts, coordinate sums
+        user_rows = self._rows_for(batch['User_ID'].to_numpy(), self._user_rows, self.user_ids)
+        n_users = len(self.user_ids)
+        self._user_bucket_counts = _grow(self._user_bucket_counts, n_users)
+        self._user_coord_sums = _grow(self._user_coord_sums, n_users)
+        self._user_coord_compensation = _grow(self._user_coord_compensation, n_users)
+        self._user_counts = _grow(self._user_counts, n_users)
+
+        np.add.at(self._user_bucket_counts, (user_rows, bucket_codes), 1)
+        _kahan_add(self._user_coord_sums, self._user_coord_compensation, user_rows,
+                   batch[['Latitude', 'Longitude']].to_numpy(dtype=np.float32))
+        np.add.at(self._user_counts, user_rows, 1)
+        self._update_top_categories(user_rows, batch['Category_Name'].astype(str).to_numpy())
+
+        #------------------------------
+        # Venues: visit totals and time bucket counts
+        venue_rows = self._rows_for(batch['Venue_ID'].to_numpy(), self._venue_rows, self.venue_ids)
+        n_venues = len(self.venue_ids)
+        self._venue_bucket_counts = _grow(self._venue_bucket_counts, n_venues)
+        self._venue_totals = _grow(self._venue_totals, n_venues)
+
+        np.add.at(self._venue_bucket_counts, (venue_rows, bucket_codes), 1)
+        np.add.at(self._venue_totals, venue_rows, 1)
+        # Totals only grow, so the global max can only move to a venue in this batch
+        self.max_visits = max(self.max_visits, int(self._venue_totals[venue_rows].max()))
+
+        self.n_checkins += len(batch)
+        self.version += 1
+        if self.cache is not None:
+            self.cache.set_version(self.version)
+
+        if not enrich:
+            batch['user_key'] = user_rows.astype(np.int32)
+            batch['venue_key'] = venue_rows.astype(np.int32)
+            return batch
+        return self.enrich(batch)
+
+    def user_features(self, user_ids=None):
+        """
+        Current per-user features.
+
+        Args:
+            user_ids (list, optional): Users to return; all users if omitted.
+
+        Returns:
+            pd.DataFrame: User_ID, Category_Name_Preferred, Time_Bucket_Preferred,
+                Avg_Latitude and Avg_Longitude.
+        """
+        if user_ids is None:
+            user_ids = self.user_ids
+        rows = np.array([self._user_rows[user_id] for user_id in user_ids], dtype=np.int64)
+
+        centers = self._user_coord_sums[rows].astype(np.float64) / self._user_counts[rows, None]
+        return pd.DataFrame({
+            'User_ID': list(user_ids),
+            'Category_Name_Preferred': [self.category_names[self._user_top_category[row][1]] for row in rows],
+            'Time_Bucket_Preferred': TIME_BUCKETS[self._user_bucket_counts[rows].argmax(axis=1)],
+            'Avg_Latitude': centers[:, 0].astype(np.float32),
+            'Avg_Longitude': centers[:, 1].astype(np.float32),
+        })
+
+    def venue_features(self, venue_ids=None):
+        """
+        Current per-venue features.
+
+        Args:
+            venue_ids (list, optional): Venues to return; all venues if omitted.
+
+        Returns:
+            pd.DataFrame: Venue_ID, Popularity_Score, totalVisits and Busy_TimeBucket.
+        """
+        if venue_ids is None:
+            venue_ids = self.venue_ids
+        rows = np.array([self._venue_rows[venue_id] for venue_id in venue_ids], dtype=np.int64)
+
+        totals = self._venue_totals[rows]
+        return pd.DataFrame({
+            'Venue_ID': list(venue_ids),
+            'Popularity_Score': totals / self.max_visits if self.max_visits else totals.astype(np.float64),
+            'totalVisits': totals,
+            'Busy_TimeBucket': TIME_BUCKETS[self._venue_bucket_counts[rows].argmax(axis=1)],
+        })
+
+    def enrich(self, checkins):
+        """
+        Attach the current user and venue features to check-ins.
+
+        Args:
+            checkins (pd.DataFrame): Check-ins with Broader_Category and the temporal
+                columns (e.g. rows previously returned by apply_batch).
+
+        Returns:
+            pd.DataFrame: Check-ins with the same columns, in the same order, as feature_engineering.
+        """
+        checkins = checkins.drop(columns=[
+            'Category_Name_Preferred', 'Time_Bucket_Preferred', 'Popularity_Score', 'totalVisits',
+            'Busy_TimeBucket', 'Avg_Latitude', 'Avg_Longitude', 'Distance_From_Center'
+        ], errors='ignore')
+
+        users = self.user_features(pd.unique(checkins['User_ID']))
+        venues = self.venue_features(pd.unique(checkins['Venue_ID']))
+
+        data = checkins.merge(users[['User_ID', 'Category_Name_Preferred', 'Time_Bucket_Preferred']],
+                              on='User_ID', how='left')
+        if isinstance(checkins['Category_Name'].dtype, pd.CategoricalDtype):
+            # Preferred categories may come from earlier batches, so widen the dictionary
+            categories = checkins['Category_Name'].cat.categories.union(
+                pd.Index(data['Category_Name_Preferred'].unique()))
+            data['Category_Name_Preferred'] = pd.Categorical(data['Category_Name_Preferred'], categories=categories)
+        data = data.merge(venues, on='Venue_ID', how='left')
+        data = data.merge(users[['User_ID', 'Avg_Latitude', 'Avg_Longitude']], on='User_ID', how='left')
+
+        data['Distance_From_Center'] = haversine_km(
+            data['Avg_Latitude'].to_numpy(), data['Avg_Longitude'].to_numpy(),
+            data['Latitude'].to_numpy(), data['Longitude'].to_numpy()
+        )
+        return data
@@ -0,0 +1,310 @@
+"""
+Lightweight spans around pipeline stages and recommender calls.
+
+Each span records wall time, CPU time, resident memory growth and a row count.
+Finished spans are kept in a bounded buffer (exportable as JSON lines) and
+folded into per-name totals (exportable as Prometheus text). One switch,
+`profile=True` on a span or `TRACER.profile_next()`, runs a span under cProfile
+and attaches the hottest functions to its record.
+
+    from src.instrumentation import span, traced, TRACER
+
+    @traced('feature_engineering', rows=len)
+    def feature_engineering(...): ...
+
+    with span('merge', rows=len(data)) as record:
+        ...
+        record.rows = len(result)
+"""
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Upper bounds of the span duration histogram, in seconds
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 120.0)
+
+# Functions listed in a span's profile
+PROFILE_LINES = 25
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+_statm = {}   # pid -> open descriptor of /proc/self/statm (re-opened after a fork)
+
+def rss_bytes():
+    """Current resident set size in bytes (0 where /proc is unavailable)."""
+    pid = os.getpid()
+    try:
+        fd = _statm.get(pid)
+        if fd is None:
+            _statm.clear()
+            fd = _statm[pid] = os.open('/proc/self/statm', os.O_RDONLY)
+        return int(os.pread(fd, 64, 0).split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0
+
+def _max_rss_bytes():
+    """High-water mark of the resident set size (ru_maxrss is in KiB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 if resource is not None else 0
+
+
+class Span:
+    """
+    One timed block.
+
+    Attributes:
+        name (str): Stage or endpoint name.
+        parent (str): Name of the enclosing span on the same thread, if any.
+        started_at (float): Unix time the span started.
+        wall_seconds (float): Elapsed time.
+        cpu_seconds (float): CPU time of the process (all threads) during the span.
+        rss_delta_bytes (int): Resident memory at the end minus at the start.
+        peak_rss_delta_bytes (int): How far the process's peak RSS rose during the span
+            (0 when the span stayed under an earlier peak).
+        rows (int): Rows processed or returned; set by the caller.
+        attributes (dict): Extra labels given to span().
+        error (str): Exception type, when the block raised.
+        profile (str): cProfile listing, when the span was profiled.
+    """
+
+    __slots__ = ('name', 'parent', 'started_at', 'wall_seconds', 'cpu_seconds', 'rss_delta_bytes',
+                 'peak_rss_delta_bytes', 'rows', 'attributes', 'error', 'profile')
+
+    def __init__(self, name, parent=None, rows=None, attributes=None):
+        self.name = name
+        self.parent = parent
+        self.rows = rows
+        self.attributes = attributes or {}
+        self.started_at = time.time()
+        self.wall_seconds = self.cpu_seconds = 0.0
+        self.rss_delta_bytes = self.peak_rss_delta_bytes = 0
+        self.error = None
+        self.profile = None
+
+    def to_dict(self):
+        record = {slot: getattr(self, slot) for slot in self.__slots__}
+        return {key: value for key, value in record.items() if value is not None and value != {}}
+
+
+class _NullSpan:
+    """Stands in for a Span when tracing is off or the span is re-entered; setting rows is a no-op."""
+
+    rows = profile = None
+    attributes = {}
+
+    def __setattr__(self, name, value):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    Collects spans from every thread of a process.
+
+    Args:
+        max_spans (int): Finished spans kept for export; older ones are dropped
+            (the Prometheus totals still count them).
+        enabled (bool): Record spans at all.
+    """
+
+    def __init__(self, max_spans=10_000, enabled=True):
+        self.enabled = enabled
+        self.spans = deque(maxlen=max_spans)
+        self._totals = {}   # name -> [count, errors, wall, cpu, rows, max peak rss delta, bucket counts]
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profile_next = None
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def profile_next(self, name=None):
+        """Profile the next span called `name` (any top-level span when None)."""
+        with self._lock:
+            self._profile_next = name or True
+
+    def _claim_profile(self, name, nested):
+        with self._lock:
+            armed = self._profile_next
+            if armed is True and not nested or armed == name:
+                self._profile_next = None
+                return True
+        return False
+
+    @contextmanager
+    def span(self, name, rows=None, profile=False, **attributes):
+        """
+        Time the enclosed block as span `name`.
+
+        A span nested directly in a span of the same name (a function calling itself,
+        e.g. through a result cache) is not recorded again.
+
+        Args:
+            name (str): Stage or endpoint name.
+            rows (int, optional): Row count; can also be set on the yielded span.
+            profile (bool): Run the block under cProfile.
+            **attributes: Extra labels stored with the span (JSON lines only).
+
+        Yields:
+            Span: The record being filled.
+        """
+        stack = self._stack()
+        if not self.enabled or (stack and stack[-1].name == name):
+            yield _NULL_SPAN
+            return
+
+        record = Span(name, stack[-1].name if stack else None, rows, attributes)
+        profiler = cProfile.Profile() if profile or self._claim_profile(name, bool(stack)) else None
+        stack.append(record)
+        rss_start, peak_start = rss_bytes(), _max_rss_bytes()
+        cpu_start, start = time.process_time(), time.perf_counter()
+        if profiler is not None:
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is already active on this thread
+                profiler = None
+        try:
+            yield record
+        except BaseException as error:
+            record.error = type(error).__name__
+            raise
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            record.wall_seconds = time.perf_counter() - start
+            record.cpu_seconds = time.process_time() - cpu_start
+            record.rss_delta_bytes = rss_bytes() - rss_start
+            record.peak_rss_delta_bytes = _max_rss_bytes() - peak_start
+            stack.pop()
+            if profiler is not None:
+                listing = io.StringIO()
+                pstats.Stats(profiler, stream=listing).sort_stats('cumulative').print_stats(PROFILE_LINES)
+                record.profile = listing.getvalue()
+            self._finish(record)
+
+    def _finish(self, record):
+        with self._lock:
+            self.spans.append(record)
+            totals = self._totals.get(record.name)
+            if totals is None:
+                totals = self._totals[record.name] = [0, 0, 0.0, 0.0, 0, 0, [0] * len(DURATION_BUCKETS)]
+            totals[0] += 1
+            totals[1] += record.error is not None
+            totals[2] += record.wall_seconds
+            totals[3] += record.cpu_seconds
+            totals[4] += record.rows or 0
+            totals[5] = max(totals[5], record.peak_rss_delta_bytes)
+            for position, bound in enumerate(DURATION_BUCKETS):
+                if record.wall_seconds <= bound:
+                    totals[6][position] += 1
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+            self._totals.clear()
+
+    #------------------------------
+    # Export
+
+    def export_jsonl(self, destination):
+        """
+        Write the buffered spans, one JSON object per line.
+
+        Args:
+            destination (str or file): Path (appended to) or writable text file.
+
+        Returns:
+            int: Number of spans written.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        lines = ''.join(json.dumps(record.to_dict(), default=str) + '\n' for record in spans)
+        if isinstance(destination, str):
+            with open(destination, 'a') as handle:
+                handle.write(lines)
+        else:
+            destination.write(lines)
+        return len(spans)
+
+    def prometheus_text(self, prefix='lrs'):
+        """Per-span totals in the Prometheus text exposition format."""
+        with self._lock:
+            totals = {name: (values[:6], list(values[6])) for name, values in sorted(self._totals.items())}
+
+        metrics = [
+            ('span_calls_total', 'counter', 'Finished spans.', 0),
+            ('span_errors_total', 'counter', 'Spans that raised.', 1),
+            ('span_cpu_seconds_total', 'counter', 'Process CPU time spent in spans.', 3),
+            ('span_rows_total', 'counter', 'Rows processed or returned by spans.', 4),
+            ('span_peak_rss_delta_bytes', 'gauge', 'Largest peak RSS growth seen in one span.', 5),
+        ]
+        lines = []
+        for metric, kind, help_text, position in metrics:
+            lines += [f"# HELP {prefix}_{metric} {help_text}", f"# TYPE {prefix}_{metric} {kind}"]
+            lines += [f'{prefix}_{metric}{{span="{name}"}} {values[position]}' for name, (values, _) in totals.items()]
+
+        histogram = f"{prefix}_span_duration_seconds"
+        lines += [f"# HELP {histogram} Wall time of spans.", f"# TYPE {histogram} histogram"]
+        for name, (values, buckets) in totals.items():
+            for bound, count in zip(DURATION_BUCKETS, buckets):
+                lines.append(f'{histogram}_bucket{{span="{name}",le="{bound}"}} {count}')
+            lines.append(f'{histogram}_bucket{{span="{name}",le="+Inf"}} {values[0]}')
+            lines.append(f'{histogram}_sum{{span="{name}"}} {values[2]}')
+            lines.append(f'{histogram}_count{{span="{name}"}} {values[0]}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """Per-span totals as a list of dicts, slowest first."""
+        with self._lock:
+            rows = [{'span': name, 'calls': values[0], 'errors': values[1], 'wall_seconds': values[2],
+                     'cpu_seconds': values[3], 'rows': values[4], 'max_peak_rss_delta_mb': values[5] / 2**20}
+                    for name, values in self._totals.items()]
+        return sorted(rows, key=lambda row: row['wall_seconds'], reverse=True)
+
+
+# Process-wide tracer used by the pipeline and the service
+TRACER = Tracer(enabled=os.environ.get('LRS_TRACE', '1') != '0')
+
+
+def span(name, rows=None, profile=False, **attributes):
+    """Time a block on the process-wide TRACER (see Tracer.span)."""
+    return TRACER.span(name, rows=rows, profile=profile, **attributes)
+
+
+def traced(name=None, rows=None):
+    """
+    Decorator that runs every call of the function in a span.
+
+    Args:
+        name (str, optional): Span name; defaults to the function name.
+        rows (callable, optional): Derives the row count from the return value.
+    """
+    def decorate(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with TRACER.span(span_name) as record:
+                result = fn(*args, **kwargs)
+                if rows is not None:
+                    record.rows = rows(result)
+                return result
+        return wrapper
+    return decorate
@@ -1,23 +1,44 @@
 import random
-from sklearn.neighbors import NearestNeighbors
+import numpy as np
+import pandas as pd
 from geopy.distance import geodesic
 
+from src.data_preprocessing import StarSchema
+from src.instrumentation import traced
+from src.spatial_index import VenueIndex, UserLocationIndex
+from src.utils import coerce_user_id, haversine_km, EARTH_RADIUS_KM
+
+MEETING_OBJECTIVES = ('median', 'minimax')
+
+# Distance matrix entries scored per block (candidates x member locations)
+SCORE_BLOCK_ELEMENTS = 1 << 21
+
+# Upper bound on re-centring the candidate search on the best venue so far
+MAX_SEARCH_ROUNDS = 8
+
+# Points per side of the grid that seeds the minimax search
+MINIMAX_GRID = 12
+
 def select_random_checkins(user_ids, data):
     """
     Randomly select one check-in per user from the dataset.
 
     Args:
         user_ids (list): List of user IDs.
-        data (pd.DataFrame): Dataset with user and check-in information.
+        data (pd.DataFrame or StarSchema): Dataset with user and check-in information.
 
     Returns:
         pd.DataFrame: Selected check-ins for the given users.
     """
+    if isinstance(data, StarSchema):
+        data = data.to_wide(['User_ID', 'Latitude', 'Longitude'])
+
     # Filter data for the specified user IDs
+    user_ids = [coerce_user_id(user_id, data['User_ID'].dtype) for user_id in user_ids]
     user_checkins = data[data['User_ID'].isin(user_ids)]
     
     # Randomly select one check-in per user
-    random_checkins = user_checkins.groupby('User_ID').apply(lambda x: x.sample(1)).reset_index(drop=True)
+    random_checkins = user_checkins.groupby('User_ID', observed=True).sample(1).reset_index(drop=True)
     
     return random_checkins[['User_ID', 'Latitude', 'Longitude']]
 
@@ -36,57 +57,344 @@ def get_central_meeting_point(selected_checkins):
     
     return central_lat, central_lon
 
-def find_nearest_venues(central_point, data, k=1):
+def find_nearest_venues(central_point, data, k=1, venue_index=None):
     """
-    Use KNN to find the nearest venues to the central meeting point, ensuring unique Venue_IDs.
+    Find the nearest unique venues to the central meeting point.
 
     Args:
         central_point (tuple): Central latitude and longitude.
-        data (pd.DataFrame): Dataset with venue information.
+        data (pd.DataFrame or StarSchema): Dataset with venue information.
         k (int): Number of nearest venues to return.
+        venue_index (VenueIndex, optional): Prebuilt spatial index over the venues in `data`.
+            Built on the fly when omitted; pass one built at model load to avoid the rebuild.
 
     Returns:
-        pd.DataFrame: The k nearest unique venues.
+        pd.DataFrame: The k nearest unique venues, with Distance_From_Central in km.
     """
-    # Ensure unique Venue_IDs
-    data = data.drop_duplicates(subset='Venue_ID')
-
-    # Prepare venue location data
-    venue_locations = data[['Latitude', 'Longitude']].to_numpy()
-
-    # Initialize KNN model
-    knn = NearestNeighbors(n_neighbors=k, metric='euclidean')
-    knn.fit(venue_locations)
-
-    # Find the nearest venues
-    distances, indices = knn.kneighbors([central_point])
+    if venue_index is None:
+        venue_index = VenueIndex(data)
 
-    # Extract the nearest venues
-    nearest_venues = data.iloc[indices[0]].copy()
-    nearest_venues['Distance_From_Central'] = distances[0]
+    return venue_index.query_nearest(central_point, k=k)
 
-    return nearest_venues
-
-def recommend_meeting_place_random_checkins(user_ids, data, k=1):
+@traced(rows=lambda result: len(result[1]))
+def recommend_meeting_place_random_checkins(user_ids, data, k=1, venue_index=None, location_index=None):
     """
     Recommend the nearest meeting place for a group of users by selecting random check-ins.
 
     Args:
         user_ids (list): List of user IDs.
-        data (pd.DataFrame): Dataset with user and venue information.
+        data (pd.DataFrame or StarSchema): Dataset with user and venue information.
         k (int): Number of nearest venues to return.
+        venue_index (VenueIndex, optional): Prebuilt spatial index over the venues in `data`.
+        location_index (UserLocationIndex, optional): Prebuilt index of the users' check-ins;
+            the random check-ins are then drawn from it instead of filtering `data`.
 
     Returns:
         tuple: The selected check-ins and the nearest venue(s).
     """
     # Step 1: Randomly select one check-in per user
-    selected_checkins = select_random_checkins(user_ids, data)
+    if location_index is None:
+        selected_checkins = select_random_checkins(user_ids, data)
+    else:
+        positions = location_index.positions(pd.unique(pd.Series(user_ids, dtype=object)))
+        positions = positions[positions >= 0]
+        latitude, longitude = location_index.sample(positions, np.random.default_rng())
+        selected_checkins = pd.DataFrame({
+            'User_ID': location_index.user_ids[positions],
+            'Latitude': latitude,
+            'Longitude': longitude,
+        })
     
     # Step 2: Calculate the central meeting point
     central_point = get_central_meeting_point(selected_checkins)
     
     # Step 3: Find the nearest venues
-    nearest_venues = find_nearest_venues(central_point, data, k=k)
+    nearest_venues = find_nearest_venues(central_point, data, k=k, venue_index=venue_index)
     
     return selected_checkins, nearest_venues
 
+
+
+#------------------------------
+# Deterministic meeting place over every member's full check-in history
+
+def geometric_median(latitude, longitude, weights, groups=None, iterations=100, tolerance_km=1e-4):
+    """
+    Weighted geometric median of points (Weiszfeld's algorithm), optionally per group.
+
+    Points are projected onto a local equirectangular plane around their group's
+    weighted mean, which is accurate to well under a metre at city scale. All groups
+    are iterated together with vectorized per-group sums.
+
+    Args:
+        latitude, longitude (np.ndarray): Points in degrees.
+        weights (np.ndarray): Positive weight of each point.
+        groups (np.ndarray, optional): Group number (0..n_groups-1) of each point.
+        iterations (int): Upper bound on Weiszfeld steps.
+        tolerance_km (float): Stop once no group's estimate moves more than this.
+
+    Returns:
+        tuple: Latitude and longitude of the median in degrees (arrays with one
+            entry per group when `groups` is given).
+    """
+    single = groups is None
+    groups = np.zeros(len(latitude), dtype=np.int64) if single else groups
+    n_groups = int(groups.max()) + 1
+    weights = weights / np.bincount(groups, weights=weights, minlength=n_groups)[groups]
+
+    lat0 = np.bincount(groups, weights=weights * latitude, minlength=n_groups)
+    lon0 = np.bincount(groups, weights=weights * longitude, minlength=n_groups)
+    scale = np.radians(EARTH_RADIUS_KM)
+    x_scale = scale * np.cos(np.radians(lat0))
+    x = (longitude - lon0[groups]) * x_scale[groups]
+    y = (latitude - lat0[groups]) * scale
+
+    # Groups whose estimate has converged drop out, so the remaining steps only touch the others
+    cx, cy = np.zeros(n_groups), np.zeros(n_groups)
+    for _ in range(iterations):
+        distances = np.hypot(x - cx[groups], y - cy[groups])
+        # A point the estimate sits on exactly would divide by zero; it is skipped for this step
+        inverse = np.divide(weights, distances, out=np.zeros_like(distances), where=distances > 1e-12)
+        total = np.bincount(groups, weights=inverse, minlength=n_groups)
+        moving = total > 0
+        nx, ny = cx.copy(), cy.copy()
+        nx[moving] = np.bincount(groups, weights=inverse * x, minlength=n_groups)[moving] / total[moving]
+        ny[moving] = np.bincount(groups, weights=inverse * y, minlength=n_groups)[moving] / total[moving]
+        active = np.hypot(nx - cx, ny - cy) >= tolerance_km
+        cx, cy = nx, ny
+        if not active.any():
+            break
+        if not active.all():
+            keep = active[groups]
+            groups, weights, x, y = groups[keep], weights[keep], x[keep], y[keep]
+
+    median_lat, median_lon = lat0 + cy / scale, lon0 + cx / x_scale
+    return (median_lat[0], median_lon[0]) if single else (median_lat, median_lon)
+
+def _unit_vectors(latitude, longitude):
+    """Points on the unit sphere, shape (n, 3)."""
+    lat, lon = np.radians(latitude), np.radians(longitude)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+def _member_distances(candidate_lat, candidate_lon, starts, latitude, longitude, share):
+    """
+    Expected travel distance (km) from every candidate to every member.
+
+    Great-circle distances come from chord lengths between unit vectors, so the
+    candidates x locations matrix is one matrix product (accurate to centimetres).
+
+    Args:
+        candidate_lat, candidate_lon (np.ndarray): Candidate venues in degrees.
+        starts (np.ndarray): Offset of each member's first location (locations are grouped by member).
+        latitude, longitude (np.ndarray): Member locations in degrees.
+        share (np.ndarray): Each location's share of its member's visits.
+
+    Returns:
+        np.ndarray: Shape (n_candidates, n_members).
+    """
+    candidates = _unit_vectors(candidate_lat, candidate_lon)
+    locations = _unit_vectors(latitude, longitude)
+    result = np.empty((len(candidates), len(starts)))
+    block = max(1, SCORE_BLOCK_ELEMENTS // max(1, len(locations)))
+    for start in range(0, len(candidates), block):
+        chord_squared = np.clip(2.0 - 2.0 * (candidates[start:start + block] @ locations.T), 0.0, 4.0)
+        distances = (2.0 * EARTH_RADIUS_KM) * np.arcsin(np.sqrt(chord_squared) * 0.5)
+        result[start:start + block] = np.add.reduceat(distances * share, starts, axis=1)
+    return result
+
+@traced(rows=lambda result: len(result[1]))
+def recommend_meeting_place(user_ids, data, k=1, objective='median', venue_index=None, location_index=None,
+                            n_candidates=100):
+    """
+    Recommend meeting places for a group from every check-in of every member.
+
+    Deterministic: the same group always gets the same venues. Each member is
+    described by all of their check-ins (weighted by visits, each member counting
+    equally) and a venue by the members' expected travel distance to it. Venues are
+    scored exactly in batches of the nearest `n_candidates` around the group's
+    geometric median (for 'minimax', the best point of a coarse grid), re-centring on
+    the best venue found until it no longer changes.
+
+    Args:
+        user_ids (list): List of user IDs; unknown users are ignored.
+        data (pd.DataFrame or StarSchema): Dataset with user and venue information.
+        k (int): Number of venues to return.
+        objective (str): 'median' minimizes the members' mean travel distance,
+            'minimax' the longest one (ties broken by the mean).
+        venue_index (VenueIndex, optional): Prebuilt spatial index over the venues in `data`.
+        location_index (UserLocationIndex, optional): Prebuilt index of the members' check-ins.
+        n_candidates (int): Venues scored around each search centre.
+
+    Returns:
+        tuple: Per-member summary (User_ID, Latitude, Longitude of the member's own
+            median, Check_Ins) and the recommended venues with Mean_Distance_km,
+            Max_Distance_km and Distance_From_Central (km from the group median).
+    """
+    if objective not in MEETING_OBJECTIVES:
+        raise ValueError(f"Unknown objective '{objective}'; use one of {', '.join(MEETING_OBJECTIVES)}.")
+    if venue_index is None:
+        venue_index = VenueIndex(data)
+    if location_index is None:
+        location_index = UserLocationIndex(data)
+
+    positions = location_index.positions(pd.unique(pd.Series(user_ids, dtype=object)))
+    positions = positions[positions >= 0]
+    members = pd.DataFrame(columns=['User_ID', 'Latitude', 'Longitude', 'Check_Ins'])
+    if len(positions) == 0:
+        return members, venue_index.venues.iloc[:0].assign(Distance_From_Central=pd.Series(dtype=float))
+
+    owner, latitude, longitude, weights = location_index.gather(positions)
+    # Each member's check-ins share one unit of weight, so members count equally however active they are
+    visits = np.bincount(owner, weights=weights, minlength=len(positions))
+    share = weights / visits[owner]
+    bounds = np.r_[0, np.cumsum(np.bincount(owner, minlength=len(positions)))]
+    center = geometric_median(latitude, longitude, share)
+
+    # Each member's own median, a metre is plenty for display
+    member_lat, member_lon = geometric_median(latitude, longitude, weights, groups=owner, tolerance_km=1e-3)
+
+    # The group median is optimal for 'median'; the minimax optimum can lie off to one side,
+    # so start that search from the best point of a coarse grid over the members' medians
+    search_center = center
+    if objective == 'minimax' and len(positions) > 1:
+        grid_lat, grid_lon = np.meshgrid(np.linspace(member_lat.min(), member_lat.max(), MINIMAX_GRID),
+                                         np.linspace(member_lon.min(), member_lon.max(), MINIMAX_GRID))
+        grid_worst = _member_distances(grid_lat.ravel(), grid_lon.ravel(), bounds[:-1],
+                                       latitude, longitude, share).max(axis=1)
+        search_center = (grid_lat.ravel()[grid_worst.argmin()], grid_lon.ravel()[grid_worst.argmin()])
+
+    # Score the venues around the search centre, then re-centre on the best venue so far until it stops changing
+    positions_scored, means, worsts = [], [], []
+    seen = set()
+    best = None
+    for _ in range(MAX_SEARCH_ROUNDS):
+        nearby = venue_index.query_nearest(search_center, k=max(k, n_candidates))
+        new = nearby[~nearby.index.isin(seen)]
+        if len(new):
+            expected = _member_distances(new['Latitude'].to_numpy(dtype=np.float64),
+                                         new['Longitude'].to_numpy(dtype=np.float64),
+                                         bounds[:-1], latitude, longitude, share)
+            positions_scored.append(new.index.to_numpy())
+            means.append(expected.mean(axis=1))
+            worsts.append(expected.max(axis=1))
+            seen.update(new.index)
+
+        candidate_positions = np.concatenate(positions_scored)
+        mean, worst = np.concatenate(means), np.concatenate(worsts)
+        # lexsort: last key is primary; the venue position breaks exact ties
+        keys = (worst, mean) if objective == 'median' else (mean, worst)
+        order = np.lexsort((candidate_positions,) + keys)
+        if candidate_positions[order[0]] == best:
+            break
+        best = candidate_positions[order[0]]
+        search_center = tuple(venue_index.venues.loc[best, ['Latitude', 'Longitude']].astype(float))
+
+    order = order[:k]
+    venues = venue_index.venues.loc[candidate_positions[order]].copy()
+    venues['Distance_From_Central'] = haversine_km(center[0], center[1], venues['Latitude'], venues['Longitude'])
+    venues['Mean_Distance_km'] = mean[order]
+    venues['Max_Distance_km'] = worst[order]
+
+    members = pd.DataFrame({
+        'User_ID': location_index.user_ids[positions],
+        'Latitude': member_lat,
+        'Longitude': member_lon,
+        'Check_Ins': visits.astype(np.int64),
+    })
+    return members, venues
+
+
+#------------------------------
+# Many groups in one call
+
+MEETING_CENTERS = ('random', 'median')
+
+def _flatten_groups(groups):
+    """
+    Return (group ids, member group numbers, member user ids) for a list of groups or a long DataFrame.
+
+    Groups keep their input order and a user listed twice in a group counts once.
+    """
+    if isinstance(groups, pd.DataFrame):
+        group_numbers, group_ids = pd.factorize(groups['Group_ID'], sort=False)
+        group_ids, members = np.asarray(group_ids), groups['User_ID'].to_numpy()
+    else:
+        sizes = np.array([len(group) for group in groups], dtype=np.int64)
+        group_ids, group_numbers = np.arange(len(groups)), np.repeat(np.arange(len(groups)), sizes)
+        members = np.array([user_id for group in groups for user_id in group], dtype=object)
+    first = ~pd.DataFrame({'group': group_numbers, 'user': members}).duplicated().to_numpy()
+    return group_ids, group_numbers[first], members[first]
+
+@traced(rows=lambda result: len(result[0]))
+def recommend_meeting_places(groups, data, k=1, center='random', seed=None, venue_index=None, location_index=None):
+    """
+    Recommend meeting places for many groups at once.
+
+    Members of every group are looked up in one pass, all group centres are computed
+    as one array and every nearest-venue query is answered by one batched tree query.
+
+    Args:
+        groups (list or pd.DataFrame): Lists of user IDs, one per group (Group_ID is the
+            list position), or a long DataFrame with Group_ID and User_ID columns.
+            Unknown users are ignored and a user listed twice in a group counts once.
+        data (pd.DataFrame or StarSchema): Dataset with user and venue information.
+        k (int): Venues per group.
+        center (str): 'random' averages one random check-in per member, like
+            recommend_meeting_place_random_checkins; 'median' takes the geometric median
+            of all members' check-ins, each member counting equally (no randomness).
+        seed (int, optional): Seed for the 'random' draws; the same seed and groups
+            give the same answer.
+        venue_index (VenueIndex, optional): Prebuilt spatial index over the venues in `data`.
+        location_index (UserLocationIndex, optional): Prebuilt index of the users' check-ins.
+
+    Returns:
+        tuple: Group centres (Group_ID, Latitude, Longitude, Members) and the venues,
+            k rows per group with Group_ID, Rank (1 = nearest) and Distance_From_Central
+            in km, groups in input order (first appearance of each Group_ID). Groups without
+            any known member get a NaN centre and no venues.
+    """
+    if center not in MEETING_CENTERS:
+        raise ValueError(f"Unknown center '{center}'; use one of {', '.join(MEETING_CENTERS)}.")
+    if venue_index is None:
+        venue_index = VenueIndex(data)
+    if location_index is None:
+        location_index = UserLocationIndex(data)
+
+    group_ids, group_numbers, user_ids = _flatten_groups(groups)
+    positions = location_index.positions(list(user_ids))
+    known = positions >= 0
+    group_numbers, positions = group_numbers[known], positions[known]
+    n_groups = len(group_ids)
+    members = np.bincount(group_numbers, minlength=n_groups)
+
+    center_lat = np.full(n_groups, np.nan)
+    center_lon = np.full(n_groups, np.nan)
+    present = members > 0
+    if center == 'random':
+        latitude, longitude = location_index.sample(positions, np.random.default_rng(seed))
+        center_lat[present] = np.bincount(group_numbers, weights=latitude, minlength=n_groups)[present] / members[present]
+        center_lon[present] = np.bincount(group_numbers, weights=longitude, minlength=n_groups)[present] / members[present]
+    elif len(positions):
+        owner, latitude, longitude, weights = location_index.gather(positions)
+        share = weights / np.bincount(owner, weights=weights)[owner]
+        # Renumber the groups that have members densely for the per-group median
+        dense = np.cumsum(present) - 1
+        median_lat, median_lon = geometric_median(latitude, longitude, share, groups=dense[group_numbers[owner]])
+        center_lat[present], center_lon[present] = median_lat, median_lon
+
+    centers = pd.DataFrame({'Group_ID': group_ids, 'Latitude': center_lat, 'Longitude': center_lon,
+                            'Members': members})
+
+    answered = np.flatnonzero(present)
+    if len(answered):
+        venue_positions, distances = venue_index.query_nearest_batch(
+            np.column_stack([center_lat[answered], center_lon[answered]]), k=k
+        )
+    else:
+        # Nothing to query (the tree rejects an empty batch)
+        venue_positions, distances = np.empty((0, k), dtype=np.int64), np.empty((0, k))
+    venues = venue_index.venues.iloc[venue_positions.ravel()].reset_index(drop=True)
+    venues.insert(0, 'Group_ID', np.repeat(group_ids[answered], venue_positions.shape[1]))
+    venues.insert(1, 'Rank', np.tile(np.arange(1, venue_positions.shape[1] + 1), len(answered)))
+    venues['Distance_From_Central'] = distances.ravel()
+    return centers, venues
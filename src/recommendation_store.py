@@ -0,0 +1,311 @@
+"""
+Precomputed recommendations for every user, stored as memory-mapped arrays.
+
+An offline job ranks the top-k unvisited venues of every (user, broader
+category) pair, exactly as recommend_similar_category_locations would, and the
+top-n similar users of every user. The results are written as one `.npy` file
+per array plus a JSON manifest carrying a version stamp:
+
+    category_offsets[user * n_broader + broader] : category_offsets[... + 1]
+        slice of category_items, positions into the item table (venue, category,
+        float32 score, coordinates) of that broader category's ranked list
+    neighbors[user], neighbor_scores[user]
+        int32 user positions and float32 similarities of the top-n similar users
+
+so answering a request is an index lookup and an array slice.
+
+Usage:
+    python -m src.recommendation_store [dataset] [categories] [output_dir] [--k 10] [--top-n 10] [--jobs -1]
+"""
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.data_preprocessing import StarSchema
+from src.instrumentation import traced
+from src.recommendation_unvisisted import build_category_index
+from src.similarity import compute_user_profile, compute_top_k_similarity
+from src.utils import coerce_user_id, first_unvisited, replace_directory
+
+# Bump when the on-disk layout changes, so old stores are rebuilt
+STORE_FORMAT_VERSION = 1
+
+MANIFEST_FILE = 'manifest.json'
+
+# Users ranked per task when sharding the build over processes
+USERS_PER_SHARD = 2048
+
+
+# Arrays shared with pool workers (set once per worker by the initializer)
+_worker_arrays = None
+
+def _init_worker(arrays):
+    global _worker_arrays
+    _worker_arrays = arrays
+
+def _rank_block(start, stop, k, arrays=None):
+    """
+    Top-k unvisited items of every broader category for users start:stop.
+
+    Returns:
+        tuple: Item counts per (user, broader) pair, user-major, and the item positions.
+    """
+    arrays = _worker_arrays if arrays is None else arrays
+    list_offsets, n_venues = arrays['list_offsets'], arrays['n_venues']
+    n_broader = len(list_offsets) - 1
+
+    # Every (user, broader) pair of the block, user-major
+    users = np.repeat(np.arange(start, stop), n_broader)
+    broader = np.tile(np.arange(n_broader), stop - start)
+
+    owner, items, _ = first_unvisited(users, list_offsets[broader], list_offsets[broader + 1], arrays['item_venues'],
+                                      arrays['visited_keys'], arrays['visited_counts'], n_venues, k)
+    return np.bincount(owner, minlength=len(users)), items.astype(np.int32)
+
+
+def _write_arrays(output_dir, arrays, manifest):
+    """Write the arrays and manifest to a fresh directory and swap it in with replace_directory."""
+    parent = os.path.dirname(os.path.abspath(output_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix='.store-')
+    for name, values in arrays.items():
+        np.save(os.path.join(tmp_dir, f'{name}.npy'), values, allow_pickle=False)
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f)
+
+    replace_directory(tmp_dir, output_dir)
+    return output_dir
+
+
+def _id_array(ids):
+    """IDs as a fixed-width array np.save can write without pickling."""
+    ids = pd.Index(ids)
+    return ids.to_numpy(dtype=np.int64) if pd.api.types.is_integer_dtype(ids.dtype) else ids.astype(str).to_numpy(dtype=str)
+
+
+@traced()
+def build_recommendation_store(data, output_dir, k=10, top_n=10, version=None, n_jobs=1):
+    """
+    Rank the category recommendations and similar users of every user and write the store.
+
+    Args:
+        data (pd.DataFrame or StarSchema): Processed dataset (output of feature_engineering).
+        output_dir (str): Store directory (replaced atomically).
+        k (int): Venues kept per (user, broader category).
+        top_n (int): Similar users kept per user.
+        version (str, optional): Identifies the inputs (e.g. the snapshot key); the server
+            compares it to its own before serving from the store.
+        n_jobs (int): Worker processes for the ranking and the similarity; 1 runs
+            in-process, -1 uses all cores.
+
+    Returns:
+        str: The store directory.
+    """
+    if n_jobs == -1:
+        n_jobs = os.cpu_count() or 1
+    started = time.time()
+
+    index = build_category_index(data)
+    if isinstance(data, StarSchema):
+        user_codes = data.checkins['user_key'].to_numpy()
+        venue_codes = data.checkins['venue_key'].to_numpy()
+        user_ids = pd.Index(data.users['User_ID'].to_numpy())
+        venue_ids = pd.Index(data.venues['Venue_ID'].to_numpy())
+    else:
+        user_codes, user_ids = pd.factorize(data['User_ID'])
+        venue_codes, venue_ids = pd.factorize(data['Venue_ID'])
+        user_ids, venue_ids = pd.Index(user_ids), pd.Index(venue_ids)
+    n_venues = len(venue_ids)
+    visited_keys = np.unique(user_codes.astype(np.int64) * n_venues + venue_codes)
+
+    # The ranked lists of CategoryIndex, one after the other, as the item table
+    broader_names = list(index.venues_by_broader)
+    lists = [index.venues_by_broader[broader] for broader in broader_names]
+    items = pd.concat(lists, ignore_index=True) if lists else pd.DataFrame(
+        columns=['Venue_ID', 'Category_Name', 'Score', 'Latitude', 'Longitude'])
+    item_category_codes, item_category_names = pd.factorize(items['Category_Name'].astype(str))
+
+    arrays = {
+        'n_venues': n_venues,
+        'list_offsets': np.r_[0, np.cumsum([len(venues) for venues in lists])].astype(np.int64),
+        'item_venues': venue_ids.get_indexer(items['Venue_ID']).astype(np.int64),
+        'visited_counts': np.bincount(visited_keys // max(n_venues, 1), minlength=len(user_ids)),
+        'visited_keys': visited_keys,
+    }
+    blocks = [(start, min(start + USERS_PER_SHARD, len(user_ids))) for start in range(0, len(user_ids), USERS_PER_SHARD)]
+    if n_jobs > 1 and len(blocks) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(arrays,)) as executor:
+            results = list(executor.map(_rank_block, *zip(*blocks), [k] * len(blocks)))
+    else:
+        results = [_rank_block(start, stop, k, arrays) for start, stop in blocks]
+    counts = np.concatenate([result[0] for result in results]) if results else np.array([], dtype=np.int64)
+
+    # Similar users, mapped to store positions
+    similarity = compute_top_k_similarity(compute_user_profile(data, sparse=True), k=top_n, n_jobs=n_jobs)
+    neighbors = np.full((len(user_ids), similarity.k), -1, dtype=np.int32)
+    neighbor_scores = np.full((len(user_ids), similarity.k), np.nan, dtype=np.float32)
+    rows = user_ids.get_indexer(similarity.index)
+    neighbors[rows] = rows[similarity.neighbors]
+    neighbor_scores[rows] = similarity.scores
+
+    manifest = {
+        'format_version': STORE_FORMAT_VERSION,
+        'version': version,
+        'built_at': started,
+        'k': k,
+        'top_n': similarity.k,
+        'n_users': len(user_ids),
+        'broader_categories': [str(broader) for broader in broader_names],
+        # Lowercase category name -> position in broader_categories (-1: no ranked list)
+        'category_broader': {name: broader_names.index(broader) if broader in index.venues_by_broader else -1
+                             for name, broader in index.broader_by_category.items()},
+        'item_category_names': item_category_names.tolist(),
+    }
+    store_arrays = {
+        'user_ids': _id_array(user_ids),
+        'venue_ids': _id_array(venue_ids),
+        'list_offsets': arrays['list_offsets'],
+        'item_venues': arrays['item_venues'].astype(np.int32),
+        'item_categories': item_category_codes.astype(np.int32),
+        'item_scores': items['Score'].to_numpy(dtype=np.float32),
+        'item_latitude': items['Latitude'].to_numpy(dtype=np.float64),
+        'item_longitude': items['Longitude'].to_numpy(dtype=np.float64),
+        'category_offsets': np.r_[0, np.cumsum(counts)].astype(np.int64),
+        'category_items': np.concatenate([result[1] for result in results]) if results else np.array([], dtype=np.int32),
+        'neighbors': neighbors,
+        'neighbor_scores': neighbor_scores,
+    }
+    return _write_arrays(output_dir, store_arrays, manifest)
+
+
+class RecommendationStore:
+    """
+    Read side of a store written by build_recommendation_store.
+
+    Attributes:
+        version (str): Version stamp given at build time.
+        built_at (float): Unix time the build started.
+        k (int): Venues stored per (user, broader category).
+        top_n (int): Similar users stored per user.
+    """
+
+    def __init__(self, store_dir, mmap=True):
+        """
+        Args:
+            store_dir (str): Store directory.
+            mmap (bool): Memory-map the arrays instead of reading them.
+        """
+        with open(os.path.join(store_dir, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != STORE_FORMAT_VERSION:
+            raise ValueError(f"Store {store_dir} has format {manifest.get('format_version')}, "
+                             f"expected {STORE_FORMAT_VERSION}; rebuild it.")
+
+        self.store_dir = store_dir
+        self.version = manifest['version']
+        self.built_at = manifest['built_at']
+        self.k = manifest['k']
+        self.top_n = manifest['top_n']
+        self._n_broader = len(manifest['broader_categories'])
+        self._category_broader = manifest['category_broader']
+        self._category_names = np.array(manifest['item_category_names'], dtype=object)
+
+        mmap_mode = 'r' if mmap else None
+        for name in ('user_ids', 'venue_ids', 'list_offsets', 'item_venues', 'item_categories', 'item_scores',
+                     'item_latitude', 'item_longitude', 'category_offsets', 'category_items',
+                     'neighbors', 'neighbor_scores'):
+            values = np.load(os.path.join(store_dir, f'{name}.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+            setattr(self, f'_{name}', values.view(np.ndarray))
+        self._user_index = pd.Index(self._user_ids)
+
+    def __len__(self):
+        return len(self._user_ids)
+
+    def _position(self, user_id):
+        """Store position of a user, or -1."""
+        try:
+            return self._user_index.get_loc(coerce_user_id(user_id, self._user_index.dtype))
+        except KeyError:
+            return -1
+
+    def broader_category(self, category_name):
+        """Position of a (case-insensitive) category name's broader category; -1 when it has no venues."""
+        try:
+            return self._category_broader[category_name.lower()]
+        except KeyError:
+            raise ValueError(f"Category name '{category_name.lower()}' not found in the dataset.")
+
+    def top_unvisited(self, user_id, category_name, top_k=10):
+        """
+        The stored answer of recommend_similar_category_locations (top_k at most k).
+
+        Unknown users get the head of the ranked list, as they have visited nothing.
+
+        Returns:
+            pd.DataFrame: Venue_ID, Category_Name, Score, Latitude, Longitude.
+        """
+        broader = self.broader_category(category_name)
+        if broader < 0:
+            return pd.DataFrame(columns=['Venue_ID', 'Category_Name', 'Score'])
+
+        position = self._position(user_id)
+        if position >= 0:
+            pair = position * self._n_broader + broader
+            start, stop = self._category_offsets[pair], self._category_offsets[pair + 1]
+            items = self._category_items[start:min(stop, start + top_k)]
+        else:
+            start, stop = self._list_offsets[broader], self._list_offsets[broader + 1]
+            items = np.arange(start, min(stop, start + min(top_k, self.k)))
+
+        if not len(items):
+            return pd.DataFrame(columns=['Venue_ID', 'Category_Name', 'Score'])
+        return pd.DataFrame({
+            'Venue_ID': self._venue_ids[self._item_venues[items]].astype(object),
+            'Category_Name': self._category_names[self._item_categories[items]],
+            'Score': self._item_scores[items],
+            'Latitude': self._item_latitude[items],
+            'Longitude': self._item_longitude[items],
+        }, copy=False)
+
+    def similar_users(self, user_id, top_n=10):
+        """
+        The stored answer of find_top_similar_users (top_n at most the stored top_n).
+
+        Returns:
+            pd.Series: Similarity scores indexed by User_ID, most similar first.
+        """
+        position = self._position(user_id)
+        if position < 0:
+            raise ValueError(f"User ID {user_id} not found in the dataset.")
+        neighbors = self._neighbors[position, :top_n]
+        known = neighbors >= 0
+        return pd.Series(
+            self._neighbor_scores[position, :top_n][known],
+            index=self._user_index[neighbors[known]],
+            name=self._user_index[position]
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from src.snapshot import load_or_build_snapshot, snapshot_key
+
+    parser = argparse.ArgumentParser(description="Build the precomputed recommendation store.")
+    parser.add_argument('dataset', nargs='?', default='data/dataset_NYC.zip')
+    parser.add_argument('categories', nargs='?', default='data/categories.zip')
+    parser.add_argument('output', nargs='?', default='data/store')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--top-n', type=int, default=10)
+    parser.add_argument('--jobs', type=int, default=-1)
+    args = parser.parse_args()
+
+    data = load_or_build_snapshot(args.dataset, args.categories, n_jobs=args.jobs)
+    output_dir = build_recommendation_store(data, args.output, k=args.k, top_n=args.top_n,
+                                            version=snapshot_key(args.dataset, args.categories), n_jobs=args.jobs)
+    print(f"Store written to {output_dir}")
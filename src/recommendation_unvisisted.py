@@ -1,18 +1,330 @@
 import pandas as pd
+import numpy as np
 
-def recommend_similar_category_locations(user_id, category_name, data, top_k=10):
+from src.data_preprocessing import StarSchema
+from src.instrumentation import traced
+from src.spatial_index import GridIndex
+from src.temporal import VisitHistogram, time_slot
+from src.utils import coerce_user_id, haversine_km, user_cache_key
+
+# Wide columns the category recommender reads
+RECOMMENDER_COLUMNS = ['User_ID', 'Venue_ID', 'Category_Name', 'Broader_Category', 'Popularity_Score',
+                       'Distance_From_Center', 'Latitude', 'Longitude']
+
+# First search radius of proximity mode; it grows until the top-k is provably complete
+PROXIMITY_RADIUS_KM = 2.0
+
+# Time-aware scores are multiplied by 1 + TIME_BOOST * busyness (0 to 1) in the requested hour
+TIME_BOOST = 1.0
+
+
+class CategoryIndex:
+    """
+    Query index for recommend_similar_category_locations, built once per dataset.
+
+    Holds a lowercase Category_Name -> Broader_Category dictionary, one venue
+    table per broader category sorted by score, and the set of venues each
+    user has visited. A top-k request then walks down the sorted table,
+    skipping visited venues, without touching the check-ins.
+
+    In proximity mode venues are scored by distance from the requesting user's
+    own centre instead; a GridIndex per broader category (built on first use)
+    limits the distance computations to venues around that centre.
+
+    Time-aware requests boost venues busy at the requested hour of the week,
+    looked up in a VisitHistogram.
+    """
+
+    def __init__(self, data, time_aware=True):
+        """
+        Args:
+            data (pd.DataFrame or StarSchema): Processed dataset (output of feature_engineering).
+            time_aware (bool): Build the VisitHistogram for time-aware requests (needs Local_Time).
+        """
+        has_local_time = 'Local_Time' in (data.checkins if isinstance(data, StarSchema) else data).columns
+        self.visit_histogram = VisitHistogram(data) if time_aware and has_local_time else None
+
+        # Each user's centre (Avg_Latitude, Avg_Longitude), for proximity mode
+        if isinstance(data, StarSchema):
+            users = data.users
+            data = data.to_wide(RECOMMENDER_COLUMNS)
+        elif {'Avg_Latitude', 'Avg_Longitude'}.issubset(data.columns):
+            users = data.drop_duplicates('User_ID')
+        else:
+            users = None
+        self.user_centers = None if users is None else pd.DataFrame(
+            users[['Avg_Latitude', 'Avg_Longitude']].to_numpy(dtype=np.float64),
+            index=pd.Index(users['User_ID'].to_numpy()), columns=['Avg_Latitude', 'Avg_Longitude']
+        )
+
+        # First Broader_Category seen for each lowercase category name
+        names = data['Category_Name'].astype(str).str.lower()
+        first = ~names.duplicated()
+        self.broader_by_category = dict(zip(names[first], data.loc[first, 'Broader_Category']))
+
+        # One row per (broader category, venue): the first check-in, as drop_duplicates keeps it
+        venues = data.drop_duplicates(subset=['Broader_Category', 'Venue_ID']).copy()
+        venues['Score'] = venues['Popularity_Score'] / (1 + venues['Distance_From_Center'])
+        venues = venues.dropna(subset=['Score'])
+
+        # Highest score first; the stable sort keeps dataset order among ties, like nlargest
+        self.venues_by_broader = {}
+        self._popularity_by_broader = {}
+        self._histogram_rows_by_broader = {}
+        for broader, group in venues.groupby('Broader_Category', sort=False, observed=True):
+            group = group.sort_values('Score', ascending=False, kind='stable')
+            self.venues_by_broader[broader] = group[
+                ['Venue_ID', 'Category_Name', 'Score', 'Latitude', 'Longitude']
+            ].reset_index(drop=True)
+            self._popularity_by_broader[broader] = group['Popularity_Score'].to_numpy(dtype=np.float64)
+            if self.visit_histogram is not None:
+                self._histogram_rows_by_broader[broader] = self.visit_histogram.positions(group['Venue_ID'])
+        self._grids = {}
+
+        # Venues visited by each user
+        self.user_id_dtype = data['User_ID'].dtype
+        self.visited_by_user = data.groupby('User_ID', sort=False, observed=True)['Venue_ID'].agg(set).to_dict()
+
+    def broader_category(self, category_name):
+        """Return the broader category of a (case-insensitive) category name."""
+        try:
+            return self.broader_by_category[category_name.lower()]
+        except KeyError:
+            raise ValueError(f"Category name '{category_name.lower()}' not found in the dataset.")
+
+    def top_unvisited(self, user_id, broader_category, top_k=10):
+        """Return the top_k highest-scoring venues of a broader category the user has not visited."""
+        venues = self.venues_by_broader.get(broader_category)
+        if venues is None:
+            return pd.DataFrame(columns=['Venue_ID', 'Category_Name', 'Score'])
+
+        visited = self.visited_by_user.get(coerce_user_id(user_id, self.user_id_dtype), set())
+        positions = []
+        for position, venue_id in enumerate(venues['Venue_ID'].to_numpy()):
+            if venue_id not in visited:
+                positions.append(position)
+                if len(positions) == top_k:
+                    break
+
+        if not positions:
+            return pd.DataFrame(columns=['Venue_ID', 'Category_Name', 'Score'])
+        return venues.iloc[np.array(positions)]
+
+    def top_unvisited_at(self, user_id, broader_category, top_k, slot, time_boost=TIME_BOOST):
+        """
+        Return the top_k unvisited venues of a broader category by Score * (1 + time_boost * busyness),
+        busyness being how busy a venue is in the given hour relative to its busiest hour.
+
+        The boost at most multiplies a score by max(1, 1 + time_boost), so only the head of the sorted
+        table is scored: it grows until the next venue's best boosted score is below the k-th.
+
+        Args:
+            slot (tuple): (day of week, Monday=0; hour), see src.temporal.time_slot.
+
+        Returns:
+            pd.DataFrame: Venue_ID, Category_Name, Score, Latitude, Longitude, Busyness.
+        """
+        if self.visit_histogram is None:
+            raise ValueError("Time-aware ranking needs Local_Time in the dataset.")
+        venues = self.venues_by_broader.get(broader_category)
+        if venues is None or top_k <= 0:
+            return pd.DataFrame(columns=['Venue_ID', 'Category_Name', 'Score', 'Busyness'])
+
+        base_scores = venues['Score'].to_numpy()
+        visited = self.visited_by_user.get(coerce_user_id(user_id, self.user_id_dtype), set())
+        venue_ids = venues['Venue_ID'].to_numpy()
+
+        max_boost = max(1, 1 + time_boost)
+        size = 4 * top_k
+        while True:
+            busyness = self._busyness(broader_category, np.arange(min(size, len(venues))), slot)
+            scores = base_scores[:size] * (1 + time_boost * busyness)
+            found = []
+            for position in np.argsort(-scores, kind='stable'):
+                if venue_ids[position] not in visited:
+                    found.append(position)
+                    if len(found) == top_k:
+                        break
+            if size >= len(venues) or (len(found) == top_k and base_scores[size] * max_boost <= scores[found[-1]]):
+                break
+            size *= 4
+
+        found = np.array(found, dtype=np.int64)
+        recommendations = venues.iloc[found].copy()
+        recommendations['Score'] = scores[found]
+        recommendations['Busyness'] = busyness[found]
+        return recommendations
+
+    def _busyness(self, broader_category, positions, slot):
+        """Busyness in the (day, hour) slot of the venues at these positions of a broader category's table."""
+        if self.visit_histogram is None:
+            raise ValueError("Time-aware ranking needs Local_Time in the dataset.")
+        return self.visit_histogram.busyness(self._histogram_rows_by_broader[broader_category][positions], *slot)
+
+    def user_center(self, user_id):
+        """Return a user's (Avg_Latitude, Avg_Longitude)."""
+        if self.user_centers is None:
+            raise ValueError("Proximity mode needs Avg_Latitude and Avg_Longitude in the dataset.")
+        user_id = coerce_user_id(user_id, self.user_centers.index.dtype)
+        try:
+            return tuple(self.user_centers.loc[user_id])
+        except KeyError:
+            raise ValueError(f"User ID {user_id} not found in the dataset.")
+
+    def top_unvisited_nearby(self, user_id, broader_category, top_k=10, radius_km=PROXIMITY_RADIUS_KM,
+                             slot=None, time_boost=TIME_BOOST):
+        """
+        Return the top_k unvisited venues of a broader category by Popularity_Score / (1 + km
+        from the user's centre).
+
+        Only venues within a search radius (doubled until it holds top_k unvisited venues)
+        are scored, plus any venue outside it popular enough to beat the k-th score found
+        there, so the result is the same as scoring every venue.
+
+        With a (day, hour) slot, scores are boosted as in top_unvisited_at and Busyness is added.
+
+        Returns:
+            pd.DataFrame: Venue_ID, Category_Name, Score, Latitude, Longitude, Distance_From_User (km).
+        """
+        latitude, longitude = self.user_center(user_id)
+        venues = self.venues_by_broader.get(broader_category)
+        if venues is None or top_k <= 0:
+            return pd.DataFrame(columns=['Venue_ID', 'Category_Name', 'Score', 'Distance_From_User'])
+
+        grid, by_popularity = self._proximity_grid(broader_category)
+        popularity = self._popularity_by_broader[broader_category]
+        visited = self.visited_by_user.get(coerce_user_id(user_id, self.user_id_dtype), set())
+        venue_ids = venues['Venue_ID'].to_numpy()
+
+        def top(positions, distances):
+            # Highest score first (ties in list order), skipping visited venues
+            scores = popularity[positions] / (1 + distances)
+            busyness = self._busyness(broader_category, positions, slot) if slot is not None else None
+            if busyness is not None:
+                scores = scores * (1 + time_boost * busyness)
+            order = np.lexsort((positions, -scores))
+            found = []
+            for candidate in order:
+                if venue_ids[positions[candidate]] not in visited:
+                    found.append(candidate)
+                    if len(found) == top_k:
+                        break
+            found = np.array(found, dtype=np.int64)
+            return positions[found], distances[found], scores[found], None if busyness is None else busyness[found]
+
+        radius = radius_km
+        while True:
+            positions, distances = grid.query_radius(latitude, longitude, radius)
+            complete = grid.covers(latitude, longitude, radius)
+            result = top(positions, distances)
+            if len(result[0]) == top_k or complete:
+                break
+            radius *= 2
+
+        if complete:
+            # The cells span the whole grid, but venues in their corners can still lie outside the circle
+            outside = np.setdiff1d(np.arange(len(venues)), positions)
+        else:
+            # A venue outside the radius scores below popularity * max_boost / (1 + radius): only
+            # those with popularity above kth score * (1 + radius) / max_boost can still make the top_k
+            max_boost = max(1, 1 + time_boost) if slot is not None else 1
+            threshold = result[2][-1] * (1 + radius) / max_boost
+            outside = by_popularity[:np.searchsorted(-popularity[by_popularity], -threshold, side='left')]
+            outside = np.setdiff1d(outside, positions)
+        if len(outside):
+            outside_distances = haversine_km(latitude, longitude, venues['Latitude'].to_numpy()[outside],
+                                             venues['Longitude'].to_numpy()[outside])
+            result = top(np.r_[positions, outside], np.r_[distances, outside_distances])
+
+        positions, distances, scores, busyness = result
+        recommendations = venues.iloc[positions].copy()
+        recommendations['Score'] = scores
+        recommendations['Distance_From_User'] = distances
+        if busyness is not None:
+            recommendations['Busyness'] = busyness
+        return recommendations
+
+    def _proximity_grid(self, broader_category):
+        """GridIndex over a broader category's venues and their positions by descending popularity."""
+        if broader_category not in self._grids:
+            venues = self.venues_by_broader[broader_category]
+            popularity = self._popularity_by_broader[broader_category]
+            self._grids[broader_category] = (
+                GridIndex(venues['Latitude'], venues['Longitude']),
+                np.argsort(-popularity, kind='stable'),
+            )
+        return self._grids[broader_category]
+
+
+def build_category_index(data, time_aware=True):
+    """Build the CategoryIndex used to serve recommend_similar_category_locations."""
+    return CategoryIndex(data, time_aware=time_aware)
+
+
+@traced(rows=len)
+def recommend_similar_category_locations(user_id, category_name, data, top_k=10, index=None, cache=None,
+                                         proximity=False, radius_km=PROXIMITY_RADIUS_KM, at_time=None,
+                                         time_boost=TIME_BOOST, version=None):
     """
     Recommend unique venues of a similar category for a user.
 
     Args:
         user_id (str): User ID.
         category_name (str): The specific venue category to find similar categories.
-        data (pd.DataFrame): Dataset with user and venue information.
+        data (pd.DataFrame or StarSchema): Dataset with user and venue information.
         top_k (int): Number of recommendations to return.
+        index (CategoryIndex, optional): Prebuilt index over `data`. When given, the
+            request is answered from the index instead of scanning the check-ins.
+        cache (ResultCache, optional): Serve repeated requests from this cache; its
+            version must identify `data`.
+        version (optional): Current version of `data` (e.g. a model's version or
+            IncrementalFeatureStore.version); a cache on another version drops its entries first.
+        proximity (bool): Score by distance from the user's own centre (Avg_Latitude,
+            Avg_Longitude) instead of the precomputed Distance_From_Center, and add
+            Distance_From_User (km) to the result.
+        radius_km (float): First search radius of proximity mode with an index; it is
+            widened as needed, so it only affects speed.
+        at_time (str or datetime, optional): Local time of the visit. Venues busy in that
+            hour of the week (by their check-in counts, relative to their busiest hour)
+            get their score multiplied by up to 1 + time_boost, and Busyness is added.
+        time_boost (float): Largest time-aware multiplier minus one.
 
     Returns:
         pd.DataFrame: Top recommended venues with scores.
     """
+    if cache is not None:
+        if index is not None:
+            id_dtype = index.user_id_dtype
+        else:
+            id_dtype = (data.users if isinstance(data, StarSchema) else data)['User_ID'].dtype
+        return cache.get_or_compute(
+            'similar_category', (user_cache_key(user_id, id_dtype), category_name.lower(), int(top_k), bool(proximity),
+                                 None if at_time is None else time_slot(at_time), float(time_boost)),
+            lambda: recommend_similar_category_locations(user_id, category_name, data, top_k, index=index,
+                                                         proximity=proximity, radius_km=radius_km,
+                                                         at_time=at_time, time_boost=time_boost),
+            version=version
+        )
+
+    slot = None if at_time is None else time_slot(at_time)
+    if index is not None:
+        broader_category = index.broader_category(category_name)
+        if proximity:
+            return index.top_unvisited_nearby(user_id, broader_category, top_k, radius_km, slot, time_boost)
+        if slot is not None:
+            return index.top_unvisited_at(user_id, broader_category, top_k, slot, time_boost)
+        return index.top_unvisited(user_id, broader_category, top_k)
+
+    if proximity:
+        users = data.users if isinstance(data, StarSchema) else data
+        center = users.loc[users['User_ID'] == coerce_user_id(user_id, users['User_ID'].dtype),
+                           ['Avg_Latitude', 'Avg_Longitude']]
+        if center.empty:
+            raise ValueError(f"User ID {user_id} not found in the dataset.")
+
+    if isinstance(data, StarSchema):
+        data = data.to_wide(RECOMMENDER_COLUMNS + (['Local_Time'] if slot is not None else []))
+
     # Normalize input category name
     category_name = category_name.lower()
     
@@ -31,6 +343,7 @@ def recommend_similar_category_locations(user_id, category_name, data, top_k=10)
     similar_venues = similar_venues.drop_duplicates(subset='Venue_ID')
 
     # Exclude venues already visited by the user
+    user_id = coerce_user_id(user_id, data['User_ID'].dtype)
     visited = set(data[data['User_ID'] == user_id]['Venue_ID'])
     unvisited = similar_venues[~similar_venues['Venue_ID'].isin(visited)].copy()
     
@@ -38,7 +351,22 @@ def recommend_similar_category_locations(user_id, category_name, data, top_k=10)
         return pd.DataFrame(columns=['Venue_ID', 'Category_Name', 'Score'])
     
     # Calculate scores based on popularity and proximity
-    unvisited['Score'] = unvisited['Popularity_Score'] / (1 + unvisited['Distance_From_Center'])
-    
+    columns = ['Venue_ID', 'Category_Name', 'Score', 'Latitude', 'Longitude']
+    if proximity:
+        unvisited['Distance_From_User'] = haversine_km(
+            center.iloc[0, 0], center.iloc[0, 1], unvisited['Latitude'], unvisited['Longitude']
+        )
+        unvisited['Score'] = unvisited['Popularity_Score'] / (1 + unvisited['Distance_From_User'])
+        columns.append('Distance_From_User')
+    else:
+        unvisited['Score'] = unvisited['Popularity_Score'] / (1 + unvisited['Distance_From_Center'])
+
+    # Boost venues busy at the requested hour of the week
+    if slot is not None:
+        histogram = VisitHistogram(data[data['Broader_Category'] == broader_category])
+        unvisited['Busyness'] = histogram.busyness(histogram.positions(unvisited['Venue_ID']), *slot)
+        unvisited['Score'] = unvisited['Score'] * (1 + time_boost * unvisited['Busyness'])
+        columns.append('Busyness')
+
     # Return the top-k unique venues
-    return unvisited.nlargest(top_k, 'Score')[['Venue_ID', 'Category_Name', 'Score', 'Latitude', 'Longitude']]
+    return unvisited.nlargest(top_k, 'Score')[columns]
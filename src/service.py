@@ -0,0 +1,458 @@
+"""
+Headless HTTP/JSON front end for the recommenders.
+
+Usage:
+    python -m src.service [--host HOST] [--port PORT] [--workers N] [--store DIR] [dataset] [categories]
+
+Endpoints (all POST with a JSON object body, except GET /health):
+    /recommend/category           {"user_id", "category_name", "top_k"?, "proximity"?, "at_time"?}
+    /recommend/similar-users      {"user_id", "top_n"?}
+    /recommend/meeting-place      {"user_ids", "k"?, "objective"?: "random" | "median" | "minimax"}
+    /recommend/meeting-places     {"groups": [[user_id, ...], ...], "k"?, "center"?, "seed"?}
+    /recommend/venues             {"user_ids", "k"?, "exclude_visited"?} (co-visitation, many users per call)
+    <endpoint>/batch              {"requests": [<body>, ...]} -> {"results": [...]}
+    GET /stats                    Result cache counters of the worker that answers
+    GET /metrics                  Span totals (Prometheus text) of the worker that answers
+
+With --store, category and similar-user requests are answered from a store
+built by src.recommendation_store for the same inputs (a store with another
+version stamp is ignored); /health reports the store's version and build time.
+
+Add ?profile=1 to any endpoint to run that one request under cProfile; the
+listing comes back in the response's "profile" field.
+"""
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+
+from src.cache import ResultCache
+from src.collaborative import CoVisitationModel
+from src.instrumentation import TRACER
+from src.recommendation_point import (
+    recommend_meeting_place_random_checkins, recommend_meeting_place, recommend_meeting_places
+)
+from src.recommendation_store import RecommendationStore
+from src.recommendation_unvisisted import recommend_similar_category_locations, build_category_index
+from src.similarity import compute_user_profile, compute_top_k_similarity, find_top_similar_users
+from src.snapshot import load_or_build_snapshot, snapshot_key
+from src.spatial_index import VenueIndex, UserLocationIndex
+
+MAX_BODY_BYTES = 1 << 20
+MAX_BATCH_SIZE = 1000
+MAX_GROUPS = 10_000
+
+
+class RecommenderModel:
+    """
+    The processed dataset plus everything the recommenders read, built once.
+
+    Attributes:
+        data (pd.DataFrame or StarSchema): Processed check-ins.
+        similarity (TopKSimilarity): Precomputed nearest neighbours per user.
+        venue_index (VenueIndex): Spatial index for meeting places.
+        category_index (CategoryIndex): Index for unvisited-location queries.
+        version (str): Identifies the inputs the model was built from.
+        cache (ResultCache): Results of repeated category and similar-user queries.
+        location_index (UserLocationIndex): Every user's check-in locations, for meeting places.
+        covisitation (CoVisitationModel): Venue-to-venue similarities for venue recommendations.
+        store (RecommendationStore): Precomputed category and similar-user answers, if loaded.
+    """
+
+    def __init__(self, data, similarity, venue_index, category_index, version=None, cache=None,
+                 location_index=None, covisitation=None, store=None):
+        self.data = data
+        self.similarity = similarity
+        self.venue_index = venue_index
+        self.category_index = category_index
+        self.location_index = location_index
+        self.covisitation = covisitation
+        self.store = store
+        self.version = version
+        self.cache = cache if cache is not None else ResultCache(version=version)
+
+
+def build_model(data, k=50, version=None):
+    """
+    Build every index over an already processed dataset.
+
+    Args:
+        data (pd.DataFrame or StarSchema): Output of feature_engineering.
+        k (int): Neighbours kept per user for similar-user queries.
+        version (str, optional): Version stamp reported by /health.
+
+    Returns:
+        RecommenderModel: The loaded model.
+    """
+    user_profiles = compute_user_profile(data, sparse=True)
+    return RecommenderModel(
+        data,
+        compute_top_k_similarity(user_profiles, k=k),
+        VenueIndex(data),
+        build_category_index(data),
+        version=version,
+        location_index=UserLocationIndex(data),
+        covisitation=CoVisitationModel(data),
+    )
+
+def load_model(filepath, categories_path, k=50, store_dir=None):
+    """
+    Build the model from the raw inputs, through the preprocessing snapshot.
+
+    Args:
+        filepath (str): Raw check-in dataset (TSV or zip).
+        categories_path (str): Category mapping table.
+        k (int): Neighbours kept per user for similar-user queries.
+        store_dir (str, optional): Recommendation store to serve from, if its version
+            matches the inputs.
+    """
+    data = load_or_build_snapshot(filepath, categories_path)
+    model = build_model(data, k=k, version=snapshot_key(filepath, categories_path))
+    if store_dir is not None:
+        model.store = open_store(store_dir, model.version)
+    return model
+
+def open_store(store_dir, version):
+    """Open a recommendation store if it was built for `version`; None (with a notice) otherwise."""
+    try:
+        store = RecommendationStore(store_dir)
+    except (OSError, ValueError) as error:
+        print(f"Not serving from {store_dir}: {error}")
+        return None
+    if store.version != version:
+        print(f"Not serving from {store_dir}: built for version {store.version}, the data is {version}")
+        return None
+    return store
+
+
+#------------------------------
+# Request handlers: plain functions of (model, body) returning JSON-ready objects
+
+def _json_default(value):
+    """Encode the numpy and pandas scalars json does not know."""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _records(frame):
+    """DataFrame rows as JSON-ready dicts (missing values become null)."""
+    frame = frame.astype(object).where(frame.notna(), None)
+    return frame.to_dict(orient='records')
+
+def _user_id(body, name='user_id'):
+    # JSON numbers and strings both name a user; the dataset decides the final type
+    return str(_required(body, name))
+
+def _required(body, name):
+    if name not in body:
+        raise ValueError(f"Missing field '{name}'.")
+    return body[name]
+
+def handle_similar_category(model, body):
+    top_k = int(body.get('top_k', 10))
+    proximity = bool(body.get('proximity', False))
+    at_time = body.get('at_time')
+    # The store holds the Distance_From_Center ranking only
+    if model.store is not None and top_k <= model.store.k and not proximity and at_time is None:
+        recommendations = model.store.top_unvisited(_user_id(body), str(_required(body, 'category_name')), top_k)
+        return {'recommendations': _records(recommendations)}
+    recommendations = recommend_similar_category_locations(
+        _user_id(body), str(_required(body, 'category_name')), model.data,
+        top_k=top_k, index=model.category_index, cache=model.cache, version=model.version,
+        proximity=proximity, at_time=at_time
+    )
+    return {'recommendations': _records(recommendations)}
+
+def handle_similar_users(model, body):
+    top_n = int(body.get('top_n', 10))
+    if model.store is not None and top_n <= model.store.top_n:
+        similar_users = model.store.similar_users(_user_id(body), top_n)
+    else:
+        similar_users = find_top_similar_users(_user_id(body), model.similarity, top_n=top_n, cache=model.cache,
+                                               version=model.version)
+    return {'similar_users': [{'User_ID': user_id, 'Similarity': float(score)}
+                              for user_id, score in similar_users.items()]}
+
+def handle_meeting_place(model, body):
+    user_ids = _required(body, 'user_ids')
+    if not isinstance(user_ids, list) or not user_ids:
+        raise ValueError("'user_ids' must be a non-empty list.")
+    objective = body.get('objective', 'random')
+    if objective != 'random':
+        members, venues = recommend_meeting_place(
+            [str(user_id) for user_id in user_ids], model.data, k=int(body.get('k', 1)), objective=objective,
+            venue_index=model.venue_index, location_index=model.location_index
+        )
+        if members.empty:
+            raise ValueError("None of the users were found in the dataset.")
+        return {'members': _records(members), 'venues': _records(venues)}
+
+    selected_checkins, venues = recommend_meeting_place_random_checkins(
+        [str(user_id) for user_id in user_ids], model.data, k=int(body.get('k', 1)), venue_index=model.venue_index,
+        location_index=model.location_index
+    )
+    if selected_checkins.empty:
+        raise ValueError("None of the users were found in the dataset.")
+    return {'selected_checkins': _records(selected_checkins), 'venues': _records(venues)}
+
+def handle_meeting_places(model, body):
+    groups = _required(body, 'groups')
+    if not isinstance(groups, list) or len(groups) > MAX_GROUPS or not all(isinstance(group, list) for group in groups):
+        raise ValueError(f"'groups' must be a list of at most {MAX_GROUPS} lists of user IDs.")
+    seed = body.get('seed')
+    centers, venues = recommend_meeting_places(
+        [[str(user_id) for user_id in group] for group in groups], model.data, k=int(body.get('k', 1)),
+        center=body.get('center', 'random'), seed=None if seed is None else int(seed),
+        venue_index=model.venue_index, location_index=model.location_index
+    )
+    return {'centers': _records(centers), 'venues': _records(venues)}
+
+def handle_venues(model, body):
+    user_ids = _required(body, 'user_ids')
+    if not isinstance(user_ids, list) or not user_ids or len(user_ids) > MAX_GROUPS:
+        raise ValueError(f"'user_ids' must be a non-empty list of at most {MAX_GROUPS} user IDs.")
+    if model.covisitation is None:
+        raise ValueError("Venue recommendations are not available for this model.")
+    recommendations = model.covisitation.recommend(
+        [str(user_id) for user_id in user_ids], k=int(body.get('k', 10)),
+        exclude_visited=bool(body.get('exclude_visited', True))
+    )
+    return {'recommendations': _records(recommendations)}
+
+HANDLERS = {
+    '/recommend/category': handle_similar_category,
+    '/recommend/similar-users': handle_similar_users,
+    '/recommend/meeting-place': handle_meeting_place,
+    '/recommend/meeting-places': handle_meeting_places,
+    '/recommend/venues': handle_venues,
+}
+
+
+def dispatch(model, path, body, profile=False):
+    """
+    Run one request against a model, inside a span named after the endpoint.
+
+    Args:
+        model (RecommenderModel): The loaded model.
+        path (str): Endpoint path, optionally ending in /batch.
+        body (dict): Decoded JSON body.
+        profile (bool): Profile the request and return the listing under "profile".
+
+    Returns:
+        tuple: HTTP status and the JSON-ready response (text for /metrics). Batch
+            items that fail carry their own {"error": ...} instead of failing the batch.
+    """
+    if path == '/stats':
+        return HTTPStatus.OK, model.cache.stats()
+    if path == '/metrics':
+        return HTTPStatus.OK, TRACER.prometheus_text()
+
+    # Unknown paths share one span name, so clients cannot grow the metrics without bound
+    endpoint = path[:-len('/batch')] if path.endswith('/batch') else path
+    with TRACER.span(path if endpoint in HANDLERS else 'unknown', profile=profile) as record:
+        status, payload = _dispatch(model, path, body)
+        if isinstance(payload, dict) and 'results' in payload:
+            record.rows = len(payload['results'])
+    if profile and record.profile is not None:
+        payload['profile'] = record.profile
+    return status, payload
+
+def _dispatch(model, path, body):
+    batch = path.endswith('/batch')
+    handler = HANDLERS.get(path[:-len('/batch')] if batch else path)
+    if handler is None:
+        return HTTPStatus.NOT_FOUND, {'error': f"Unknown endpoint '{path}'."}
+    if not isinstance(body, dict):
+        return HTTPStatus.BAD_REQUEST, {'error': "The request body must be a JSON object."}
+
+    if not batch:
+        try:
+            return HTTPStatus.OK, handler(model, body)
+        except (ValueError, TypeError) as error:
+            return HTTPStatus.BAD_REQUEST, {'error': str(error)}
+
+    requests = body.get('requests')
+    if not isinstance(requests, list) or len(requests) > MAX_BATCH_SIZE:
+        return HTTPStatus.BAD_REQUEST, {'error': f"'requests' must be a list of at most {MAX_BATCH_SIZE} objects."}
+    results = []
+    for item in requests:
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("Each request must be a JSON object.")
+            results.append(handler(model, item))
+        except (ValueError, TypeError) as error:
+            results.append({'error': str(error)})
+    return HTTPStatus.OK, {'results': results}
+
+
+#------------------------------
+# Worker processes hold their own copy of the model (the snapshot is memory-mapped)
+
+_worker_model = None
+
+def _init_worker(filepath, categories_path, k, store_dir=None):
+    global _worker_model
+    _worker_model = load_model(filepath, categories_path, k=k, store_dir=store_dir)
+
+def _worker_ready(_):
+    return _worker_model is not None
+
+def _dispatch_in_worker(path, body, profile=False):
+    return dispatch(_worker_model, path, body, profile)
+
+
+class RecommendationService:
+    """
+    asyncio HTTP/1.1 server (keep-alive, JSON bodies) over a RecommenderModel.
+
+    Parsing and I/O stay on the event loop; every request is scored in `executor`,
+    either a thread holding `model` in-process or worker processes that each load
+    their own model (see `serve`).
+    """
+
+    def __init__(self, model, executor, dispatch_fn=None):
+        self.model = model
+        self.executor = executor
+        self._dispatch = dispatch_fn or (lambda path, body, profile=False: dispatch(model, path, body, profile))
+        self.server = None
+
+    async def start(self, host='127.0.0.1', port=8080):
+        self.server = await asyncio.start_server(self._handle_connection, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload = await self._respond(method, path, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # Client went away or sent something that is not HTTP
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader):
+        """Read one request; None at end of stream."""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, path, _ = request_line.decode('latin-1').split(' ', 2)
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get('content-length', 0))
+        if length > MAX_BODY_BYTES:
+            raise ConnectionError("Request body too large.")
+        body = await reader.readexactly(length) if length else b''
+        return method, path, headers, body
+
+    async def _respond(self, method, target, body):
+        path, _, query = target.partition('?')
+        profile = 'profile=1' in query.split('&')
+        if path == '/health':
+            health = {'status': 'ok', 'version': self.model.version if self.model else None}
+            store = self.model.store if self.model else None
+            if store is not None:
+                health['store'] = {'version': store.version, 'built_at': store.built_at}
+            return HTTPStatus.OK, health
+        if method != 'POST' and path not in ('/stats', '/metrics'):
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'error': "Use POST with a JSON body."}
+        try:
+            body = json.loads(body or b'{}')
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, {'error': "The request body is not valid JSON."}
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.executor, self._dispatch, path, body, profile)
+        except Exception as error:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f"{type(error).__name__}: {error}"}
+
+    @staticmethod
+    def _write_response(writer, status, payload, keep_alive):
+        if isinstance(payload, str):
+            body, content_type = payload.encode(), 'text/plain; version=0.0.4'
+        else:
+            body, content_type = json.dumps(payload, default=_json_default).encode(), 'application/json'
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+
+
+async def serve(filepath, categories_path, host='127.0.0.1', port=8080, workers=None, k=50, store_dir=None):
+    """
+    Load the model and serve it until cancelled.
+
+    Args:
+        filepath (str): Raw check-in dataset (TSV or zip).
+        categories_path (str): Category mapping table.
+        host (str): Interface to bind.
+        port (int): Port to bind.
+        workers (int, optional): Worker processes for scoring; 0 scores on a thread
+            in this process. Defaults to the number of cores.
+        k (int): Neighbours kept per user for similar-user queries.
+        store_dir (str, optional): Recommendation store to serve from (see load_model).
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 0:
+        model = load_model(filepath, categories_path, k=k, store_dir=store_dir)
+        service = RecommendationService(model, ThreadPoolExecutor(max_workers=1))
+    else:
+        # Build the snapshot once before the workers load it
+        load_or_build_snapshot(filepath, categories_path)
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(filepath, categories_path, k, store_dir))
+        # Start every worker (and load its model) before accepting traffic
+        list(executor.map(_worker_ready, range(workers)))
+        model = RecommenderModel(None, None, None, None, version=snapshot_key(filepath, categories_path))
+        if store_dir is not None:
+            # Only read here for /health; the workers serve from their own maps
+            model.store = open_store(store_dir, model.version)
+        service = RecommendationService(model, executor, dispatch_fn=_dispatch_in_worker)
+
+    bound_port = await service.start(host, port)
+    print(f"Serving recommendations on http://{host}:{bound_port} ({workers or 'in-process'} workers)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await service.close()
+        service.executor.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('dataset', nargs='?', default='data/dataset_NYC.zip')
+    parser.add_argument('categories', nargs='?', default='data/categories.zip')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--store', default=None, help="Recommendation store directory to serve from.")
+    args = parser.parse_args()
+    asyncio.run(serve(args.dataset, args.categories, args.host, args.port, args.workers, store_dir=args.store))
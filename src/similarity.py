@@ -1,10 +1,67 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
+from scipy import sparse as sp
 from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.preprocessing import OneHotEncoder, MinMaxScaler
+from sklearn.preprocessing import OneHotEncoder, MinMaxScaler, normalize
+
+from src.data_preprocessing import StarSchema
+from src.instrumentation import traced
+from src.utils import coerce_user_id, user_cache_key
+
+class SparseUserProfile:
+    """
+    User profiles as a CSR matrix with a separate user-id index.
+
+    Attributes:
+        index (pd.Index): User IDs, one per matrix row.
+        matrix (scipy.sparse.csr_matrix): One-hot preferred category and time bucket,
+            followed by the min-max normalized Avg_Latitude and Avg_Longitude.
+        feature_names (np.ndarray): Column names, as in the dense profile.
+    """
+
+    def __init__(self, index, matrix, feature_names):
+        self.index = index
+        self.matrix = matrix
+        self.feature_names = feature_names
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def empty(self):
+        return self.matrix.shape[0] == 0
+
+    def to_frame(self):
+        """Densify into the DataFrame layout returned by compute_user_profile(sparse=False)."""
+        frame = pd.DataFrame(self.matrix.toarray(), columns=self.feature_names)
+        frame.insert(0, 'User_ID', self.index.to_numpy())
+        return frame
+
+
+@traced(rows=len)
+def compute_user_profile(data, sparse=False):
+    """
+    Create a User Profile with relevant features.
+
+    Args:
+        data (pd.DataFrame or StarSchema): Dataset with the per-user engineered columns;
+            for a StarSchema the users table is used directly.
+        sparse (bool): Return a SparseUserProfile (CSR matrix + user index) instead of
+            a dense DataFrame. Nearly all one-hot columns are zero, so this keeps memory
+            proportional to the number of users rather than users x categories.
+
+    Returns:
+        pd.DataFrame or SparseUserProfile: One row per user.
+    """
+    if isinstance(data, StarSchema):
+        data = data.users
 
-def compute_user_profile(data):
-    """Create a User Profile with relevant features."""
     if data.empty:
+        if sparse:
+            return SparseUserProfile(pd.Index([], name='User_ID'), sp.csr_matrix((0, 0)), np.array([], dtype=object))
         return pd.DataFrame(columns=['User_ID'])  # Return an empty DataFrame if input is empty
 
     # Extract relevant user features
@@ -14,12 +71,18 @@ def compute_user_profile(data):
     encoder = OneHotEncoder()
     encoded_features = encoder.fit_transform(user_features[['Category_Name_Preferred', 'Time_Bucket_Preferred']])
 
-    # Convert encoded features to DataFrame
-    encoded_df = pd.DataFrame(encoded_features.toarray(), columns=encoder.get_feature_names_out())
-
     # Normalize numerical features
     scaler = MinMaxScaler()
     normalized_coords = scaler.fit_transform(user_features[['Avg_Latitude', 'Avg_Longitude']])
+
+    if sparse:
+        # Stay in CSR: the one-hot block is already sparse, the two coordinates are appended as columns
+        matrix = sp.hstack([encoded_features, sp.csr_matrix(normalized_coords)], format='csr')
+        feature_names = np.concatenate([encoder.get_feature_names_out(), ['Avg_Latitude', 'Avg_Longitude']])
+        return SparseUserProfile(pd.Index(user_features['User_ID'].to_numpy(), name='User_ID'), matrix, feature_names)
+
+    # Convert encoded features to DataFrame
+    encoded_df = pd.DataFrame(encoded_features.toarray(), columns=encoder.get_feature_names_out())
     normalized_coords_df = pd.DataFrame(normalized_coords, columns=['Avg_Latitude', 'Avg_Longitude'])
 
     # Combine all features
@@ -30,46 +93,292 @@ def compute_user_profile(data):
     return user_features_combined
 
 
-def compute_user_similarity(user_data):
-    """Compute similarity between users."""
+def _profile_matrix(user_data):
+    """Return (user index, feature matrix) for a dense or sparse profile."""
+    if isinstance(user_data, SparseUserProfile):
+        return user_data.index, user_data.matrix
 
-    # Set User_ID as the index
     user_features_matrix = user_data.set_index('User_ID')
+    return user_features_matrix.index, user_features_matrix.to_numpy(dtype=np.float64)
+
+
+@traced(rows=len)
+def compute_user_similarity(user_data):
+    """Compute similarity between users (dense or sparse profiles)."""
+
+    # User_ID index and feature matrix
+    index, features = _profile_matrix(user_data)
 
     # Compute cosine similarity
-    user_similarity = cosine_similarity(user_features_matrix)
+    user_similarity = cosine_similarity(features)
 
     # Convert similarity matrix to DataFrame
     user_similarity_df = pd.DataFrame(
         user_similarity,
-        index=user_features_matrix.index,
-        columns=user_features_matrix.index
+        index=index,
+        columns=index
     )
 
     return user_similarity_df
 
-def find_top_similar_users(user_id, user_similarity_df, top_n=10):
+class TopKSimilarity:
+    """
+    The k most similar users of every user, without the dense N x N matrix.
+
+    Attributes:
+        index (pd.Index): User IDs, in row order.
+        neighbors (np.ndarray): (n_users, k) int32 row numbers of each user's neighbours,
+            most similar first. The user themselves is never included.
+        scores (np.ndarray): (n_users, k) cosine similarity of each neighbour.
+    """
+
+    def __init__(self, index, neighbors, scores):
+        self.index = index
+        self.neighbors = neighbors
+        self.scores = scores
+
+    @property
+    def k(self):
+        return self.neighbors.shape[1]
+
+    def top(self, user_id, top_n=10):
+        """Return the top_n (at most k) neighbours of a user as a Series indexed by User_ID."""
+        row = self.index.get_loc(user_id)
+        top_n = min(top_n, self.k)
+        return pd.Series(
+            self.scores[row, :top_n],
+            index=self.index[self.neighbors[row, :top_n]],
+            name=user_id
+        )
+
+
+# Normalized feature matrix shared with pool workers (set once per worker by the initializer)
+_worker_matrix = None
+
+def _init_worker(matrix):
+    global _worker_matrix
+    _worker_matrix = matrix
+
+def _top_k_block(start, stop, k, matrix=None):
+    """Top-k neighbours of rows start:stop against all rows of the normalized matrix."""
+    matrix = _worker_matrix if matrix is None else matrix
+
+    # Dense (block, n_users) slice of the similarity matrix
+    if sp.issparse(matrix):
+        # sparse @ dense costs O(nnz x block) and yields the dense slice directly
+        block = np.ascontiguousarray((matrix @ matrix[start:stop].toarray().T).T)
+    else:
+        block = matrix[start:stop] @ matrix.T
+
+    # Exclude each user from their own neighbours
+    rows = np.arange(stop - start)
+    block[rows, start + rows] = -np.inf
+
+    # Unordered top-k per row, then order those k by score (ties by row number)
+    candidates = np.argpartition(-block, k - 1, axis=1)[:, :k]
+    candidates.sort(axis=1)
+    candidate_scores = np.take_along_axis(block, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+
+    neighbors = np.take_along_axis(candidates, order, axis=1).astype(np.int32)
+    scores = np.take_along_axis(candidate_scores, order, axis=1)
+    return neighbors, scores
+
+@traced(rows=lambda similarity: len(similarity.index))
+def compute_top_k_similarity(user_data, k=50, max_memory_mb=256, n_jobs=1):
+    """
+    Compute each user's k most similar users by cosine similarity, block by block.
+
+    Only one (block_size x n_users) slice of the similarity matrix exists at a
+    time per worker, sized so that all workers together stay within
+    `max_memory_mb` of scratch memory.
+
+    Args:
+        user_data (pd.DataFrame or SparseUserProfile): Output of compute_user_profile.
+        k (int): Neighbours kept per user (capped at n_users - 1).
+        max_memory_mb (float): Bound on the similarity scratch memory across all workers.
+        n_jobs (int): Worker processes; 1 computes in-process, -1 uses all cores.
+
+    Returns:
+        TopKSimilarity: Neighbour ids and scores per user.
+    """
+    index, features = _profile_matrix(user_data)
+    n_users = len(index)
+    k = min(k, n_users - 1)
+    if k <= 0:
+        return TopKSimilarity(index, np.empty((n_users, 0), dtype=np.int32), np.empty((n_users, 0)))
+
+    # Cosine similarity is the dot product of L2-normalized rows
+    matrix = normalize(features)
+
+    if n_jobs == -1:
+        n_jobs = os.cpu_count() or 1
+
+    # Each row of a block costs its similarities, their negation and argpartition's
+    # int64 indices (8 bytes each per user), plus the sparse product's temporary
+    bytes_per_row = 32 * n_users
+    block_size = max(1, int(max_memory_mb * 2**20 // (bytes_per_row * n_jobs)))
+    bounds = [(start, min(start + block_size, n_users)) for start in range(0, n_users, block_size)]
+
+    if n_jobs == 1:
+        results = [_top_k_block(start, stop, k, matrix) for start, stop in bounds]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(matrix,)) as executor:
+            results = list(executor.map(_top_k_block, *zip(*bounds), [k] * len(bounds)))
+
+    neighbors = np.vstack([block_neighbors for block_neighbors, _ in results])
+    scores = np.vstack([block_scores for _, block_scores in results])
+    return TopKSimilarity(index, neighbors, scores)
+
+class PreferenceIncidence:
+    """
+    Which (category, time bucket) pairs each user has checked in at, as a 0/1 CSR matrix.
+
+    The preference overlap of two users (the number of pairs they share) is the dot
+    product of their rows, so overlaps against many users come from one sparse product.
+
+    Attributes:
+        index (pd.Index): User IDs, one per matrix row.
+        matrix (scipy.sparse.csr_matrix): (n_users, n_pairs) int32 incidence.
+        pairs (pd.MultiIndex): (Category_Name, Time_Bucket) of each column.
+    """
+
+    def __init__(self, index, matrix, pairs):
+        self.index = index
+        self.matrix = matrix
+        self.pairs = pairs
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def _rows(self, user_ids):
+        rows = self.index.get_indexer(pd.Index(user_ids))
+        if (rows < 0).any():
+            missing = pd.Index(user_ids)[rows < 0][0]
+            raise ValueError(f"User ID {missing} not found in the dataset.")
+        return rows
+
+    def overlap(self, user_id, other_ids):
+        """
+        Pairs `user_id` shares with each of `other_ids`.
+
+        Returns:
+            pd.Series: Overlap counts indexed by other_ids.
+        """
+        user_id = coerce_user_id(user_id, self.index.dtype)
+        row = self.matrix[self._rows([user_id])]
+        others = self._rows(other_ids)
+        counts = (self.matrix[others] @ row.T).toarray().ravel()
+        return pd.Series(counts, index=pd.Index(other_ids, name='User_ID'), name=user_id)
+
+    def pairwise(self, user_ids=None):
+        """
+        Overlap of every pair of users (or of `user_ids`), as a sparse (n, n) matrix in row order.
+
+        Pairs that share nothing are not stored; the diagonal is each user's own pair count.
+        """
+        matrix = self.matrix if user_ids is None else self.matrix[self._rows(user_ids)]
+        return (matrix @ matrix.T).tocsr()
+
+    def neighbor_overlap(self, similarity, top_n=10):
+        """
+        Overlap of every user with each of their top_n neighbours, in a single pass.
+
+        Args:
+            similarity (TopKSimilarity): Neighbours from compute_top_k_similarity.
+            top_n (int): Neighbours per user (capped at the similarity's k).
+
+        Returns:
+            np.ndarray: (n_users, top_n) overlaps aligned with similarity.neighbors.
+        """
+        top_n = min(top_n, similarity.k)
+        rows = self._rows(similarity.index)
+        users = np.repeat(rows, top_n)
+        neighbors = rows[similarity.neighbors[:, :top_n].ravel()]
+        # Row-wise dot products of the gathered rows: the diagonal of the pair product, without the rest
+        counts = np.asarray(self.matrix[users].multiply(self.matrix[neighbors]).sum(axis=1)).ravel()
+        return counts.reshape(len(rows), top_n)
+
+
+@traced(rows=len)
+def compute_preference_incidence(data):
+    """
+    Build the user x (Category_Name, Time_Bucket) incidence matrix of a dataset.
+
+    Args:
+        data (pd.DataFrame or StarSchema): Check-ins with User_ID, Category_Name and
+            Time_Bucket (output of feature_engineering).
+
+    Returns:
+        PreferenceIncidence: One row per user, in order of first appearance.
+    """
+    if isinstance(data, StarSchema):
+        user_codes = data.checkins['user_key'].to_numpy()
+        user_index = pd.Index(data.users['User_ID'].to_numpy(), name='User_ID')
+        checkins = data.checkins
+    else:
+        user_codes, user_ids = pd.factorize(data['User_ID'])
+        user_index = pd.Index(user_ids, name='User_ID')
+        checkins = data
+
+    # Missing values count as a value of their own, as the merge they replace matched them
+    category_codes, categories = pd.factorize(checkins['Category_Name'], use_na_sentinel=False)
+    bucket_codes, buckets = pd.factorize(checkins['Time_Bucket'], use_na_sentinel=False)
+    pair_codes, pair_keys = pd.factorize(category_codes.astype(np.int64) * len(buckets) + bucket_codes)
+
+    # One stored entry per distinct (user, pair)
+    keys = np.unique(user_codes.astype(np.int64) * len(pair_keys) + pair_codes)
+    rows, columns = np.divmod(keys, len(pair_keys)) if len(pair_keys) else (keys, keys)
+    matrix = sp.csr_matrix(
+        (np.ones(len(keys), dtype=np.int32), (rows, columns)), shape=(len(user_index), len(pair_keys))
+    )
+    pairs = pd.MultiIndex.from_arrays(
+        [np.asarray(categories, dtype=object)[pair_keys // len(buckets)] if len(pair_keys) else [],
+         np.asarray(buckets, dtype=object)[pair_keys % len(buckets)] if len(pair_keys) else []],
+        names=['Category_Name', 'Time_Bucket']
+    )
+    return PreferenceIncidence(user_index, matrix, pairs)
+
+@traced(rows=len)
+def find_top_similar_users(user_id, user_similarity_df, top_n=10, cache=None, version=None):
     """
     Find the top N most similar users for a given user.
 
     Args:
         user_id (str): The user ID to find similar users for.
-        user_similarity_df (pd.DataFrame): User similarity matrix.
+        user_similarity_df (pd.DataFrame or TopKSimilarity): User similarity matrix, or the
+            top-k neighbours from compute_top_k_similarity (top_n is then capped at k).
         top_n (int): Number of similar users to return.
+        cache (ResultCache, optional): Serve repeated requests from this cache; its
+            version must identify `user_similarity_df`.
+        version (optional): Current version of `user_similarity_df` (e.g. a model's version
+            or IncrementalFeatureStore.version); a cache on another version drops its entries first.
 
     Returns:
         pd.Series: Top N similar users and their similarity scores.
     """
+    if cache is not None:
+        return cache.get_or_compute(
+            'similar_users', (user_cache_key(user_id, user_similarity_df.index.dtype), int(top_n)),
+            lambda: find_top_similar_users(user_id, user_similarity_df, top_n), version=version
+        )
+
+    user_id = coerce_user_id(user_id, user_similarity_df.index.dtype)
     if user_id not in user_similarity_df.index:
         raise ValueError(f"User ID {user_id} not found in the dataset.")
-    
+
+    if isinstance(user_similarity_df, TopKSimilarity):
+        return user_similarity_df.top(user_id, top_n)
+
     # Sort similar users by similarity score, excluding the user themselves
     similar_users = user_similarity_df.loc[user_id].sort_values(ascending=False).iloc[1:top_n + 1]
     return similar_users
 
 if __name__ == "__main__":
+    from src.snapshot import load_or_build_snapshot
+
     # Load the preprocessed data
-    data = pd.read_csv("data/processed_data.csv", sep="\t", encoding="ISO-8859-1")
+    data = load_or_build_snapshot("data/dataset_NYC.zip", "data/categories.zip")
 
     # Precompute user similarity matrix
     user_data = compute_user_profile(data)
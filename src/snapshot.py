@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from src.data_preprocessing import load_data, preprocess_data, feature_engineering
+from src.instrumentation import traced
+from src.utils import replace_directory
+
+# Bump when the on-disk layout or the feature pipeline changes, so old snapshots are rebuilt
+SNAPSHOT_FORMAT_VERSION = 1
+
+MANIFEST_FILE = 'manifest.json'
+
+
+def snapshot_key(*paths):
+    """
+    Hash the identity of a build's input files into a snapshot key.
+
+    Files are identified by resolved path, size and modification time, so the
+    key costs one stat per file instead of reading a whole dump on every start.
+
+    Args:
+        *paths (str): Raw check-in file(s) and the categories table.
+
+    Returns:
+        str: Hex digest identifying this exact set of inputs.
+    """
+    digest = hashlib.sha256(f"snapshot-v{SNAPSHOT_FORMAT_VERSION}".encode())
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{os.path.realpath(path)}\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode())
+    return digest.hexdigest()
+
+
+def save_snapshot(data, snapshot_dir, key=None):
+    """
+    Write a processed DataFrame as one `.npy` file per column plus a JSON manifest.
+
+    Numeric and datetime columns are stored as-is; categorical and string
+    columns are dictionary-encoded (integer codes + a list of values).
+    The directory is written in full under a temporary name, then swapped in.
+
+    Args:
+        data (pd.DataFrame): Processed dataset (output of feature_engineering).
+        snapshot_dir (str): Target directory.
+        key (str, optional): Input hash stored in the manifest.
+
+    Returns:
+        str: The snapshot directory.
+    """
+    parent = os.path.dirname(os.path.abspath(snapshot_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix='.snapshot-')
+
+    columns = []
+    for i, name in enumerate(data.columns):
+        column = data[name]
+        entry = {'name': name, 'file': f"{i:03d}.npy"}
+
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            entry['kind'] = 'category'
+            entry['categories'] = column.cat.categories.tolist()
+            values = column.cat.codes.to_numpy()
+        elif pd.api.types.is_object_dtype(column) or pd.api.types.is_string_dtype(column):
+            entry['kind'] = 'string'
+            entry['dtype'] = str(column.dtype)
+            codes, uniques = pd.factorize(column, use_na_sentinel=True)
+            entry['categories'] = uniques.tolist()
+            values = codes.astype(np.int32)
+        else:
+            entry['kind'] = 'array'
+            values = column.to_numpy()
+
+        np.save(os.path.join(tmp_dir, entry['file']), values, allow_pickle=False)
+        columns.append(entry)
+
+    manifest = {
+        'format_version': SNAPSHOT_FORMAT_VERSION,
+        'key': key,
+        'n_rows': len(data),
+        'columns': columns,
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f)
+
+    replace_directory(tmp_dir, snapshot_dir)
+    return snapshot_dir
+
+
+def load_snapshot(snapshot_dir, mmap=True):
+    """
+    Load a snapshot written by save_snapshot.
+
+    With `mmap=True` numeric, datetime and categorical columns are backed by
+    read-only memory maps of the `.npy` files (no copy); string columns are
+    decoded from their dictionary with a single take.
+
+    Args:
+        snapshot_dir (str): Snapshot directory.
+        mmap (bool): Memory-map the column files instead of reading them.
+
+    Returns:
+        pd.DataFrame: The processed dataset with its original column order and dtypes.
+    """
+    with open(os.path.join(snapshot_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+
+    mmap_mode = 'r' if mmap else None
+    columns = {}
+    for entry in manifest['columns']:
+        values = np.load(os.path.join(snapshot_dir, entry['file']), mmap_mode=mmap_mode, allow_pickle=False)
+        # Plain ndarray view over the map, so pandas treats it like any other column
+        values = values.view(np.ndarray)
+
+        if entry['kind'] == 'category':
+            dtype = pd.CategoricalDtype(entry['categories'])
+            columns[entry['name']] = pd.Categorical.from_codes(values, dtype=dtype)
+        elif entry['kind'] == 'string':
+            dictionary = np.array(entry['categories'] + [np.nan], dtype=object)
+            decoded = dictionary[values]
+            dtype = entry.get('dtype', 'object')
+            # Restore pandas' string dtype (the default for text columns in pandas 3)
+            columns[entry['name']] = decoded if dtype == 'object' else pd.array(decoded, dtype=dtype)
+        else:
+            columns[entry['name']] = values
+
+    return pd.DataFrame(columns, copy=False)
+
+
+def read_snapshot_key(snapshot_dir):
+    """Return the input hash stored in a snapshot's manifest, or None if there is no snapshot."""
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if manifest.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+        return None
+    return manifest.get('key')
+
+
+def build_snapshot(filepath, categories_path, snapshot_root='data/snapshots', n_jobs=1):
+    """
+    Run the full preprocessing pipeline once and persist the result.
+
+    Args:
+        filepath (str): Raw check-in dataset (TSV or zip).
+        categories_path (str): Category mapping table.
+        snapshot_root (str): Directory holding snapshots, one subdirectory per input hash.
+        n_jobs (int): Worker processes for preprocess_data and feature_engineering.
+
+    Returns:
+        str: The snapshot directory.
+    """
+    key = snapshot_key(filepath, categories_path)
+    data = load_data(filepath)
+    data = preprocess_data(data, n_jobs=n_jobs)
+    data = feature_engineering(data, categories_path, n_jobs=n_jobs)
+    return save_snapshot(data, os.path.join(snapshot_root, key), key=key)
+
+
+@traced(rows=len)
+def load_or_build_snapshot(filepath, categories_path, snapshot_root='data/snapshots', mmap=True, n_jobs=1):
+    """
+    Load the processed dataset for the given inputs, building the snapshot first if needed.
+
+    Args:
+        filepath (str): Raw check-in dataset (TSV or zip).
+        categories_path (str): Category mapping table.
+        snapshot_root (str): Directory holding snapshots, one subdirectory per input hash.
+        mmap (bool): Memory-map the column files.
+        n_jobs (int): Worker processes used if the snapshot has to be built.
+
+    Returns:
+        pd.DataFrame: The processed dataset.
+    """
+    key = snapshot_key(filepath, categories_path)
+    snapshot_dir = os.path.join(snapshot_root, key)
+
+    if read_snapshot_key(snapshot_dir) != key:
+        build_snapshot(filepath, categories_path, snapshot_root, n_jobs=n_jobs)
+
+    return load_snapshot(snapshot_dir, mmap=mmap)
+
+
+if __name__ == "__main__":
+    import sys
+
+    filepath = sys.argv[1] if len(sys.argv) > 1 else "data/dataset_NYC.zip"
+    categories_path = sys.argv[2] if len(sys.argv) > 2 else "data/categories.zip"
+    print(f"Snapshot written to {build_snapshot(filepath, categories_path, n_jobs=-1)}")
@@ -0,0 +1,290 @@
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+from src.data_preprocessing import StarSchema
+from src.utils import EARTH_RADIUS_KM, coerce_user_id, haversine_km
+
+# Venue attributes kept when indexing a StarSchema
+VENUE_COLUMNS = ['Venue_ID', 'Venue_Category_ID', 'Category_Name', 'Broader_Category', 'Latitude', 'Longitude',
+                 'Popularity_Score', 'totalVisits', 'Busy_TimeBucket']
+
+
+class VenueIndex:
+    """
+    Haversine BallTree over the unique venues of a dataset.
+
+    Build it once when the model is loaded and reuse it for every query, so a
+    lookup costs O(k log n) instead of a dedupe and refit over the check-ins.
+    Distances are great-circle distances in kilometres.
+    """
+
+    def __init__(self, data, leaf_size=40):
+        """
+        Args:
+            data (pd.DataFrame or StarSchema): Dataset with Venue_ID, Latitude and
+                Longitude (and optionally Category_Name) columns. The first row of
+                each venue is kept as its representative.
+            leaf_size (int): Leaf size of the underlying BallTree.
+        """
+        if isinstance(data, StarSchema):
+            data = data.to_wide(VENUE_COLUMNS)
+        self.venues = data.drop_duplicates(subset='Venue_ID').reset_index(drop=True)
+        self.leaf_size = leaf_size
+        self._coords = np.radians(self.venues[['Latitude', 'Longitude']].to_numpy(dtype=np.float64))
+        self._tree = BallTree(self._coords, leaf_size=leaf_size, metric='haversine')
+        # Per-category trees are built lazily on first use
+        self._category_trees = {}
+
+    def __len__(self):
+        return len(self.venues)
+
+    def _tree_for(self, category):
+        """Return (tree, positions into self.venues) for a category, or all venues if None."""
+        if category is None:
+            return self._tree, None
+
+        key = category.lower()
+        if key not in self._category_trees:
+            mask = (self.venues['Category_Name'].astype(str).str.lower() == key).to_numpy()
+            positions = np.flatnonzero(mask)
+            if len(positions) == 0:
+                raise ValueError(f"Category name '{category}' not found in the dataset.")
+            tree = BallTree(self._coords[positions], leaf_size=self.leaf_size, metric='haversine')
+            self._category_trees[key] = (tree, positions)
+        return self._category_trees[key]
+
+    def _result(self, positions, distances):
+        venues = self.venues.iloc[positions].copy()
+        venues['Distance_From_Central'] = distances
+        return venues
+
+    def query_nearest(self, point, k=1, category=None):
+        """
+        Find the k venues nearest to a point.
+
+        Args:
+            point (tuple): Latitude and longitude in degrees.
+            k (int): Number of venues to return (capped at the number of candidates).
+            category (str, optional): Only consider venues of this Category_Name (case-insensitive).
+
+        Returns:
+            pd.DataFrame: The nearest venues ordered by distance, with Distance_From_Central in km.
+        """
+        tree, positions = self._tree_for(category)
+        k = min(k, tree.data.shape[0])
+        distances, indices = tree.query(np.radians([point]), k=k)
+        indices = indices[0] if positions is None else positions[indices[0]]
+        return self._result(indices, distances[0] * EARTH_RADIUS_KM)
+
+    def query_nearest_batch(self, points, k=1):
+        """
+        Find the k venues nearest to each of many points with one tree query.
+
+        Args:
+            points (np.ndarray): Shape (n, 2), latitudes and longitudes in degrees.
+            k (int): Venues per point (capped at the number of venues).
+
+        Returns:
+            tuple: Venue positions into `venues` and distances in km, both of shape
+                (n, k) and ordered by distance.
+        """
+        k = min(k, len(self.venues))
+        distances, positions = self._tree.query(np.radians(np.asarray(points, dtype=np.float64).reshape(-1, 2)), k=k)
+        return positions, distances * EARTH_RADIUS_KM
+
+    def query_radius(self, point, radius_km, category=None):
+        """
+        Find all venues within a radius of a point.
+
+        Args:
+            point (tuple): Latitude and longitude in degrees.
+            radius_km (float): Search radius in kilometres.
+            category (str, optional): Only consider venues of this Category_Name (case-insensitive).
+
+        Returns:
+            pd.DataFrame: Venues within the radius ordered by distance, with Distance_From_Central in km.
+        """
+        tree, positions = self._tree_for(category)
+        indices, distances = tree.query_radius(
+            np.radians([point]), r=radius_km / EARTH_RADIUS_KM, return_distance=True, sort_results=True
+        )
+        indices = indices[0] if positions is None else positions[indices[0]]
+        return self._result(indices, distances[0] * EARTH_RADIUS_KM)
+
+
+# Side of a GridIndex cell; about a city block group at NYC's latitude
+GRID_CELL_KM = 1.0
+
+KM_PER_DEGREE_LATITUDE = np.pi * EARTH_RADIUS_KM / 180
+
+
+class GridIndex:
+    """
+    Points bucketed into square latitude/longitude cells, for radius prefilters.
+
+    Points are sorted by cell (row-major), so the cells a search circle covers
+    are one contiguous slice per cell row; only the points in those slices get
+    an exact haversine distance. Longitudes are not wrapped at the antimeridian.
+    """
+
+    def __init__(self, latitude, longitude, cell_km=GRID_CELL_KM):
+        """
+        Args:
+            latitude, longitude (array-like): Point coordinates in degrees.
+            cell_km (float): Side of a cell in kilometres of latitude.
+        """
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        self.cell_degrees = cell_km / KM_PER_DEGREE_LATITUDE
+        rows = np.floor(latitude / self.cell_degrees).astype(np.int64)
+        columns = np.floor(longitude / self.cell_degrees).astype(np.int64)
+        self._row0 = rows.min() if len(rows) else 0
+        self._column0 = columns.min() if len(columns) else 0
+        self._n_rows = (rows.max() - self._row0 + 1) if len(rows) else 0
+        self._n_columns = (columns.max() - self._column0 + 1) if len(columns) else 0
+
+        cells = (rows - self._row0) * self._n_columns + (columns - self._column0)
+        self.order = np.argsort(cells, kind='stable')
+        self._cells = cells[self.order]
+        self._latitude = latitude[self.order]
+        self._longitude = longitude[self.order]
+
+    def __len__(self):
+        return len(self.order)
+
+    def _cell_ranges(self, latitude, longitude, radius_km):
+        """Row and column ranges (inclusive, clipped to the grid) of the cells around a circle."""
+        degrees = radius_km / KM_PER_DEGREE_LATITUDE
+        # Longitude degrees shrink with latitude: widen by the circle's most poleward latitude
+        widest = min(abs(latitude) + degrees, 89.9)
+        longitude_degrees = degrees / np.cos(np.radians(widest))
+        first_row = max(int(np.floor((latitude - degrees) / self.cell_degrees)) - self._row0, 0)
+        last_row = min(int(np.floor((latitude + degrees) / self.cell_degrees)) - self._row0, self._n_rows - 1)
+        first_column = max(int(np.floor((longitude - longitude_degrees) / self.cell_degrees)) - self._column0, 0)
+        last_column = min(int(np.floor((longitude + longitude_degrees) / self.cell_degrees)) - self._column0,
+                          self._n_columns - 1)
+        return first_row, last_row, first_column, last_column
+
+    def covers(self, latitude, longitude, radius_km):
+        """
+        Whether a circle's cell ranges span the whole grid (a search that can grow no further).
+
+        Points in those cells may still lie outside the circle, e.g. in its bounding box corners.
+        """
+        first_row, last_row, first_column, last_column = self._cell_ranges(latitude, longitude, radius_km)
+        return first_row == 0 and last_row == self._n_rows - 1 and first_column == 0 and last_column == self._n_columns - 1
+
+    def query_radius(self, latitude, longitude, radius_km):
+        """
+        Find the points within a radius of a point.
+
+        Args:
+            latitude, longitude (float): Centre in degrees.
+            radius_km (float): Search radius in kilometres.
+
+        Returns:
+            tuple: Positions of the points (in the order given to the constructor, ascending)
+                and their haversine distances in km.
+        """
+        first_row, last_row, first_column, last_column = self._cell_ranges(latitude, longitude, radius_km)
+        if first_row > last_row or first_column > last_column:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+
+        # One contiguous slice of the sorted points per cell row
+        row_starts = np.arange(first_row, last_row + 1) * self._n_columns
+        starts = np.searchsorted(self._cells, row_starts + first_column)
+        stops = np.searchsorted(self._cells, row_starts + last_column + 1)
+        lengths = stops - starts
+        candidates = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+        distances = haversine_km(latitude, longitude, self._latitude[candidates], self._longitude[candidates])
+        within = distances <= radius_km
+        positions = self.order[candidates[within]]
+        order = np.argsort(positions)
+        return positions[order], distances[within][order]
+
+
+class UserLocationIndex:
+    """
+    Every user's check-in locations, stored contiguously per user.
+
+    Repeated check-ins at the same coordinates are collapsed into one location
+    weighted by the number of visits, so a member's whole history is a slice of
+    a few flat arrays and gathering a group costs one vectorized take.
+    """
+
+    def __init__(self, data):
+        """
+        Args:
+            data (pd.DataFrame or StarSchema): Check-ins with User_ID, Latitude and Longitude.
+        """
+        if isinstance(data, StarSchema):
+            keys = data.checkins['user_key'].to_numpy()
+            user_ids = pd.Index(data.users['User_ID'].to_numpy())
+            checkins = data.checkins
+        else:
+            keys, user_ids = pd.factorize(data['User_ID'])
+            checkins = data
+
+        locations = pd.DataFrame({
+            'key': keys,
+            'Latitude': checkins['Latitude'].to_numpy(dtype=np.float64),
+            'Longitude': checkins['Longitude'].to_numpy(dtype=np.float64),
+        }).groupby(['key', 'Latitude', 'Longitude'], sort=True).size()
+
+        location_keys = locations.index.get_level_values('key').to_numpy()
+        self.user_ids = pd.Index(user_ids)
+        self.latitude = locations.index.get_level_values('Latitude').to_numpy()
+        self.longitude = locations.index.get_level_values('Longitude').to_numpy()
+        self.weights = locations.to_numpy(dtype=np.float64)
+        self.offsets = np.searchsorted(location_keys, np.arange(len(self.user_ids) + 1))
+        # Running visit count, for drawing a random check-in of a user by inverse CDF
+        self.cumulative_weights = np.cumsum(self.weights)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def positions(self, user_ids):
+        """Index positions of the given users; -1 for unknown users."""
+        user_ids = [coerce_user_id(user_id, self.user_ids.dtype) for user_id in user_ids]
+        return self.user_ids.get_indexer(user_ids)
+
+    def gather(self, positions):
+        """
+        Collect the locations of several users at once.
+
+        Args:
+            positions (np.ndarray): User positions from positions(); all must be known.
+
+        Returns:
+            tuple: (owner, latitude, longitude, weights) where owner[i] is the index into
+                `positions` that location i belongs to. Locations are grouped by owner.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        starts = self.offsets[positions]
+        lengths = self.offsets[positions + 1] - starts
+        owner = np.repeat(np.arange(len(positions)), lengths)
+        # Position of every gathered location inside its user's slice
+        within = np.arange(len(owner)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        rows = starts[owner] + within
+        return owner, self.latitude[rows], self.longitude[rows], self.weights[rows]
+
+    def sample(self, positions, rng):
+        """
+        Draw one check-in per user, each check-in equally likely.
+
+        Args:
+            positions (np.ndarray): User positions from positions(); all must be known.
+            rng (np.random.Generator): Source of randomness.
+
+        Returns:
+            tuple: Latitude and longitude of the drawn check-in of every user.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        starts, stops = self.offsets[positions], self.offsets[positions + 1]
+        before = np.where(starts > 0, self.cumulative_weights[np.maximum(starts - 1, 0)], 0.0)
+        visits = self.cumulative_weights[stops - 1] - before
+        draws = before + rng.random(len(positions)) * visits
+        rows = np.minimum(np.searchsorted(self.cumulative_weights, draws, side='right'), stops - 1)
+        return self.latitude[rows], self.longitude[rows]
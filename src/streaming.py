@@ -0,0 +1,256 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.data_preprocessing import (
+    load_data, preprocess_data, StarSchema, CHECKIN_COLUMNS, _FACT_CATEGORICAL_COLUMNS
+)
+from src.incremental import IncrementalFeatureStore
+from src.instrumentation import traced
+from src.utils import haversine_km
+
+# Rough peak bytes per raw row while one chunk is parsed, deduped, cleaned and aggregated
+CHUNK_BYTES_PER_ROW = 2048
+
+# Rough steady-state bytes held between chunks
+KEY_BYTES = 160                 # per user or venue id (dict entry, list slot, the id string)
+CATEGORY_PAIR_BYTES = 100       # per distinct (user, category) pair
+FACT_BYTES_PER_ROW = 59         # per kept check-in, when the fact table stays in memory
+
+MIN_CHUNK_ROWS = 1000
+
+# Fact table columns filled chunk by chunk, with their on-disk dtypes
+_FACT_DTYPES = {
+    'user_key': np.int32,
+    'venue_key': np.int32,
+    'Venue_Category_ID': np.int32,
+    'Category_Name': np.int32,
+    'Latitude': np.float32,
+    'Longitude': np.float32,
+    'Local_Time': np.int64,
+    'Broader_Category': np.int32,
+    'Day_of_Week': np.int32,
+    'Is_Weekend': np.int64,
+    'Hour': np.int32,
+    'Time_Bucket': np.int32,
+}
+_CODED_COLUMNS = ['Category_Name'] + _FACT_CATEGORICAL_COLUMNS
+
+
+class _RowDeduper:
+    """Drop raw rows already seen in this or an earlier chunk, by 64-bit row hash."""
+
+    def __init__(self):
+        self.seen = np.zeros(0, dtype=np.uint64)
+
+    def new_rows(self, chunk):
+        """Boolean mask of the rows in `chunk` that were not seen before (first copy kept)."""
+        hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+        mask = ~pd.Series(hashes).duplicated().to_numpy()
+
+        if len(self.seen):
+            positions = np.minimum(np.searchsorted(self.seen, hashes), len(self.seen) - 1)
+            mask &= self.seen[positions] != hashes
+
+        fresh = np.sort(hashes[mask])
+        self.seen = np.insert(self.seen, np.searchsorted(self.seen, fresh), fresh)
+        return mask
+
+
+class _Dictionary:
+    """Global codes for a string column, assigned in order of first appearance."""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def add(self, values):
+        for value in values:
+            if value not in self.codes:
+                self.codes[value] = len(self.values)
+                self.values.append(value)
+
+    def encode(self, values):
+        """Codes for `values`, registering unseen ones; missing values get -1."""
+        codes, uniques = pd.factorize(values)
+        self.add(uniques)
+        lookup = np.array([self.codes[value] for value in uniques] + [-1], dtype=np.int32)
+        return lookup[codes]
+
+    def sorted_categories(self):
+        """Categories in the order astype('category') gives them, and old code -> new code."""
+        order = np.argsort(np.array(self.values, dtype=object), kind='stable')
+        remap = np.empty(len(order) + 1, dtype=np.int32)
+        remap[order] = np.arange(len(order), dtype=np.int32)
+        remap[-1] = -1
+        return pd.Index([self.values[i] for i in order]), remap
+
+
+class _FactColumns:
+    """Fact table columns appended chunk by chunk, in memory or in raw files under `directory`."""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._parts = {name: [] for name in _FACT_DTYPES}
+        self.n_rows = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            for name in _FACT_DTYPES:
+                open(self._path(name), 'wb').close()
+
+    def _path(self, name):
+        return os.path.join(self.directory, f'{name}.bin')
+
+    def append(self, columns):
+        for name, dtype in _FACT_DTYPES.items():
+            values = np.ascontiguousarray(columns[name], dtype=dtype)
+            if self.directory is None:
+                self._parts[name].append(values)
+            else:
+                with open(self._path(name), 'ab') as handle:
+                    values.tofile(handle)
+        self.n_rows += len(columns['user_key'])
+
+    def column(self, name):
+        """The whole appended column (writable; memory-mapped when spilled to disk)."""
+        if self.directory is None:
+            parts = self._parts.pop(name)
+            return np.concatenate(parts) if parts else np.zeros(0, dtype=_FACT_DTYPES[name])
+        return self._map(name, _FACT_DTYPES[name], 'r+')
+
+    def new_column(self, name, dtype):
+        """An uninitialized column of n_rows values, stored like the appended ones."""
+        if self.directory is None:
+            return np.empty(self.n_rows, dtype=dtype)
+        return self._map(name, dtype, 'w+')
+
+    def _map(self, name, dtype, mode):
+        if self.n_rows == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(self._path(name), dtype=dtype, mode=mode, shape=(self.n_rows,)).view(np.ndarray)
+
+
+def chunk_rows_for(memory_limit_mb, state_bytes=0):
+    """
+    Rows per chunk that fit in what the memory ceiling leaves after the running state.
+
+    Args:
+        memory_limit_mb (float): Memory ceiling for the whole build, in MiB.
+        state_bytes (int): Bytes already held by aggregates, hashes and in-memory facts.
+
+    Returns:
+        int: Chunk size in rows.
+
+    Raises:
+        MemoryError: If not even MIN_CHUNK_ROWS fit under the ceiling.
+    """
+    budget = memory_limit_mb * 2**20 - state_bytes
+    rows = int(budget // CHUNK_BYTES_PER_ROW)
+    if rows < MIN_CHUNK_ROWS:
+        raise MemoryError(
+            f"The running state ({state_bytes / 2**20:.0f} MiB) leaves no room for a chunk under the "
+            f"{memory_limit_mb} MiB ceiling; raise memory_limit_mb or pass spill_dir."
+        )
+    return rows
+
+
+def _state_bytes(store, deduper, facts):
+    """Estimated bytes held between chunks."""
+    arrays = [store._user_bucket_counts, store._user_coord_sums, store._user_coord_compensation,
+              store._user_counts, store._venue_bucket_counts, store._venue_totals]
+    state = sum(array.nbytes for array in arrays) + deduper.seen.nbytes
+    state += KEY_BYTES * (len(store.user_ids) + len(store.venue_ids))
+    state += CATEGORY_PAIR_BYTES * len(store._user_category_counts)
+    if facts.directory is None:
+        state += FACT_BYTES_PER_ROW * facts.n_rows
+    return state
+
+
+@traced(rows=len)
+def build_star_schema_streaming(filepath, categories_path, memory_limit_mb=1024, chunksize=None,
+                                spill_dir=None):
+    """
+    Load, clean and engineer a raw check-in dump in bounded chunks.
+
+    Each chunk is read, deduplicated against every earlier row (by 64-bit row
+    hash), cleaned with preprocess_data and folded into an IncrementalFeatureStore.
+    The chunk size is re-derived before every read from what `memory_limit_mb`
+    leaves after the running state. The result matches
+    `feature_engineering(preprocess_data(load_data(filepath)), categories_path, normalized=True)`.
+
+    Args:
+        filepath (str): Raw check-in dataset (TSV or zip).
+        categories_path (str): Category mapping table.
+        memory_limit_mb (float): Memory ceiling for the build, in MiB.
+        chunksize (int, optional): Fixed chunk size in rows, overriding the ceiling.
+        spill_dir (str, optional): Write the fact table to raw column files here and
+            memory-map them, so it does not count against the ceiling.
+
+    Returns:
+        StarSchema: Check-in fact table plus user and venue dimension tables.
+    """
+    store = IncrementalFeatureStore(categories_path)
+    deduper = _RowDeduper()
+    facts = _FactColumns(spill_dir)
+    dictionaries = {column: _Dictionary() for column in _CODED_COLUMNS}
+
+    #------------------------------
+    # Stream chunks into the store and the fact columns
+    reader = load_data(filepath, chunksize=MIN_CHUNK_ROWS)
+    with reader:
+        while True:
+            rows = chunksize or chunk_rows_for(memory_limit_mb, _state_bytes(store, deduper, facts))
+            try:
+                chunk = reader.get_chunk(rows)
+            except StopIteration:
+                break
+
+            # Category_Name's dictionary covers every raw row, as when reading the whole file
+            dictionaries['Category_Name'].add(chunk['Category_Name'].cat.categories)
+
+            chunk = chunk[deduper.new_rows(chunk)]
+            batch = store.apply_batch(preprocess_data(chunk), enrich=False)
+
+            columns = {name: batch[name].to_numpy() for name in _FACT_DTYPES if name not in dictionaries}
+            columns['Local_Time'] = batch['Local_Time'].to_numpy().view(np.int64)
+            for name, dictionary in dictionaries.items():
+                columns[name] = dictionary.encode(batch[name].to_numpy(dtype=object))
+            facts.append(columns)
+
+    #------------------------------
+    # Dimension tables from the final aggregates
+    category_names, category_remap = dictionaries['Category_Name'].sorted_categories()
+    users = store.user_features()
+    users['Category_Name_Preferred'] = pd.Categorical(users['Category_Name_Preferred'], categories=category_names)
+    users.insert(0, 'user_key', np.arange(len(users)))
+    venues = store.venue_features()
+    venues.insert(0, 'venue_key', np.arange(len(venues)))
+
+    #------------------------------
+    # Fact table: sorted category dictionaries and distances, a chunk at a time
+    step = chunksize or chunk_rows_for(memory_limit_mb, _state_bytes(store, deduper, facts))
+    checkins = {name: facts.column(name) for name in _FACT_DTYPES}
+    distance = facts.new_column('Distance_From_Center', np.float64)
+
+    remaps = {name: category_remap if name == 'Category_Name' else dictionaries[name].sorted_categories()[1]
+              for name in _CODED_COLUMNS}
+    avg_latitude = users['Avg_Latitude'].to_numpy()
+    avg_longitude = users['Avg_Longitude'].to_numpy()
+    for start in range(0, facts.n_rows, step):
+        block = slice(start, start + step)
+        for name, remap in remaps.items():
+            checkins[name][block] = remap[checkins[name][block]]
+        user_keys = checkins['user_key'][block]
+        distance[block] = haversine_km(avg_latitude[user_keys], avg_longitude[user_keys],
+                                       checkins['Latitude'][block], checkins['Longitude'][block])
+
+    for name in _CODED_COLUMNS:
+        categories = category_names if name == 'Category_Name' else dictionaries[name].sorted_categories()[0]
+        checkins[name] = pd.Categorical.from_codes(checkins[name], categories=categories)
+    checkins['Local_Time'] = checkins['Local_Time'].view('datetime64[ns]')
+    checkins['Distance_From_Center'] = distance
+
+    columns = ['user_key', 'venue_key'] + CHECKIN_COLUMNS[2:] + ['Distance_From_Center']
+    checkins = pd.DataFrame({name: checkins[name] for name in columns}, copy=False)
+    return StarSchema(checkins, users, venues)
@@ -0,0 +1,113 @@
+"""
+Venue visit histograms by day of week and hour of local time.
+
+feature_engineering keeps one Busy_TimeBucket per venue; a VisitHistogram keeps
+the whole week instead, as a dense (n_venues, 7, 24) array of check-in counts,
+so "how busy is this venue on Friday at 21:00" is one array lookup.
+
+    histogram = VisitHistogram(data)
+    busyness = histogram.busyness(histogram.positions(['4a43c0aef964a520c6a61fe3']), *time_slot('2012-04-06 21:00'))
+"""
+import numpy as np
+import pandas as pd
+
+from src.data_preprocessing import StarSchema
+from src.instrumentation import traced
+
+DAYS_PER_WEEK = 7
+HOURS_PER_DAY = 24
+HOURS_PER_WEEK = DAYS_PER_WEEK * HOURS_PER_DAY
+
+
+def time_slot(at_time):
+    """Day of week (Monday=0) and hour of a local time (Timestamp, datetime or parseable string)."""
+    at_time = pd.Timestamp(at_time)
+    if at_time is pd.NaT:
+        raise ValueError("A time is required for time-aware ranking.")
+    return at_time.dayofweek, at_time.hour
+
+
+class VisitHistogram:
+    """
+    Check-in counts of every venue per hour of the week.
+
+    Attributes:
+        venue_ids (pd.Index): Venue IDs, one per row of `counts`.
+        counts (np.ndarray): (n_venues, 7, 24) check-ins per day of week (Monday=0) and
+            hour; uint16, or uint32 when a venue has more than 65535 check-ins.
+        peaks (np.ndarray): Each venue's count in its busiest hour of the week.
+    """
+
+    def __init__(self, data, max_memory_mb=256):
+        """
+        Args:
+            data (pd.DataFrame or StarSchema): Check-ins with Venue_ID and Local_Time.
+            max_memory_mb (float): Bound on the scratch memory of one counting block.
+        """
+        if isinstance(data, StarSchema):
+            venue_keys = data.checkins['venue_key'].to_numpy()
+            local_time = data.checkins['Local_Time']
+            self.venue_ids = pd.Index(data.venues['Venue_ID'].to_numpy(), name='Venue_ID')
+        else:
+            venue_keys, venue_ids = pd.factorize(data['Venue_ID'])
+            local_time = data['Local_Time']
+            self.venue_ids = pd.Index(venue_ids, name='Venue_ID')
+
+        slots = local_time.dt.dayofweek.to_numpy(dtype=np.int64) * HOURS_PER_DAY + local_time.dt.hour.to_numpy()
+        self.counts = self._count(venue_keys, slots, max_memory_mb)
+        self.peaks = self.counts.reshape(len(self), HOURS_PER_WEEK).max(axis=1, initial=0)
+
+    def __len__(self):
+        return len(self.venue_ids)
+
+    @property
+    def nbytes(self):
+        """Memory held by the counts and peaks."""
+        return self.counts.nbytes + self.peaks.nbytes
+
+    @traced('VisitHistogram.count', rows=len)
+    def _count(self, venue_keys, slots, max_memory_mb):
+        n_venues = len(self.venue_ids)
+        totals = np.bincount(venue_keys, minlength=n_venues)
+        dtype = np.uint16 if totals.max(initial=0) <= np.iinfo(np.uint16).max else np.uint32
+        cells = venue_keys.astype(np.int64) * HOURS_PER_WEEK + slots
+
+        counts = np.empty((n_venues, HOURS_PER_WEEK), dtype=dtype)
+        # bincount's int64 output costs 8 bytes per cell: venues are counted in blocks that fit the budget
+        block_venues = max(1, int(max_memory_mb * 2**20 // (8 * HOURS_PER_WEEK)))
+        if n_venues <= block_venues:
+            counts[:] = np.bincount(cells, minlength=counts.size).reshape(counts.shape)
+        else:
+            cells = np.sort(cells)
+            for start in range(0, n_venues, block_venues):
+                stop = min(start + block_venues, n_venues)
+                first, last = np.searchsorted(cells, [start * HOURS_PER_WEEK, stop * HOURS_PER_WEEK])
+                block = np.bincount(cells[first:last] - start * HOURS_PER_WEEK,
+                                    minlength=(stop - start) * HOURS_PER_WEEK)
+                counts[start:stop] = block.reshape(stop - start, HOURS_PER_WEEK)
+        return counts.reshape(n_venues, DAYS_PER_WEEK, HOURS_PER_DAY)
+
+    def positions(self, venue_ids):
+        """Row positions of the given venues (-1 for a venue without check-ins)."""
+        return self.venue_ids.get_indexer(venue_ids)
+
+    def busyness(self, positions, day, hour):
+        """
+        How busy venues are in one hour of the week, relative to their busiest hour.
+
+        Args:
+            positions (np.ndarray): Row positions (from positions(); -1 counts as never busy).
+            day (int): Day of week, Monday=0.
+            hour (int): Hour of the day.
+
+        Returns:
+            np.ndarray: float64 in [0, 1], 1 for a venue's busiest hour.
+        """
+        positions = np.asarray(positions)
+        busyness = np.zeros(len(positions))
+        known = positions >= 0
+        if known.any():
+            rows = positions[known]
+            peaks = self.peaks[rows]
+            busyness[known] = np.divide(self.counts[rows, day, hour], peaks, out=np.zeros(len(rows)), where=peaks > 0)
+        return busyness
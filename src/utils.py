@@ -1,9 +1,137 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
 import pandas as pd
 
+# Mean earth radius used by the `haversine` package for Unit.KILOMETERS
+EARTH_RADIUS_KM = 6371.0088
+
+
 def save_to_csv(data, filepath):
     """Save data to a CSV file."""
     data.to_csv(filepath, index=False)
 
 def load_from_csv(filepath):
     """Load data from a CSV file."""
-    return pd.read_csv(filepath)
\ No newline at end of file
+    return pd.read_csv(filepath)
+
+def replace_directory(new_dir, target_dir):
+    """
+    Swap a fully written directory in place of target_dir.
+
+    The old directory is first renamed aside and only deleted after the new one is
+    in place, so it is never half-deleted while in use: readers holding its files
+    (e.g. memory maps) keep working, and a crash mid-swap leaves the old copy aside.
+
+    Args:
+        new_dir (str): Complete replacement, on the same filesystem as target_dir.
+        target_dir (str): Directory to replace; need not exist.
+    """
+    aside = None
+    if os.path.exists(target_dir):
+        aside = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(target_dir)), prefix='.old-')
+        os.rmdir(aside)
+        os.rename(target_dir, aside)
+    os.replace(new_dir, target_dir)
+    if aside is not None:
+        shutil.rmtree(aside, ignore_errors=True)
+
+def coerce_user_id(user_id, dtype):
+    """
+    Convert a User_ID typed by a user (e.g. "20") to the dtype of the column it is looked up in.
+
+    Compact datasets store numeric User_IDs as int32, while the UIs pass strings.
+
+    Args:
+        user_id: The user ID as given.
+        dtype: dtype of the User_ID column or index.
+
+    Returns:
+        The user ID as an int for integer dtypes (when it parses), otherwise unchanged.
+    """
+    if pd.api.types.is_integer_dtype(dtype) and isinstance(user_id, str):
+        try:
+            return int(user_id)
+        except ValueError:
+            return user_id
+    return user_id
+
+def user_cache_key(user_id, dtype):
+    """
+    Cache key part for a User_ID looked up in a column or index of this dtype.
+
+    The ID is coerced like a lookup and tagged with its type, so 20 and "20" share an
+    entry only when they resolve to the same user.
+    """
+    user_id = coerce_user_id(user_id, dtype)
+    return type(user_id).__name__, user_id
+
+def contains_sorted(sorted_keys, keys):
+    """Membership of keys in a sorted unique array."""
+    positions = np.minimum(np.searchsorted(sorted_keys, keys), max(len(sorted_keys) - 1, 0))
+    return sorted_keys[positions] == keys if len(sorted_keys) else np.zeros(len(keys), dtype=bool)
+
+def first_unvisited(users, list_starts, list_stops, list_venues, visited_keys, visited_counts, n_venues, k):
+    """
+    Walk ranked venue lists and keep the first k venues each user has not visited.
+
+    Each request reads the slice list_venues[list_starts[i]:list_stops[i]] for user
+    users[i]. Only the first k + (venues the user visited) entries of a list can hold
+    its first k unvisited ones, so only those are checked, all requests at once.
+
+    Args:
+        users (np.ndarray): User code of each request.
+        list_starts, list_stops (np.ndarray): Bounds of each request's list in list_venues.
+        list_venues (np.ndarray): Venue codes of all the lists, one after the other.
+        visited_keys (np.ndarray): Sorted unique user * n_venues + venue of every visit.
+        visited_counts (np.ndarray): Distinct venues visited per user code.
+        n_venues (int): Number of venue codes.
+        k (int): Venues kept per request.
+
+    Returns:
+        tuple: Request number, position in list_venues and rank (0 = first) of every kept
+            venue, grouped by request in list order.
+    """
+    depth = np.minimum(k + visited_counts[users], list_stops - list_starts)
+    owner = np.repeat(np.arange(len(users)), depth)
+    items = np.repeat(list_starts, depth) + np.arange(len(owner)) - np.repeat(np.cumsum(depth) - depth, depth)
+
+    keys = users[owner].astype(np.int64) * n_venues + list_venues[items]
+    unvisited = ~contains_sorted(visited_keys, keys)
+    owner, items = owner[unvisited], items[unvisited]
+
+    # Rank among the request's unvisited venues; keep the first k
+    changes = np.r_[True, owner[1:] != owner[:-1]]
+    positions = np.arange(len(owner))
+    rank = positions - np.maximum.accumulate(np.where(changes, positions, 0))
+    top = rank < k
+    return owner[top], items[top], rank[top]
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Vectorized great-circle distance in kilometres.
+
+    Mirrors the kernel of `haversine.haversine` operation for operation, but numpy's
+    vectorized sin/cos/arcsin may round differently from the math module: results
+    agree with calling it once per pair of points to within a few ulps (at most 2 ulps,
+    about 2e-15 km, over 20k NYC-scale pairs, where 99.97% are identical; at most
+    3 ulps, about 1e-11 km, over pairs spread across the globe). They are not
+    guaranteed to be bit-identical.
+
+    Args:
+        lat1, lon1 (array-like): Latitudes and longitudes of the first points (degrees).
+        lat2, lon2 (array-like): Latitudes and longitudes of the second points (degrees).
+
+    Returns:
+        np.ndarray: Distances in kilometres (float64), broadcast over the inputs.
+    """
+    lat1 = np.radians(np.asarray(lat1, dtype=np.float64))
+    lon1 = np.radians(np.asarray(lon1, dtype=np.float64))
+    lat2 = np.radians(np.asarray(lat2, dtype=np.float64))
+    lon2 = np.radians(np.asarray(lon2, dtype=np.float64))
+    lat = lat2 - lat1
+    lon = lon2 - lon1
+    d = np.sin(lat * 0.5) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(lon * 0.5) ** 2
+    return EARTH_RADIUS_KM * (2 * np.arcsin(np.sqrt(d)))
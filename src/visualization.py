@@ -1,6 +1,20 @@
 import folium
+import numpy as np
+import pandas as pd
+from folium.plugins import HeatMap
 
-def visualize_random_checkins_and_venues(selected_checkins, nearest_venues):
+from src.spatial_index import KM_PER_DEGREE_LATITUDE
+
+# Layers with more points than this are aggregated into at most this many features in mode='auto'
+MAX_MAP_FEATURES = 5000
+
+# Aggregated cells are coloured by log count, light to dark (ColorBrewer YlOrRd)
+COUNT_COLORS = ['#ffffb2', '#fed976', '#feb24c', '#fd8d3c', '#f03b20', '#bd0026']
+
+LAYER_MODES = ('points', 'hexbin', 'cluster', 'heatmap')
+
+
+def visualize_random_checkins_and_venues(selected_checkins, nearest_venues, mode='markers'):
     """
     Visualize the selected user check-ins and recommended venues on a map.
 
@@ -15,10 +29,24 @@ def visualize_random_checkins_and_venues(selected_checkins, nearest_venues):
             - Latitude: Latitude of the venue.
             - Longitude: Longitude of the venue.
             - Distance_From_Central (optional): Distance from the central meeting point.
+        mode (str): 'markers' adds one icon marker per row; any add_point_layer mode
+            ('auto', 'points', 'hexbin', 'cluster', 'heatmap') adds one layer per table instead,
+            for large tables.
 
     Returns:
         folium.Map: A map showing both user check-ins and recommended venues.
     """
+    if mode != 'markers':
+        combined_map = _empty_map(pd.concat([selected_checkins[['Latitude', 'Longitude']],
+                                             nearest_venues[['Latitude', 'Longitude']]]))
+        add_point_layer(combined_map, selected_checkins, 'Check-ins', mode=mode, color='blue',
+                        popup_columns=['User_ID'])
+        venue_columns = [column for column in ['Venue_ID', 'Category_Name', 'Distance_From_Central']
+                         if column in nearest_venues.columns]
+        add_point_layer(combined_map, nearest_venues, 'Venues', mode=mode, color='red', popup_columns=venue_columns)
+        folium.LayerControl().add_to(combined_map)
+        return combined_map
+
     # Use the first user's check-in as the map's center
     center_lat = selected_checkins['Latitude'].iloc[0]
     center_long = selected_checkins['Longitude'].iloc[0]
@@ -61,3 +89,221 @@ def visualize_random_checkins_and_venues(selected_checkins, nearest_venues):
 
     return combined_map
 
+
+
+#------------------------------
+# Large point sets
+
+def _local_km(latitude, longitude, origin):
+    """Equirectangular projection to km east and north of origin (latitude, longitude); fine at city scale."""
+    scale = KM_PER_DEGREE_LATITUDE * np.cos(np.radians(origin[0]))
+    return (longitude - origin[1]) * scale, (latitude - origin[0]) * KM_PER_DEGREE_LATITUDE
+
+def _from_local_km(x, y, origin):
+    scale = KM_PER_DEGREE_LATITUDE * np.cos(np.radians(origin[0]))
+    return origin[0] + y / KM_PER_DEGREE_LATITUDE, origin[1] + x / scale
+
+def _square_cells(x, y, cell_km):
+    # Cells are centred on the origin, so a large enough cell holds every point
+    return np.floor(x / cell_km + 0.5), np.floor(y / cell_km + 0.5)
+
+def _hex_cells(x, y, cell_km):
+    """Axial (q, r) coordinates of the pointy-top hexagons of circumradius cell_km holding each point."""
+    q = (np.sqrt(3) / 3 * x - y / 3) / cell_km
+    r = (2 / 3 * y) / cell_km
+    s = -q - r
+    rounded_q, rounded_r, rounded_s = np.round(q), np.round(r), np.round(s)
+    error_q, error_r, error_s = np.abs(rounded_q - q), np.abs(rounded_r - r), np.abs(rounded_s - s)
+    # Cube rounding: recompute the coordinate that rounded the furthest
+    fix_q = (error_q > error_r) & (error_q > error_s)
+    fix_r = ~fix_q & (error_r > error_s)
+    return (np.where(fix_q, -rounded_r - rounded_s, rounded_q),
+            np.where(fix_r, -rounded_q - rounded_s, rounded_r))
+
+def _fit_cells(x, y, cells, max_features):
+    """
+    Bin points with the smallest cell size (from an area-based guess, grown as needed)
+    that leaves at most max_features non-empty cells.
+
+    Returns:
+        tuple: Cell size in km, each point's cell number, and (column, row) plus point
+            count of every cell.
+    """
+    area = max(np.ptp(x) * np.ptp(y), 1e-6) if len(x) else 1.0
+    cell_km = max(np.sqrt(area / max_features), 0.01)
+    while True:
+        columns, rows = cells(x, y, cell_km)
+        columns, rows = columns.astype(np.int64), rows.astype(np.int64)
+        keys = (columns - columns.min()) * (rows.max() - rows.min() + 1) + (rows - rows.min())
+        unique, first, inverse, counts = np.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+        if len(unique) <= max_features:
+            return cell_km, inverse, columns[first], rows[first], counts
+        cell_km *= np.sqrt(len(unique) / max_features) * 1.05
+
+def _count_colors(counts):
+    """One COUNT_COLORS entry per count, on a log scale between the smallest and largest."""
+    levels = np.log(counts)
+    span = max(levels.max() - levels.min(), 1e-9)
+    return np.array(COUNT_COLORS)[np.minimum(((levels - levels.min()) / span * len(COUNT_COLORS)).astype(int),
+                                             len(COUNT_COLORS) - 1)]
+
+def points_to_geojson(latitude, longitude, properties=None):
+    """
+    Build a GeoJSON FeatureCollection of points, as text, without a Python loop over the points.
+
+    Args:
+        latitude, longitude (array-like): Point coordinates in degrees.
+        properties (pd.DataFrame, optional): Feature properties, one row per point.
+
+    Returns:
+        str: The FeatureCollection.
+    """
+    # Coordinates and properties are rendered column-wise (numpy and pandas' JSON writer)
+    # and the features assembled with vectorized string concatenation
+    coordinates = np.char.add(np.char.add(np.round(np.asarray(longitude, dtype=np.float64), 6).astype(str), ','),
+                              np.round(np.asarray(latitude, dtype=np.float64), 6).astype(str))
+    if properties is not None and len(properties.columns) and len(properties):
+        properties = np.array(properties.to_json(orient='records', lines=True, date_format='iso').splitlines())
+    else:
+        properties = '{}'
+    features = np.char.add(np.char.add(np.char.add('{"type":"Feature","geometry":{"type":"Point","coordinates":[',
+                                                   coordinates), ']},"properties":'), properties)
+    features = np.char.add(features, '}')
+    return '{"type":"FeatureCollection","features":[' + ','.join(features.tolist()) + ']}'
+
+def _hexbin_geojson(latitude, longitude, origin, max_features):
+    """FeatureCollection of the hexagons holding the points, with Count and a fill colour, plus the cell size."""
+    x, y = _local_km(latitude, longitude, origin)
+    cell_km, _, q, r, counts = _fit_cells(x, y, _hex_cells, max_features)
+
+    # Corners of every hexagon (closed rings), back in degrees
+    center_x = cell_km * np.sqrt(3) * (q + r / 2)
+    center_y = cell_km * 1.5 * r
+    angles = np.radians(60 * np.arange(7) - 30)
+    ring_latitude, ring_longitude = _from_local_km(center_x[:, None] + cell_km * np.cos(angles),
+                                                   center_y[:, None] + cell_km * np.sin(angles), origin)
+    rings = np.round(np.stack([ring_longitude, ring_latitude], axis=-1), 6).tolist()
+
+    features = [{'type': 'Feature', 'geometry': {'type': 'Polygon', 'coordinates': [ring]},
+                 'properties': {'Count': count, 'color': color}}
+                for ring, count, color in zip(rings, counts.tolist(), _count_colors(counts).tolist())]
+    return {'type': 'FeatureCollection', 'features': features}, cell_km
+
+def _cluster_geojson(latitude, longitude, origin, max_features):
+    """FeatureCollection of one point per grid cell at its members' centroid, with Count, radius and colour."""
+    x, y = _local_km(latitude, longitude, origin)
+    cell_km, inverse, _, _, counts = _fit_cells(x, y, _square_cells, max_features)
+    centroid_latitude = np.bincount(inverse, weights=latitude) / counts
+    centroid_longitude = np.bincount(inverse, weights=longitude) / counts
+    properties = pd.DataFrame({
+        'Count': counts,
+        'radius': np.round(4 + 16 * np.sqrt(counts / counts.max())).astype(int),
+        'color': _count_colors(counts),
+    })
+    return points_to_geojson(centroid_latitude, centroid_longitude, properties), cell_km
+
+def add_point_layer(folium_map, data, name, mode='auto', color='red', popup_columns=None,
+                    max_features=MAX_MAP_FEATURES):
+    """
+    Add a table of points (Latitude, Longitude) to a map as a single layer.
+
+    Args:
+        folium_map (folium.Map): Map to add the layer to.
+        data (pd.DataFrame): Points with Latitude and Longitude; rows without both are skipped.
+        name (str): Layer name, as shown in a LayerControl.
+        mode (str): 'points' for one GeoJSON circle per point (popups show popup_columns;
+            at most max_features points);
+            'hexbin' for hexagons coloured by point count; 'cluster' for one circle per
+            grid cell at its points' centroid, sized by count; 'heatmap' for a heat map
+            of the points, pre-aggregated into grid cells above max_features;
+            'auto' for 'points' up to max_features points and 'hexbin' above.
+        color (str): Colour of the circles in 'points' mode.
+        popup_columns (list, optional): Columns shown in the popups of 'points' mode.
+        max_features (int): Most features (or heat map points) the layer may hold; the
+            aggregation cell size is chosen to stay within it, which bounds the map's size.
+
+    Returns:
+        folium.FeatureGroup: The layer.
+    """
+    if max_features < 1:
+        raise ValueError("max_features must be at least 1.")
+    if mode == 'auto':
+        mode = 'points' if len(data) <= max_features else 'hexbin'
+    if mode not in LAYER_MODES:
+        raise ValueError(f"Unknown map layer mode '{mode}'; expected 'auto' or one of {', '.join(LAYER_MODES)}.")
+    if mode == 'points' and len(data) > max_features:
+        raise ValueError(f"{len(data)} points exceed max_features={max_features} for mode='points'; "
+                         "use mode='auto' (or 'hexbin', 'cluster', 'heatmap') to aggregate them, "
+                         "or raise max_features.")
+
+    located = data[['Latitude', 'Longitude']].notna().all(axis=1).to_numpy()
+    latitude = data['Latitude'].to_numpy(dtype=np.float64)[located]
+    longitude = data['Longitude'].to_numpy(dtype=np.float64)[located]
+    layer = folium.FeatureGroup(name=name)
+    if not len(latitude):
+        return layer.add_to(folium_map)
+    origin = (latitude.mean(), longitude.mean())
+
+    if mode == 'points':
+        popup_columns = list(popup_columns or [])
+        geojson = points_to_geojson(latitude, longitude, data.loc[located, popup_columns] if popup_columns else None)
+        folium.GeoJson(
+            geojson, name=name,
+            marker=folium.CircleMarker(radius=4, color=color, fill=True, fill_color=color, fill_opacity=0.7, weight=1),
+            popup=folium.GeoJsonPopup(fields=popup_columns) if popup_columns else None,
+        ).add_to(layer)
+    elif mode == 'hexbin':
+        geojson, _ = _hexbin_geojson(latitude, longitude, origin, max_features)
+        folium.GeoJson(
+            geojson, name=name,
+            style_function=lambda feature: {'fillColor': feature['properties']['color'], 'color': '#808080',
+                                            'weight': 0.5, 'fillOpacity': 0.6},
+            tooltip=folium.GeoJsonTooltip(fields=['Count']),
+        ).add_to(layer)
+    elif mode == 'cluster':
+        geojson, _ = _cluster_geojson(latitude, longitude, origin, max_features)
+        folium.GeoJson(
+            geojson, name=name,
+            marker=folium.CircleMarker(fill=True, fill_opacity=0.7, weight=1),
+            style_function=lambda feature: {'radius': feature['properties']['radius'],
+                                            'fillColor': feature['properties']['color'], 'color': '#808080'},
+            tooltip=folium.GeoJsonTooltip(fields=['Count']),
+        ).add_to(layer)
+    else:
+        if len(latitude) > max_features:
+            x, y = _local_km(latitude, longitude, origin)
+            _, inverse, _, _, counts = _fit_cells(x, y, _square_cells, max_features)
+            latitude = np.bincount(inverse, weights=latitude) / counts
+            longitude = np.bincount(inverse, weights=longitude) / counts
+            weights = counts / counts.max()
+        else:
+            weights = np.ones(len(latitude))
+        HeatMap(np.round(np.column_stack([latitude, longitude, weights]), 6).tolist(), name=name).add_to(layer)
+
+    return layer.add_to(folium_map)
+
+def _empty_map(points):
+    """A canvas-rendered map fitted to the finite Latitude/Longitude of the given points."""
+    points = points[['Latitude', 'Longitude']].dropna()
+    center = points.mean().tolist() if len(points) else [0.0, 0.0]
+    folium_map = folium.Map(location=center, zoom_start=13, prefer_canvas=True)
+    if len(points):
+        folium_map.fit_bounds([points.min().tolist(), points.max().tolist()])
+    return folium_map
+
+def visualize_points(data, name='Points', mode='auto', color='red', popup_columns=None,
+                     max_features=MAX_MAP_FEATURES):
+    """
+    Map a large table of points (a category's venues, a city's check-ins) as one layer.
+
+    Args:
+        data (pd.DataFrame): Points with Latitude and Longitude.
+        name, mode, color, popup_columns, max_features: See add_point_layer.
+
+    Returns:
+        folium.Map: The map; save it with `.save(path)`.
+    """
+    folium_map = _empty_map(data)
+    add_point_layer(folium_map, data, name, mode=mode, color=color, popup_columns=popup_columns,
+                    max_features=max_features)
+    return folium_map
@@ -0,0 +1,85 @@
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import pandas as pd
+import pytest
+
+from src.cache import ResultCache
+from src.recommendation_unvisisted import recommend_similar_category_locations
+from src.similarity import find_top_similar_users
+
+
+@pytest.fixture
+def data():
+    return pd.DataFrame({
+        'User_ID': ['1', '1', '2', '3'],
+        'Venue_ID': ['A', 'B', 'C', 'D'],
+        'Category_Name': ['Bar', 'Pub', 'Bar', 'Cafe'],
+        'Broader_Category': ['Dining and Drinking'] * 4,
+        'Popularity_Score': [1.0, 0.5, 0.5, 0.5],
+        'Distance_From_Center': [1.0, 0.0, 0.5, 3.0],
+        'Latitude': [40.7198, 40.6068, 40.7161, 40.7451],
+        'Longitude': [-74.0025, -74.0441, -73.8830, -73.9825],
+    })
+
+
+def test_cache_hits_and_invalidates_on_new_version(data):
+    cache = ResultCache(version=1)
+    expected = recommend_similar_category_locations('1', 'Bar', data, top_k=2)
+
+    first = recommend_similar_category_locations('1', 'Bar', data, top_k=2, cache=cache)
+    # Same normalized arguments: category case does not matter
+    second = recommend_similar_category_locations('1', 'bar', data, top_k=2, cache=cache)
+
+    pd.testing.assert_frame_equal(first, expected)
+    pd.testing.assert_frame_equal(second, expected)
+    assert (cache.hits, cache.misses, len(cache)) == (1, 1, 1)
+    assert cache.stats()['bytes'] > 0
+
+    # Results are copies, so callers cannot corrupt the cached entry
+    second['Score'] = 0.0
+    pd.testing.assert_frame_equal(recommend_similar_category_locations('1', 'Bar', data, top_k=2, cache=cache), expected)
+
+    cache.set_version(2)
+    assert len(cache) == 0 and cache.invalidations == 1 and cache.bytes == 0
+
+
+def test_cache_keys_user_ids_like_the_lookup(data):
+    cache = ResultCache()
+    recommend_similar_category_locations('1', 'Bar', data, top_k=2, cache=cache)
+
+    # 1 is not a User_ID of string-keyed data, so it must not be served "1"'s entry
+    expected = recommend_similar_category_locations(1, 'Bar', data, top_k=2)
+    pd.testing.assert_frame_equal(recommend_similar_category_locations(1, 'Bar', data, top_k=2, cache=cache), expected)
+    assert (cache.hits, len(cache)) == (0, 2)
+
+    # With integer User_IDs a typed "1" resolves to the same user and shares the entry
+    compact, compact_cache = data.astype({'User_ID': 'int32'}), ResultCache()
+    recommend_similar_category_locations(1, 'Bar', compact, top_k=2, cache=compact_cache)
+    recommend_similar_category_locations('1', 'Bar', compact, top_k=2, cache=compact_cache)
+    assert compact_cache.hits == 1
+
+    similarity = pd.DataFrame([[1.0, 0.5], [0.5, 1.0]], index=['20', '21'], columns=['20', '21'])
+    find_top_similar_users('20', similarity, 1, cache=cache)
+    with pytest.raises(ValueError, match="User ID 20 not found"):
+        find_top_similar_users(20, similarity, 1, cache=cache)
+
+
+def test_cache_evicts_least_recently_used_and_expires():
+    now = [0.0]
+    cache = ResultCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+
+    for key in ['a', 'b', 'a', 'c']:
+        cache.get_or_compute('test', (key,), lambda: key.upper())
+
+    # 'b' was the least recently used when 'c' arrived
+    assert cache.evictions == 1
+    assert cache.get_or_compute('test', ('a',), lambda: 'recomputed') == 'A'
+
+    now[0] = 11.0
+    assert cache.get_or_compute('test', ('a',), lambda: 'recomputed') == 'recomputed'
+    assert cache.expirations == 1
+    assert cache.stats()['hits'] == 2
@@ -0,0 +1,61 @@
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.collaborative import CoVisitationModel
+
+
+@pytest.fixture
+def checkins():
+    """Random visits of 40 users over 30 venues, with repeats."""
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'User_ID': rng.integers(0, 40, 600).astype(str),
+        'Venue_ID': np.char.add('v', rng.integers(0, 30, 600).astype(str)),
+    })
+
+
+def test_covisitation_matches_dense_cosine(checkins):
+    model = CoVisitationModel(checkins, neighbors=30, max_memory_mb=1e-3)
+
+    # Cosine similarity of the venues' binary visitor vectors, without the diagonal
+    visited = pd.crosstab(checkins['User_ID'], checkins['Venue_ID']).reindex(
+        index=model.user_ids, columns=model.venue_ids).to_numpy() > 0
+    counts = visited.T.astype(float) @ visited
+    norms = np.sqrt(np.diag(counts))
+    cosine = counts / np.outer(norms, norms)
+    np.fill_diagonal(cosine, 0)
+    np.testing.assert_allclose(model.similarity.toarray(), cosine, rtol=1e-6)
+
+    # Scores are the log(1 + visits) weighted sums of similarities; visited venues left out
+    weights = np.log1p(pd.crosstab(checkins['User_ID'], checkins['Venue_ID']).reindex(
+        index=model.user_ids, columns=model.venue_ids).to_numpy())
+    scores = weights @ cosine
+    scores[visited] = -np.inf
+    recommendations = model.recommend(['3', '17'], k=5)
+    for user_id in ['3', '17']:
+        row = model.user_ids.get_loc(user_id)
+        expected = model.venue_ids[np.argsort(-scores[row], kind='stable')[:5]]
+        got = recommendations[recommendations['User_ID'] == user_id]
+        assert list(got['Venue_ID']) == list(expected)
+        assert list(got['Rank']) == [1, 2, 3, 4, 5]
+
+
+def test_covisitation_options_and_errors(checkins):
+    model = CoVisitationModel(checkins, neighbors=3, max_history=2)
+    assert (np.diff(model.similarity.indptr) <= 3).all()
+
+    with_visited = model.recommend(['5'], k=40, exclude_visited=False)
+    without_visited = model.recommend(['5'], k=40)
+    visited = set(checkins.loc[checkins['User_ID'] == '5', 'Venue_ID'])
+    assert not visited & set(without_visited['Venue_ID'])
+    assert len(with_visited) > len(without_visited)
+
+    with pytest.raises(ValueError, match="User ID 99 not found"):
+        model.recommend(['5', '99'])
@@ -0,0 +1,147 @@
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import numpy as np
+import pandas as pd
+import pytest
+from haversine import haversine, Unit
+
+from src.data_preprocessing import feature_engineering, HOUR_TO_TIME_BUCKET, DAY_NAMES, StarSchema, \
+    compact_dtypes, memory_report, TIME_BUCKET_DTYPE, preprocess_data, parse_utc_time, UTC_TIME_FORMAT
+from src.utils import haversine_km
+
+CATEGORIES_PATH = os.path.join(os.path.dirname(__file__), '../data/categories.zip')
+
+
+@pytest.fixture
+def cleaned_data():
+    """Fixture with check-ins in the shape returned by preprocess_data."""
+    return pd.DataFrame({
+        'User_ID': ['1', '1', '2', '2', '3'],
+        'Venue_ID': ['49bbd6c0f964a520f4531fe3', '4a43c0aef964a520c6a61fe3', '49bbd6c0f964a520f4531fe3',
+                     '4c5cc7b485a1e21e00d35711', '4bc7086715a7ef3bef9878da'],
+        'Venue_Category_ID': ['4bf58dd8d48988d116941735', '4bf58dd8d48988d16d941735', '4bf58dd8d48988d116941735',
+                              '4bf58dd8d48988d116941735', '4e51a0c0bd41d3446defbb2e'],
+        'Category_Name': pd.Categorical(['Bar', 'Café', 'Bar', 'Bar', 'Ferry']),
+        'Latitude': np.array([40.719810, 40.606800, 40.719810, 40.716160, 40.745163], dtype='float32'),
+        'Longitude': np.array([-74.002579, -74.044167, -74.002579, -73.883072, -73.982521], dtype='float32'),
+        'Local_Time': pd.to_datetime(['2012-04-03 18:00:09', '2012-04-07 04:59:00', '2012-04-08 12:30:00',
+                                      '2012-04-09 21:15:00', '2012-04-10 08:00:00']),
+    })
+
+
+def test_haversine_km_matches_haversine_package():
+    rng = np.random.default_rng(0)
+    lat1, lat2 = rng.uniform(-80, 80, (2, 500))
+    lon1, lon2 = rng.uniform(-170, 170, (2, 500))
+
+    expected = [haversine((a, b), (c, d), unit=Unit.KILOMETERS) for a, b, c, d in zip(lat1, lon1, lat2, lon2)]
+    assert haversine_km(lat1, lon1, lat2, lon2) == pytest.approx(expected, rel=1e-12)
+
+
+def test_time_lookup_tables():
+    assert list(HOUR_TO_TIME_BUCKET[[4, 5, 11, 12, 16, 17, 20, 21, 23]]) == [
+        'Night', 'Morning', 'Morning', 'Afternoon', 'Afternoon', 'Evening', 'Evening', 'Night', 'Night']
+    dates = pd.Series(pd.date_range('2012-04-02', periods=7, freq='D'))
+    assert list(DAY_NAMES[dates.dt.dayofweek]) == list(dates.dt.day_name())
+
+
+def test_parse_utc_time_matches_pandas():
+    times = pd.Series([
+        'Tue Apr 03 18:00:09 +0000 2012', 'Sat Feb 29 23:59:59 -0530 2020', 'Tue Apr 03 18:00:09 +0000 2012',
+        # Parsed by the generic path: case, short fields, other offset spellings
+        'tue apr 03 18:00:09 +0000 2012', 'Tue Apr 3 18:00:09 +0000 2012', 'Tue Apr 03 18:00:09 +00:00 2012',
+        # Malformed
+        'Fri Feb 29 18:00:09 +0000 2013', 'Tue Apr 03 24:00:09 +0000 2012', 'Tue Apr 03 18:00:09 +0000 2012x',
+        'not a time', '', None,
+    ], dtype=object)
+
+    expected = pd.to_datetime(times, format=UTC_TIME_FORMAT, errors='coerce', utc=True).dt.tz_convert(None)
+
+    parsed = parse_utc_time(times)
+
+    np.testing.assert_array_equal(parsed, expected.to_numpy())
+    assert np.isnat(parsed[6:]).all()
+
+
+def test_feature_engineering(cleaned_data):
+    features = feature_engineering(cleaned_data, CATEGORIES_PATH)
+
+    assert len(features) == len(cleaned_data)
+    assert list(features['Time_Bucket']) == ['Evening', 'Night', 'Afternoon', 'Night', 'Morning']
+    assert list(features['Is_Weekend']) == [0, 1, 1, 0, 0]
+    assert features.loc[features['Venue_ID'] == '49bbd6c0f964a520f4531fe3', 'totalVisits'].eq(2).all()
+    assert features['Popularity_Score'].max() == 1.0
+    assert features.loc[4, 'Broader_Category'] == 'Travel and Transportation'
+    # A user with a single location is at distance 0 from their own centre
+    assert features.loc[4, 'Distance_From_Center'] == 0.0
+
+
+def test_parallel_build_matches_serial(cleaned_data):
+    raw = pd.DataFrame({
+        'User_ID': ['1', '2', '1', '3', '2', '4'],
+        'Venue_ID': ['A', 'B', 'A', 'C', 'B', 'D'],
+        'Venue_Category_ID': ['4bf58dd8d48988d116941735', '4bf58dd8d48988d16d941735', '4bf58dd8d48988d116941735',
+                              None, '4bf58dd8d48988d16d941735', '4bf58dd8d48988d116941735'],
+        'Category_Name': pd.Categorical(['Bar', 'Café', 'Bar', 'Bar', 'Café', 'Bar']),
+        'Latitude': np.array([40.7198, 40.6068, 40.7198, 40.7161, 40.6068, 40.7451], dtype='float32'),
+        'Longitude': np.array([-74.0025, -74.0441, -74.0025, -73.8830, -74.0441, -73.9825], dtype='float32'),
+        'Timezone_Offset': np.array([-240, -240, -240, -240, -240, 120], dtype='int16'),
+        'UTC_Time': ['Tue Apr 03 18:00:09 +0000 2012', 'Tue Apr 03 18:01:00 +0000 2012',
+                     'Tue Apr 03 18:00:09 +0000 2012', 'Wed Apr 04 09:00:00 +0000 2012',
+                     'Tue Apr 03 18:01:00 +0000 2012', 'not a time'],
+    })
+    expected = preprocess_data(raw.copy())
+
+    cleaned = preprocess_data(raw.copy(), n_jobs=2)
+
+    pd.testing.assert_frame_equal(cleaned, expected)
+    assert list(cleaned.index) == [0, 1]
+    pd.testing.assert_frame_equal(feature_engineering(cleaned_data, CATEGORIES_PATH, n_jobs=2),
+                                  feature_engineering(cleaned_data, CATEGORIES_PATH))
+
+
+def test_feature_engineering_normalized(cleaned_data):
+    wide = feature_engineering(cleaned_data, CATEGORIES_PATH)
+    schema = feature_engineering(cleaned_data, CATEGORIES_PATH, normalized=True)
+
+    assert isinstance(schema, StarSchema)
+    assert list(schema.users['User_ID']) == ['1', '2', '3']
+    assert list(schema.venues['totalVisits']) == [2, 1, 1, 1]
+    assert 'User_ID' not in schema.checkins.columns
+    assert schema.checkins['user_key'].dtype == np.int32
+
+    # The compatibility view reproduces the wide frame exactly
+    pd.testing.assert_frame_equal(schema.to_wide(), wide)
+    pd.testing.assert_frame_equal(schema.to_wide(['Venue_ID', 'Avg_Latitude']), wide[['Venue_ID', 'Avg_Latitude']])
+
+
+def test_compact_dtypes(cleaned_data):
+    wide = feature_engineering(cleaned_data, CATEGORIES_PATH)
+    compact = feature_engineering(cleaned_data, CATEGORIES_PATH, compact=True)
+
+    assert compact['User_ID'].dtype == np.int32
+    assert isinstance(compact['Venue_ID'].dtype, pd.CategoricalDtype)
+    assert compact['Hour'].dtype == np.int8
+    # Related columns share one dictionary
+    assert compact['Time_Bucket'].dtype == compact['Busy_TimeBucket'].dtype == TIME_BUCKET_DTYPE
+    assert compact['Category_Name'].dtype == compact['Category_Name_Preferred'].dtype
+    # Values are unchanged
+    assert list(compact['Time_Bucket'].astype(str)) == list(wide['Time_Bucket'])
+    assert list(compact['User_ID']) == [1, 1, 2, 2, 3]
+
+    report = memory_report(wide, compact)
+    assert report.loc['Is_Weekend', 'reduction'] == 8.0
+    assert report.loc['Day_of_Week', 'dtype_after'] == 'category'
+
+
+def test_compact_dtypes_keeps_non_numeric_user_ids():
+    data = pd.DataFrame({'User_ID': ['U1', 'U2', 'U1'], 'Hour': [1, 2, 3]})
+
+    compact = compact_dtypes(data)
+
+    assert isinstance(compact['User_ID'].dtype, pd.CategoricalDtype)
+    assert list(compact['User_ID']) == ['U1', 'U2', 'U1']
@@ -0,0 +1,71 @@
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.evaluation import chronological_split, evaluate_recommender, write_report
+
+CATEGORIES_PATH = os.path.join(os.path.dirname(__file__), '../data/categories.zip')
+
+
+@pytest.fixture
+def cleaned_data():
+    """Two users: user 1 moves on to a new bar late on, user 2 keeps to the same venues."""
+    rows = [
+        ('1', 'bar_a', 'Bar', 40.72, -74.00, '2012-04-03 18:00'),
+        ('1', 'bar_a', 'Bar', 40.72, -74.00, '2012-04-04 18:00'),
+        ('1', 'cafe_a', 'Café', 40.73, -74.01, '2012-04-05 09:00'),
+        ('1', 'bar_b', 'Bar', 40.71, -73.99, '2012-04-09 21:00'),
+        ('2', 'bar_b', 'Bar', 40.71, -73.99, '2012-04-03 20:00'),
+        ('2', 'bar_b', 'Bar', 40.71, -73.99, '2012-04-05 20:00'),
+        ('2', 'bar_c', 'Bar', 40.70, -73.98, '2012-04-06 20:00'),
+        ('2', 'bar_b', 'Bar', 40.71, -73.99, '2012-04-08 20:00'),
+        ('2', 'bar_c', 'Bar', 40.70, -73.98, '2012-04-10 20:00'),
+    ]
+    data = pd.DataFrame(rows, columns=['User_ID', 'Venue_ID', 'Category_Name', 'Latitude', 'Longitude', 'Local_Time'])
+    data['Venue_Category_ID'] = '4bf58dd8d48988d116941735'
+    data['Local_Time'] = pd.to_datetime(data['Local_Time'])
+    return data[['User_ID', 'Venue_ID', 'Venue_Category_ID', 'Category_Name', 'Latitude', 'Longitude', 'Local_Time']]
+
+
+def test_chronological_split_holds_out_latest_checkins(cleaned_data):
+    shuffled = cleaned_data.sample(frac=1, random_state=0)
+    train, test = chronological_split(shuffled, test_fraction=0.25)
+
+    # floor(4 * 0.25) = 1 for user 1, floor(5 * 0.25) = 1 for user 2
+    assert len(test) == 2
+    assert len(train) + len(test) == len(cleaned_data)
+    for user_id, held_out in test.groupby('User_ID'):
+        assert held_out['Local_Time'].min() >= train.loc[train['User_ID'] == user_id, 'Local_Time'].max()
+
+    with pytest.raises(ValueError):
+        chronological_split(cleaned_data, test_fraction=1)
+
+
+def test_evaluate_recommender_scores_novel_holdout_visits(cleaned_data, tmp_path):
+    summary, per_user = evaluate_recommender(cleaned_data, CATEGORIES_PATH, k=2, test_fraction=0.25,
+                                             recommender='popularity')
+    per_user = per_user.set_index('User_ID')
+
+    # User 1's held-out bar_b is new to them and the most visited venue they have not been to
+    assert per_user.loc['1', 'Relevant'] == 1
+    assert per_user.loc['1', 'Hits'] == 1
+    assert per_user.loc['1', 'NDCG'] == pytest.approx(1.0)
+    # User 2 only returns to bar_c, so there is nothing to score
+    assert per_user.loc['2', 'Relevant'] == 0
+    assert np.isnan(per_user.loc['2', 'Recall'])
+
+    assert summary['users_evaluated'] == 1
+    assert summary['recall@2'] == pytest.approx(1.0)
+    assert summary['precision@2'] == pytest.approx(0.5)
+
+    output_dir = write_report(summary, per_user.reset_index(), str(tmp_path / 'report'))
+    assert sorted(os.listdir(output_dir)) == ['per_user.csv', 'summary.json']
+
+    with pytest.raises(ValueError):
+        evaluate_recommender(cleaned_data, CATEGORIES_PATH, recommender='unknown')
@@ -0,0 +1,87 @@
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.cache import ResultCache
+from src.data_preprocessing import feature_engineering
+from src.incremental import IncrementalFeatureStore
+from src.recommendation_unvisisted import recommend_similar_category_locations
+
+CATEGORIES_PATH = os.path.join(os.path.dirname(__file__), '../data/categories.zip')
+
+
+@pytest.fixture
+def cleaned_data():
+    """Fixture with check-ins in the shape returned by preprocess_data, including count ties."""
+    return pd.DataFrame({
+        'User_ID': ['1', '1', '2', '2', '3', '1', '2', '3'],
+        'Venue_ID': ['A', 'B', 'A', 'C', 'D', 'C', 'C', 'C'],
+        'Venue_Category_ID': ['4bf58dd8d48988d116941735', '4bf58dd8d48988d16d941735', '4bf58dd8d48988d116941735',
+                              '4bf58dd8d48988d16d941735', '4e51a0c0bd41d3446defbb2e', '4bf58dd8d48988d16d941735',
+                              '4bf58dd8d48988d16d941735', '4bf58dd8d48988d16d941735'],
+        'Category_Name': pd.Categorical(['Bar', 'Café', 'Bar', 'Café', 'Ferry', 'Café', 'Café', 'Café']),
+        'Latitude': np.array([40.7198, 40.6068, 40.7198, 40.7161, 40.7451, 40.7161, 40.7161, 40.7161], dtype='float32'),
+        'Longitude': np.array([-74.0025, -74.0441, -74.0025, -73.8830, -73.9825, -73.8830, -73.8830, -73.8830],
+                              dtype='float32'),
+        'Local_Time': pd.to_datetime(['2012-04-03 18:00:09', '2012-04-07 04:59:00', '2012-04-08 12:30:00',
+                                      '2012-04-09 21:15:00', '2012-04-10 08:00:00', '2012-04-10 13:00:00',
+                                      '2012-04-11 09:00:00', '2012-04-12 22:00:00']),
+    })
+
+
+def test_batches_match_full_rebuild(cleaned_data):
+    store = IncrementalFeatureStore(CATEGORIES_PATH)
+    parts = [store.apply_batch(cleaned_data.iloc[:3]), store.apply_batch(cleaned_data.iloc[3:])]
+
+    history = pd.concat(parts, ignore_index=True)
+    history['Category_Name'] = pd.Categorical(history['Category_Name'].astype(str),
+                                              categories=cleaned_data['Category_Name'].cat.categories)
+
+    expected = feature_engineering(cleaned_data, CATEGORIES_PATH)
+    pd.testing.assert_frame_equal(store.enrich(history), expected)
+    assert store.version == 2
+    assert store.n_checkins == len(cleaned_data)
+
+
+def test_popularity_is_renormalized_when_max_changes(cleaned_data):
+    store = IncrementalFeatureStore(CATEGORIES_PATH)
+    store.apply_batch(cleaned_data.iloc[:3])
+    assert store.venue_features(['A'])['Popularity_Score'].iloc[0] == 1.0
+
+    # Venue C overtakes A with four visits
+    store.apply_batch(cleaned_data.iloc[3:])
+
+    venues = store.venue_features(['A', 'C']).set_index('Venue_ID')
+    assert store.max_visits == 4
+    assert venues.loc['C', 'Popularity_Score'] == 1.0
+    assert venues.loc['A', 'Popularity_Score'] == 0.5
+    assert store.user_features(['1'])['Category_Name_Preferred'].iloc[0] == 'Café'
+
+
+def test_batches_invalidate_cached_results(cleaned_data):
+    cache = ResultCache(version='snapshot')
+    store = IncrementalFeatureStore(CATEGORIES_PATH, cache=cache)
+    history = store.apply_batch(cleaned_data.iloc[:3])
+
+    def recommend():
+        return recommend_similar_category_locations('2', 'bar', store.enrich(history), cache=cache,
+                                                    version=store.version)
+
+    before = recommend()
+    pd.testing.assert_frame_equal(recommend(), before)
+    assert cache.stats()['hits'] == 1
+
+    # Venue C's visits lower B's Popularity_Score, so the cached answer is stale
+    history = pd.concat([history, store.apply_batch(cleaned_data.iloc[3:])], ignore_index=True)
+    assert cache.version == store.version and len(cache) == 0
+
+    after = recommend()
+    assert list(after['Venue_ID']) == list(before['Venue_ID']) == ['B']
+    assert after['Score'].iloc[0] < before['Score'].iloc[0]
+    assert cache.stats()['misses'] == 2
@@ -0,0 +1,64 @@
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import io
+import json
+
+import pytest
+
+from src.instrumentation import Tracer
+
+
+def test_spans_record_nesting_rows_and_errors():
+    tracer = Tracer()
+
+    with tracer.span('stage', rows=3, source='test'):
+        with tracer.span('stage'):
+            # Re-entering the same span name is not recorded twice
+            pass
+        with tracer.span('step') as step:
+            sum(range(10_000))
+            step.rows = 7
+
+    with pytest.raises(KeyError):
+        with tracer.span('step'):
+            raise KeyError('missing')
+
+    assert [span.name for span in tracer.spans] == ['step', 'stage', 'step']
+    step, stage, failed = tracer.spans
+    assert step.parent == 'stage' and step.rows == 7
+    assert stage.rows == 3 and stage.attributes == {'source': 'test'}
+    assert stage.wall_seconds >= step.wall_seconds > 0
+    assert failed.error == 'KeyError'
+
+    output = io.StringIO()
+    assert tracer.export_jsonl(output) == 3
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert lines[1]['name'] == 'stage' and 'cpu_seconds' in lines[1] and 'peak_rss_delta_bytes' in lines[1]
+
+    text = tracer.prometheus_text()
+    assert 'lrs_span_calls_total{span="step"} 2' in text
+    assert 'lrs_span_errors_total{span="step"} 1' in text
+    assert 'lrs_span_rows_total{span="step"} 7' in text
+    assert 'lrs_span_duration_seconds_count{span="stage"} 1' in text
+
+
+def test_profile_next_profiles_one_span():
+    tracer = Tracer()
+    tracer.profile_next('slow')
+
+    for _ in range(2):
+        with tracer.span('slow'):
+            sorted(range(1000), key=lambda value: -value)
+
+    first, second = tracer.spans
+    assert 'function calls' in first.profile
+    assert second.profile is None
+
+    disabled = Tracer(enabled=False)
+    with disabled.span('stage') as record:
+        record.rows = 1
+    assert len(disabled.spans) == 0
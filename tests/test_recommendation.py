@@ -1,3 +1,4 @@
+import itertools
 import sys
 import os
 
@@ -6,9 +7,15 @@ print(sys.path)
 # Add the src directory to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
+import numpy as np
 import pandas as pd
 import pytest
-from src.recommendation_unvisisted import recommend_similar_category_locations
+from src.recommendation_point import recommend_meeting_place_random_checkins
+from src.recommendation_unvisisted import recommend_similar_category_locations, build_category_index
+from src.data_preprocessing import feature_engineering
+from src.similarity import compute_user_profile
+
+CATEGORIES_PATH = os.path.join(os.path.dirname(__file__), '../data/categories.zip')
 
 
 def test_recommend_similar_category_locations():
@@ -31,6 +38,122 @@ def test_recommend_similar_category_locations():
     assert "Venue_ID" in recommendations.columns
 
 
+def test_recommend_similar_category_locations_with_index():
+    data = pd.DataFrame({
+        'User_ID': ['1', '1', '2', '3', '3'],
+        'Venue_ID': ['A', 'B', 'C', 'D', 'A'],
+        'Category_Name': ['Bar', 'Pub', 'Bar', 'Cafe', 'Bar'],
+        'Broader_Category': ['Dining and Drinking', 'Dining and Drinking', 'Dining and Drinking',
+                             'Dining and Drinking', 'Dining and Drinking'],
+        'Popularity_Score': [1.0, 0.5, 0.5, 0.5, 1.0],
+        'Distance_From_Center': [1.0, 0.0, 0.5, 3.0, 2.0],
+        'Latitude': [40.7198, 40.6068, 40.7161, 40.7451, 40.7198],
+        'Longitude': [-74.0025, -74.0441, -73.8830, -73.9825, -74.0025],
+    })
+    index = build_category_index(data)
+
+    for user_id in ['1', '2', '3', '4']:
+        expected = recommend_similar_category_locations(user_id, 'bar', data, top_k=2)
+        result = recommend_similar_category_locations(user_id, 'bar', data, top_k=2, index=index)
+        pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True))
+
+    with pytest.raises(ValueError, match="Category name 'museum' not found in the dataset."):
+        recommend_similar_category_locations('1', 'Museum', data, index=index)
+
+
+def test_recommend_similar_category_locations_by_proximity_and_time():
+    rng = np.random.default_rng(0)
+    n = 400
+    data = pd.DataFrame({
+        'User_ID': rng.choice(['1', '2', '3', '4'], n),
+        'Venue_ID': [f'v{i}' for i in rng.integers(0, 300, n)],
+        'Category_Name': 'Bar',
+        'Broader_Category': 'Dining and Drinking',
+        'Popularity_Score': rng.random(n),
+        'Distance_From_Center': 0.0,
+        'Latitude': rng.uniform(40.6, 40.85, n),
+        'Longitude': rng.uniform(-74.1, -73.8, n),
+        'Local_Time': pd.Timestamp('2012-04-02') + pd.to_timedelta(rng.integers(0, 7, n) * 24 + rng.choice([9, 21], n),
+                                                                   unit='h'),
+    })
+    # Venue attributes and user centres are the same on every row, as feature_engineering writes them
+    first = data.drop_duplicates('Venue_ID').set_index('Venue_ID')
+    for column in ['Popularity_Score', 'Latitude', 'Longitude']:
+        data[column] = data['Venue_ID'].map(first[column])
+    centers = data.groupby('User_ID')[['Latitude', 'Longitude']].transform('mean')
+    data['Avg_Latitude'], data['Avg_Longitude'] = centers['Latitude'], centers['Longitude']
+    index = build_category_index(data)
+
+    for user_id in ['1', '2', '3', '4']:
+        expected = recommend_similar_category_locations(user_id, 'bar', data, top_k=5, proximity=True)
+        result = recommend_similar_category_locations(user_id, 'bar', data, top_k=5, index=index,
+                                                      proximity=True, radius_km=0.5)
+        assert list(result['Venue_ID']) == list(expected['Venue_ID'])
+        np.testing.assert_allclose(result['Distance_From_User'], expected['Distance_From_User'])
+
+        # A negative boost penalizes busy venues; the index must not stop its walk early then
+        for proximity, time_boost in itertools.product([False, True], [10, -0.9, -3.0]):
+            expected = recommend_similar_category_locations(user_id, 'bar', data, top_k=5, proximity=proximity,
+                                                            at_time='2012-04-20 21:00', time_boost=time_boost)
+            result = recommend_similar_category_locations(user_id, 'bar', data, top_k=5, index=index, proximity=proximity,
+                                                          at_time='2012-04-20 21:00', time_boost=time_boost)
+            assert list(result['Venue_ID']) == list(expected['Venue_ID'])
+            np.testing.assert_allclose(result['Busyness'], expected['Busyness'])
+            if time_boost > 0:
+                assert expected['Busyness'].max() > 0
+
+    with pytest.raises(ValueError, match="User ID 9 not found in the dataset."):
+        recommend_similar_category_locations('9', 'bar', data, index=index, proximity=True)
+
+
+def test_proximity_index_scores_venues_outside_a_covering_radius():
+    # User 1 is centred on the visited venue a; b sits in a grid corner outside every circle
+    data = pd.DataFrame({
+        'User_ID': ['1', '2'],
+        'Venue_ID': ['a', 'b'],
+        'Category_Name': 'Bar',
+        'Broader_Category': 'Dining and Drinking',
+        'Popularity_Score': [1.0, 1.0],
+        'Distance_From_Center': 0.0,
+        'Latitude': [0.0, 1.0],
+        'Longitude': [0.0, 1.0],
+        'Avg_Latitude': [0.0, 1.0],
+        'Avg_Longitude': [0.0, 1.0],
+    })
+    index = build_category_index(data, time_aware=False)
+
+    expected = recommend_similar_category_locations('1', 'bar', data, top_k=1, proximity=True)
+    result = recommend_similar_category_locations('1', 'bar', data, top_k=1, index=index, proximity=True)
+
+    assert list(expected['Venue_ID']) == ['b']
+    assert list(result['Venue_ID']) == ['b']
+    np.testing.assert_allclose(result['Distance_From_User'], expected['Distance_From_User'])
+
+
+def test_recommenders_accept_star_schema():
+    cleaned = pd.DataFrame({
+        'User_ID': ['1', '1', '2', '3'],
+        'Venue_ID': ['A', 'B', 'C', 'D'],
+        'Venue_Category_ID': ['4bf58dd8d48988d116941735', '4bf58dd8d48988d16d941735',
+                              '4bf58dd8d48988d116941735', '4bf58dd8d48988d116941735'],
+        'Category_Name': pd.Categorical(['Bar', 'Café', 'Bar', 'Bar']),
+        'Latitude': [40.7198, 40.6068, 40.7161, 40.7451],
+        'Longitude': [-74.0025, -74.0441, -73.8830, -73.9825],
+        'Local_Time': pd.to_datetime(['2012-04-03 18:00', '2012-04-07 04:59', '2012-04-08 12:30', '2012-04-09 21:15']),
+    })
+    wide = feature_engineering(cleaned, CATEGORIES_PATH)
+    schema = feature_engineering(cleaned, CATEGORIES_PATH, normalized=True)
+
+    pd.testing.assert_frame_equal(compute_user_profile(schema), compute_user_profile(wide))
+    for index in (None, build_category_index(schema)):
+        result = recommend_similar_category_locations('1', 'Bar', schema, top_k=5, index=index)
+        expected = recommend_similar_category_locations('1', 'Bar', wide, top_k=5)
+        pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True))
+
+    _, nearest_venues = recommend_meeting_place_random_checkins(['1', '2'], schema, k=2)
+    assert len(nearest_venues) == 2
+
+
 from src.recommendation_point import recommend_meeting_place_random_checkins
 
 def test_recommend_meeting_place():
@@ -46,3 +169,140 @@ def test_recommend_meeting_place():
     # Assertions
     assert len(selected_checkins) == len(user_ids), "Incorrect number of user check-ins selected."
     assert len(nearest_venues) == 1, "Nearest venue calculation failed."
+
+
+from src.recommendation_point import recommend_meeting_place, geometric_median
+from src.spatial_index import VenueIndex, UserLocationIndex
+from src.utils import haversine_km
+
+
+def test_geometric_median_per_group():
+    latitude = np.array([40.70, 40.70, 40.71, 40.80, 40.80, 40.80])
+    longitude = np.array([-74.00, -73.99, -73.995, -73.90, -73.90, -73.80])
+    weights = np.array([1.0, 1.0, 1.0, 2.0, 1.0, 1.0])
+
+    lat, lon = geometric_median(latitude, longitude, weights, groups=np.array([0, 0, 0, 1, 1, 1]))
+
+    # The second group's median sits on its heaviest point
+    assert (lat[1], lon[1]) == pytest.approx((40.80, -73.90), abs=1e-5)
+    assert geometric_median(latitude[:3], longitude[:3], weights[:3]) == pytest.approx((lat[0], lon[0]), abs=1e-6)
+
+
+def test_recommend_meeting_place_is_optimal_and_deterministic():
+    rng = np.random.default_rng(0)
+    n_venues, n_checkins = 400, 3000
+    venue_lat, venue_lon = 40.70 + rng.normal(0, 0.05, n_venues), -73.95 + rng.normal(0, 0.05, n_venues)
+    venues = rng.integers(0, n_venues, n_checkins)
+    data = pd.DataFrame({
+        'User_ID': (rng.integers(0, 30, n_checkins)).astype(str),
+        'Venue_ID': venues.astype(str),
+        'Category_Name': 'Bar',
+        'Latitude': venue_lat[venues],
+        'Longitude': venue_lon[venues],
+    })
+    group = ['3', '7', '11', '19', 'unknown']
+    venue_index, location_index = VenueIndex(data), UserLocationIndex(data)
+
+    # Expected travel of every member to every venue, by brute force
+    expected = np.column_stack([
+        haversine_km(venue_index.venues['Latitude'].to_numpy()[:, None], venue_index.venues['Longitude'].to_numpy()[:, None],
+                     member['Latitude'].to_numpy(), member['Longitude'].to_numpy()).mean(axis=1)
+        for _, member in data[data['User_ID'].isin(group)].groupby('User_ID')
+    ])
+
+    for objective, score in [('median', expected.mean(axis=1)), ('minimax', expected.max(axis=1))]:
+        members, result = recommend_meeting_place(group, data, k=3, objective=objective, n_candidates=20,
+                                                  venue_index=venue_index, location_index=location_index)
+        again = recommend_meeting_place(group, data, k=3, objective=objective, n_candidates=20)[1]
+
+        assert list(members['User_ID']) == ['3', '7', '11', '19']
+        assert members['Check_Ins'].sum() == data['User_ID'].isin(group).sum()
+        pd.testing.assert_frame_equal(result, again)
+        column = 'Mean_Distance_km' if objective == 'median' else 'Max_Distance_km'
+        assert result[column].iloc[0] == pytest.approx(score.min(), rel=1e-9)
+
+    with pytest.raises(ValueError, match="Unknown objective"):
+        recommend_meeting_place(group, data, objective='random')
+
+
+from src.recommendation_point import recommend_meeting_places
+
+
+def test_recommend_meeting_places_in_bulk():
+    rng = np.random.default_rng(1)
+    n_checkins = 2000
+    venues = rng.integers(0, 300, n_checkins)
+    data = pd.DataFrame({
+        'User_ID': rng.integers(0, 40, n_checkins).astype(str),
+        'Venue_ID': venues.astype(str),
+        'Category_Name': 'Bar',
+        'Latitude': 40.70 + venues * 1e-3,
+        'Longitude': -73.95 - (venues % 17) * 1e-3,
+    })
+    groups = [['1', '2', '3'], ['unknown'], ['4', '5'], ['6']]
+    venue_index, location_index = VenueIndex(data), UserLocationIndex(data)
+
+    centers, result = recommend_meeting_places(groups, data, k=2, center='median',
+                                               venue_index=venue_index, location_index=location_index)
+
+    assert list(centers['Members']) == [3, 0, 2, 1]
+    deduplicated, _ = recommend_meeting_places([['1', '2', '3', '1', '2']], data, k=2, center='median',
+                                               venue_index=venue_index, location_index=location_index)
+    pd.testing.assert_frame_equal(deduplicated, centers.iloc[:1])
+    assert centers['Latitude'].isna().tolist() == [False, True, False, False]
+    assert list(result['Group_ID']) == [0, 0, 2, 2, 3, 3] and list(result['Rank']) == [1, 2] * 3
+    for group_id in (0, 2, 3):
+        _, single = recommend_meeting_place(groups[group_id], data, k=2, venue_index=venue_index,
+                                            location_index=location_index)
+        nearest = venue_index.query_nearest(tuple(centers.loc[group_id, ['Latitude', 'Longitude']]), k=2)
+        assert list(result.loc[result['Group_ID'] == group_id, 'Venue_ID']) == list(nearest['Venue_ID'])
+        assert single['Distance_From_Central'].iloc[0] == pytest.approx(
+            result.loc[result['Group_ID'] == group_id, 'Distance_From_Central'].iloc[0], abs=1e-6)
+
+    # Random centres: one check-in per member, reproducible with a seed; long DataFrame input
+    # keeps the groups in input order and counts a repeated member once
+    long_groups = pd.DataFrame({'Group_ID': ['b', 'a', 'a', 'a', 'b'], 'User_ID': ['6', '1', '2', '1', '6']})
+    first = recommend_meeting_places(long_groups, data, k=1, seed=3)
+    second = recommend_meeting_places(long_groups, data, k=1, seed=3)
+    pd.testing.assert_frame_equal(first[1], second[1])
+    assert list(first[0]['Group_ID']) == ['b', 'a'] and list(first[0]['Members']) == [1, 2]
+    assert list(first[1]['Group_ID']) == ['b', 'a']
+    single_member = first[0].set_index('Group_ID').loc['b']
+    checkins_of_6 = data.loc[data['User_ID'] == '6', ['Latitude', 'Longitude']]
+    assert ((checkins_of_6['Latitude'] == single_member['Latitude'])
+            & (checkins_of_6['Longitude'] == single_member['Longitude'])).any()
+
+
+def test_recommend_meeting_place_random_checkins_with_location_index():
+    data = pd.DataFrame({
+        'User_ID': ['1', '1', '2', '3'],
+        'Venue_ID': ['A', 'B', 'C', 'D'],
+        'Latitude': [40.71, 40.72, 40.73, 40.74],
+        'Longitude': [-73.95, -73.96, -73.97, -73.98],
+    })
+    location_index = UserLocationIndex(data)
+
+    selected, venues = recommend_meeting_place_random_checkins(['1', '2', '1', 'unknown'], data, k=2,
+                                                               location_index=location_index)
+
+    assert list(selected['User_ID']) == ['1', '2'] and len(venues) == 2
+    drawn = selected.merge(data, on=['User_ID', 'Latitude', 'Longitude'])
+    assert len(drawn) == 2
+
+
+@pytest.mark.parametrize('groups', [[], [['unknown']]])
+@pytest.mark.parametrize('center', ['random', 'median'])
+def test_recommend_meeting_places_without_known_members(groups, center):
+    data = pd.DataFrame({
+        'User_ID': ['1', '2'],
+        'Venue_ID': ['A', 'B'],
+        'Category_Name': 'Bar',
+        'Latitude': [40.71, 40.72],
+        'Longitude': [-73.95, -73.96],
+    })
+    _, expected = recommend_meeting_places([['1']], data, k=2)
+
+    centers, venues = recommend_meeting_places(groups, data, k=2, center=center)
+
+    assert len(centers) == len(groups) and centers['Latitude'].isna().all()
+    assert venues.empty and list(venues.columns) == list(expected.columns)
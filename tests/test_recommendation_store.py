@@ -0,0 +1,74 @@
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_preprocessing import feature_engineering
+from src.recommendation_store import build_recommendation_store, RecommendationStore
+from src.recommendation_unvisisted import build_category_index, recommend_similar_category_locations
+from src.similarity import compute_user_profile, compute_top_k_similarity, find_top_similar_users
+
+CATEGORIES_PATH = os.path.join(os.path.dirname(__file__), '../data/categories.zip')
+
+
+@pytest.fixture
+def processed_data():
+    """Six users checking in at bars, cafés and a museum."""
+    rng = np.random.default_rng(0)
+    venues = pd.DataFrame({
+        'Venue_ID': [f'v{i}' for i in range(12)],
+        'Category_Name': ['Bar'] * 5 + ['Café'] * 4 + ['Museum'] * 3,
+        'Latitude': 40.7 + rng.normal(0, 0.02, 12),
+        'Longitude': -74.0 + rng.normal(0, 0.02, 12),
+    })
+    picks = rng.integers(0, 12, 60)
+    cleaned = venues.iloc[picks].reset_index(drop=True)
+    cleaned.insert(0, 'User_ID', rng.integers(1, 7, 60).astype(str))
+    cleaned.insert(2, 'Venue_Category_ID', '4bf58dd8d48988d116941735')
+    cleaned['Local_Time'] = pd.Timestamp('2012-04-03') + pd.to_timedelta(rng.integers(0, 10**6, 60), unit='s')
+    return feature_engineering(cleaned, CATEGORIES_PATH, normalized=True)
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_store_matches_live_recommenders(processed_data, tmp_path, monkeypatch, n_jobs):
+    # One user per shard, so the process pool path runs
+    monkeypatch.setattr('src.recommendation_store.USERS_PER_SHARD', 1)
+    store_dir = build_recommendation_store(processed_data, str(tmp_path / 'store'), k=3, top_n=2,
+                                           version='abc', n_jobs=n_jobs)
+    store = RecommendationStore(store_dir)
+    assert store.version == 'abc' and store.k == 3 and store.top_n == 2
+
+    index = build_category_index(processed_data)
+    similarity = compute_top_k_similarity(compute_user_profile(processed_data, sparse=True), k=2)
+    for user_id in list(processed_data.users['User_ID']) + ['unknown']:
+        for category_name in ['bar', 'Café', 'Museum']:
+            expected = recommend_similar_category_locations(user_id, category_name, processed_data, 3, index=index)
+            stored = store.top_unvisited(user_id, category_name, 3)
+            assert list(stored['Venue_ID']) == list(expected['Venue_ID'])
+            np.testing.assert_allclose(stored['Score'], expected['Score'].astype(float), rtol=1e-6)
+        if user_id != 'unknown':
+            expected = find_top_similar_users(user_id, similarity, 2)
+            assert list(store.similar_users(user_id, 2).index) == list(expected.index)
+
+    with pytest.raises(ValueError, match="Category name 'gym' not found"):
+        store.top_unvisited('1', 'Gym')
+    with pytest.raises(ValueError, match="User ID unknown not found"):
+        store.similar_users('unknown')
+
+
+def test_store_rebuild_keeps_open_readers_working(processed_data, tmp_path):
+    store_dir = build_recommendation_store(processed_data, str(tmp_path / 'store'), k=3, top_n=2, version='abc')
+    store = RecommendationStore(store_dir)
+    before = store.top_unvisited('1', 'bar', 3)
+
+    build_recommendation_store(processed_data, store_dir, k=3, top_n=2, version='def')
+
+    # The open store still reads its (now deleted) memory-mapped files; the rebuilt one is swapped in
+    pd.testing.assert_frame_equal(store.top_unvisited('1', 'bar', 3), before)
+    assert RecommendationStore(store_dir).version == 'def'
+    assert sorted(os.listdir(tmp_path)) == ['store']
@@ -0,0 +1,173 @@
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_preprocessing import feature_engineering
+from src.recommendation_store import build_recommendation_store
+from src.service import build_model, open_store, RecommendationService
+
+CATEGORIES_PATH = os.path.join(os.path.dirname(__file__), '../data/categories.zip')
+
+
+@pytest.fixture
+def model():
+    cleaned_data = pd.DataFrame({
+        'User_ID': ['1', '1', '2', '2', '3', '3'],
+        'Venue_ID': ['A', 'B', 'A', 'C', 'D', 'C'],
+        'Venue_Category_ID': ['4bf58dd8d48988d116941735', '4bf58dd8d48988d116941735', '4bf58dd8d48988d116941735',
+                              '4bf58dd8d48988d116941735', '4e51a0c0bd41d3446defbb2e', '4bf58dd8d48988d116941735'],
+        'Category_Name': pd.Categorical(['Bar', 'Bar', 'Bar', 'Bar', 'Ferry', 'Bar']),
+        'Latitude': np.array([40.7198, 40.6068, 40.7198, 40.7161, 40.7451, 40.7161], dtype='float32'),
+        'Longitude': np.array([-74.0025, -74.0441, -74.0025, -73.8830, -73.9825, -73.8830], dtype='float32'),
+        'Local_Time': pd.to_datetime(['2012-04-03 18:00:09', '2012-04-07 04:59:00', '2012-04-08 12:30:00',
+                                      '2012-04-09 21:15:00', '2012-04-10 08:00:00', '2012-04-10 13:00:00']),
+    })
+    return build_model(feature_engineering(cleaned_data, CATEGORIES_PATH), version='test')
+
+
+async def _post(port, requests):
+    """Send (method, path, body) requests over one keep-alive connection."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    responses = []
+    for method, path, body in requests:
+        payload = json.dumps(body).encode() if body is not None else b''
+        writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(payload)}\r\n\r\n".encode() + payload)
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while (line := await reader.readline()) != b'\r\n':
+            name, _, value = line.decode().partition(':')
+            headers[name.lower()] = value.strip()
+        payload = await reader.readexactly(int(headers['content-length']))
+        is_json = headers['content-type'] == 'application/json'
+        responses.append((status, json.loads(payload) if is_json else payload.decode()))
+    writer.close()
+    return responses
+
+
+def _serve(model, requests):
+    async def run():
+        service = RecommendationService(model, ThreadPoolExecutor(max_workers=1))
+        port = await service.start(port=0)
+        try:
+            return await _post(port, requests)
+        finally:
+            await service.close()
+            service.executor.shutdown()
+    return asyncio.run(run())
+
+
+def test_service_endpoints(model):
+    responses = _serve(model, [
+        ('GET', '/health', None),
+        ('POST', '/recommend/category', {'user_id': 1, 'category_name': 'bar', 'top_k': 5}),
+        ('POST', '/recommend/similar-users', {'user_id': '1', 'top_n': 2}),
+        ('POST', '/recommend/meeting-place', {'user_ids': ['1', '2'], 'k': 2}),
+        ('POST', '/recommend/similar-users', {'user_id': 1, 'top_n': 2}),
+        ('GET', '/stats', None),
+        ('POST', '/recommend/category?profile=1', {'user_id': '2', 'category_name': 'bar'}),
+        ('GET', '/metrics', None),
+    ])
+
+    assert responses[0] == (200, {'status': 'ok', 'version': 'test'})
+
+    status, body = responses[1]
+    assert status == 200
+    assert [venue['Venue_ID'] for venue in body['recommendations']] == ['C']
+
+    status, body = responses[2]
+    assert status == 200
+    assert [user['User_ID'] for user in body['similar_users']] == ['2', '3']
+
+    status, body = responses[3]
+    assert status == 200
+    assert {checkin['User_ID'] for checkin in body['selected_checkins']} == {'1', '2'}
+    assert len(body['venues']) == 2
+
+    # The repeated similar-users query is served from the result cache
+    assert responses[4] == responses[2]
+    assert responses[5][1]['hits'] == 1 and responses[5][1]['misses'] == 2
+
+    # One request profiled on demand; every request counted in the span metrics
+    status, body = responses[6]
+    assert status == 200 and 'function calls' in body['profile']
+    status, metrics = responses[7]
+    assert status == 200
+    assert 'lrs_span_calls_total{span="/recommend/similar-users"}' in metrics
+
+
+def test_service_batches_and_errors(model):
+    responses = _serve(model, [
+        ('POST', '/recommend/similar-users/batch', {'requests': [{'user_id': '2'}, {'user_id': '99'}, {}]}),
+        ('POST', '/recommend/category', {'user_id': '1', 'category_name': 'Museum'}),
+        ('POST', '/recommend/unknown', {}),
+        ('GET', '/recommend/category', None),
+        ('POST', '/recommend/meeting-place', {'user_ids': ['1', '3'], 'objective': 'median'}),
+        ('POST', '/recommend/meeting-place', {'user_ids': ['1'], 'objective': 'closest'}),
+        ('POST', '/recommend/meeting-places', {'groups': [['1', '2'], ['3']], 'k': 2, 'seed': 0}),
+        ('POST', '/recommend/venues', {'user_ids': ['1', 3], 'k': 2}),
+        ('POST', '/recommend/venues', {'user_ids': ['1', '99']}),
+    ])
+
+    status, body = responses[0]
+    assert status == 200
+    assert len(body['results'][0]['similar_users']) == 2
+    assert body['results'][1] == {'error': 'User ID 99 not found in the dataset.'}
+    assert body['results'][2] == {'error': "Missing field 'user_id'."}
+
+    assert responses[1] == (400, {'error': "Category name 'museum' not found in the dataset."})
+    assert responses[2][0] == 404
+    assert responses[3][0] == 405
+
+    status, body = responses[4]
+    assert status == 200
+    assert [member['User_ID'] for member in body['members']] == ['1', '3']
+    assert len(body['venues']) == 1 and 'Mean_Distance_km' in body['venues'][0]
+    assert responses[5][0] == 400
+
+    status, body = responses[6]
+    assert status == 200
+    assert [center['Members'] for center in body['centers']] == [2, 1]
+    assert [venue['Group_ID'] for venue in body['venues']] == [0, 0, 1, 1]
+
+    # Only venues co-visited with ones the user went to: C through A for user 1, A through C for user 3
+    status, body = responses[7]
+    assert status == 200
+    assert [(venue['User_ID'], venue['Venue_ID']) for venue in body['recommendations']] == [('1', 'C'), ('3', 'A')]
+    assert responses[8] == (400, {'error': 'User ID 99 not found in the dataset.'})
+
+
+def test_service_serves_from_store(model, tmp_path):
+    store_dir = build_recommendation_store(model.data, str(tmp_path / 'store'), k=5, top_n=2, version='test')
+    model.store = open_store(store_dir, 'test')
+    assert open_store(store_dir, 'other') is None
+
+    responses = _serve(model, [
+        ('GET', '/health', None),
+        ('POST', '/recommend/category', {'user_id': 1, 'category_name': 'bar', 'top_k': 5}),
+        ('POST', '/recommend/similar-users', {'user_id': '1', 'top_n': 2}),
+    ])
+    assert responses[0][1]['store']['version'] == 'test'
+    assert [venue['Venue_ID'] for venue in responses[1][1]['recommendations']] == ['C']
+    assert [user['User_ID'] for user in responses[2][1]['similar_users']] == ['2', '3']
+    # Answered from the store, so nothing reached the result cache
+    assert model.cache.stats()['misses'] == 0
+
+    # Time-aware requests are not in the store
+    status, body = _serve(model, [
+        ('POST', '/recommend/category', {'user_id': '1', 'category_name': 'bar', 'at_time': '2012-04-16 21:30'}),
+    ])[0]
+    assert status == 200
+    assert body['recommendations'][0]['Venue_ID'] == 'C'
+    assert body['recommendations'][0]['Busyness'] == pytest.approx(1.0)
+    assert model.cache.stats()['misses'] == 1
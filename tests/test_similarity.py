@@ -7,12 +7,14 @@ print(sys.path)
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
 import pytest
+import numpy as np
 import pandas as pd
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.preprocessing import OneHotEncoder, MinMaxScaler
 
 # Import functions from your implementation
-from src.similarity import compute_user_profile, compute_user_similarity, find_top_similar_users
+from src.similarity import compute_user_profile, compute_user_similarity, find_top_similar_users, \
+    compute_top_k_similarity, TopKSimilarity, SparseUserProfile, compute_preference_incidence
 
 @pytest.fixture
 def mock_data():
@@ -41,6 +43,20 @@ def test_compute_user_profile(mock_data):
     assert 'Avg_Latitude' in user_profiles.columns, "Avg_Latitude normalization failed."
     assert 'Avg_Longitude' in user_profiles.columns, "Avg_Longitude normalization failed."
 
+def test_compute_user_profile_sparse(mock_data):
+    dense_profiles = compute_user_profile(mock_data)
+    sparse_profiles = compute_user_profile(mock_data, sparse=True)
+
+    assert isinstance(sparse_profiles, SparseUserProfile)
+    assert list(sparse_profiles.index) == ['U1', 'U2', 'U3', 'U4']
+    assert sparse_profiles.matrix.format == 'csr'
+    pd.testing.assert_frame_equal(sparse_profiles.to_frame(), dense_profiles)
+
+    # Similarity is the same whichever representation it is computed from
+    pd.testing.assert_frame_equal(compute_user_similarity(sparse_profiles), compute_user_similarity(dense_profiles))
+    top_k = compute_top_k_similarity(sparse_profiles, k=2)
+    assert list(find_top_similar_users('U1', top_k, top_n=1).index) == ['U3']
+
 # Test for compute_user_similarity
 def test_compute_user_similarity(mock_data):
     user_profiles = compute_user_profile(mock_data)
@@ -77,7 +93,66 @@ def test_find_top_similar_users(mock_data):
     with pytest.raises(ValueError, match="User ID U999 not found in the dataset."):
         find_top_similar_users('U999', user_similarity_df)
 
+# Test for compute_top_k_similarity
+def test_top_k_similarity_matches_dense(mock_data):
+    user_profiles = compute_user_profile(mock_data)
+    dense = compute_user_similarity(user_profiles)
+
+    # A tiny memory bound forces one user per block
+    top_k = compute_top_k_similarity(user_profiles, k=2, max_memory_mb=1e-6)
+
+    assert isinstance(top_k, TopKSimilarity)
+    assert top_k.neighbors.shape == (4, 2)
+    for user in ['U1', 'U2', 'U3', 'U4']:
+        expected = dense.loc[user].drop(user).sort_values(ascending=False).iloc[:2]
+        result = find_top_similar_users(user, top_k, top_n=2)
+        assert user not in result.index
+        assert list(result.values) == pytest.approx(list(expected.values))
+
+    # top_n is capped at the stored k
+    assert len(find_top_similar_users('U1', top_k, top_n=10)) == 2
+    with pytest.raises(ValueError, match="User ID U999 not found in the dataset."):
+        find_top_similar_users('U999', top_k)
+
+
+def test_top_k_similarity_process_pool(mock_data):
+    user_profiles = compute_user_profile(mock_data)
+
+    serial = compute_top_k_similarity(user_profiles, k=3, max_memory_mb=1e-6)
+    parallel = compute_top_k_similarity(user_profiles, k=3, max_memory_mb=1e-6, n_jobs=2)
+
+    np.testing.assert_array_equal(serial.neighbors, parallel.neighbors)
+    np.testing.assert_allclose(serial.scores, parallel.scores)
+
+def test_find_top_similar_users_with_int_ids(mock_data):
+    # Compact datasets store numeric User_IDs as int32; string lookups still work
+    mock_data['User_ID'] = np.array([1, 2, 3, 4], dtype=np.int32)
+    user_similarity_df = compute_user_similarity(compute_user_profile(mock_data))
+
+    top_similar_users = find_top_similar_users('1', user_similarity_df, top_n=1)
+
+    assert list(top_similar_users.index) == [3]
+
 # Edge case tests
+def test_preference_incidence_overlap():
+    checkins = pd.DataFrame({
+        'User_ID': ['U1', 'U1', 'U1', 'U2', 'U2', 'U3', 'U3'],
+        'Category_Name': ['Bar', 'Bar', 'Cafe', 'Bar', 'Cafe', 'Bar', 'Gym'],
+        'Time_Bucket': ['Evening', 'Evening', 'Morning', 'Evening', 'Evening', 'Night', 'Morning'],
+    })
+    incidence = compute_preference_incidence(checkins)
+
+    # U1 has (Bar, Evening) and (Cafe, Morning); U2 shares only (Bar, Evening); U3 shares nothing
+    assert incidence.matrix.shape == (3, 5)
+    assert list(incidence.overlap('U1', ['U2', 'U3'])) == [1, 0]
+    assert incidence.pairwise().toarray().tolist() == [[2, 1, 0], [1, 2, 0], [0, 0, 2]]
+
+    similarity = TopKSimilarity(pd.Index(['U1', 'U2', 'U3']), np.array([[1, 2], [0, 2], [0, 1]]), np.zeros((3, 2)))
+    assert incidence.neighbor_overlap(similarity, top_n=2).tolist() == [[1, 0], [1, 0], [0, 0]]
+
+    with pytest.raises(ValueError):
+        incidence.overlap('U1', ['U999'])
+
 def test_empty_data():
     empty_data = pd.DataFrame(columns=['User_ID', 'Category_Name_Preferred', 'Time_Bucket_Preferred', 'Avg_Latitude', 'Avg_Longitude'])
     user_profiles = compute_user_profile(empty_data)
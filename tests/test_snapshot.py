@@ -0,0 +1,72 @@
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.snapshot import save_snapshot, load_snapshot, snapshot_key, read_snapshot_key
+
+
+@pytest.fixture
+def processed_data():
+    """Fixture mixing the column kinds produced by feature_engineering."""
+    return pd.DataFrame({
+        'User_ID': ['1', '1', '2'],
+        'Category_Name': pd.Categorical(['Bar', 'Cafe', 'Bar']),
+        'Latitude': np.array([40.7198, 40.6068, 40.7161], dtype='float32'),
+        'Local_Time': pd.to_datetime(['2012-04-03 18:00:09', '2012-04-07 04:59:00', '2012-04-08 12:30:00']),
+        'Broader_Category': ['Dining and Drinking', np.nan, 'Dining and Drinking'],
+        'totalVisits': [2, 1, 2],
+    })
+
+
+def test_snapshot_round_trip(processed_data, tmp_path):
+    snapshot_dir = save_snapshot(processed_data, str(tmp_path / 'snap'), key='abc')
+
+    loaded = load_snapshot(snapshot_dir)
+
+    pd.testing.assert_frame_equal(loaded, processed_data)
+    assert read_snapshot_key(snapshot_dir) == 'abc'
+    # Numeric columns are served straight from the read-only memory map
+    assert not loaded['Latitude'].to_numpy().flags.writeable
+
+    # Rebuilding swaps the new snapshot in and removes the old one
+    save_snapshot(processed_data.iloc[:1], snapshot_dir, key='def')
+    assert read_snapshot_key(snapshot_dir) == 'def'
+    assert len(load_snapshot(snapshot_dir)) == 1
+    assert sorted(os.listdir(tmp_path)) == ['snap']
+
+
+def test_snapshot_round_trip_string_dtype(tmp_path):
+    data = pd.DataFrame({
+        'User_ID': pd.array(['1', '1', '2'], dtype=pd.StringDtype()),
+        'Venue_ID': pd.array(['a', None, 'b'], dtype=pd.StringDtype()),
+    })
+    snapshot_dir = save_snapshot(data, str(tmp_path / 'snap'))
+
+    loaded = load_snapshot(snapshot_dir)
+
+    pd.testing.assert_frame_equal(loaded, data)
+
+
+def test_snapshot_key_tracks_file_changes(tmp_path):
+    path = tmp_path / 'checkins.txt'
+    path.write_text("1\tA\n")
+    first = snapshot_key(str(path))
+    assert snapshot_key(str(path)) == first
+
+    # Same size, later modification time
+    path.write_text("1\tB\n")
+    modified = path.stat().st_mtime_ns + 1_000_000
+    os.utime(path, ns=(modified, modified))
+    second = snapshot_key(str(path))
+    assert second != first
+
+    path.write_text("1\tBB\n")
+    os.utime(path, ns=(modified, modified))
+    assert snapshot_key(str(path)) not in (first, second)
+    assert read_snapshot_key(str(tmp_path / 'missing')) is None
@@ -0,0 +1,74 @@
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import numpy as np
+import pandas as pd
+import pytest
+from haversine import haversine, Unit
+
+from src.spatial_index import GridIndex, VenueIndex
+from src.utils import haversine_km
+
+
+@pytest.fixture
+def venue_data():
+    """Fixture with repeated check-ins at a handful of venues."""
+    return pd.DataFrame({
+        'User_ID': ['1', '2', '3', '4', '5', '6'],
+        'Venue_ID': ['A', 'A', 'B', 'C', 'D', 'E'],
+        'Category_Name': ['Bar', 'Bar', 'Cafe', 'Bar', 'Cafe', 'Restaurant'],
+        'Latitude': [40.7128, 40.7128, 40.7306, 40.7580, 40.6892, 40.8000],
+        'Longitude': [-74.0060, -74.0060, -73.9352, -73.9855, -74.0445, -73.9500],
+    })
+
+
+def test_query_nearest_reports_km(venue_data):
+    index = VenueIndex(venue_data)
+    point = (40.7130, -74.0050)
+
+    nearest = index.query_nearest(point, k=2)
+
+    assert len(index) == 5
+    assert list(nearest['Venue_ID']) == ['A', 'D']
+    expected = haversine(point, (40.7128, -74.0060), unit=Unit.KILOMETERS)
+    assert nearest['Distance_From_Central'].iloc[0] == pytest.approx(expected, rel=1e-9)
+
+
+def test_query_nearest_by_category(venue_data):
+    index = VenueIndex(venue_data)
+
+    nearest = index.query_nearest((40.7130, -74.0050), k=5, category='cafe')
+
+    assert list(nearest['Venue_ID']) == ['D', 'B']
+    with pytest.raises(ValueError, match="Category name 'Museum' not found in the dataset."):
+        index.query_nearest((40.7130, -74.0050), category='Museum')
+
+
+def test_query_radius(venue_data):
+    index = VenueIndex(venue_data)
+
+    within = index.query_radius((40.7128, -74.0060), radius_km=6)
+
+    assert list(within['Venue_ID']) == ['A', 'D', 'C']
+    assert (within['Distance_From_Central'] <= 6).all()
+    assert within['Distance_From_Central'].is_monotonic_increasing
+
+
+def test_grid_index_query_radius_matches_brute_force():
+    rng = np.random.default_rng(0)
+    latitude = rng.uniform(40.5, 40.9, 2000)
+    longitude = rng.uniform(-74.2, -73.7, 2000)
+    grid = GridIndex(latitude, longitude, cell_km=0.5)
+
+    for radius_km in [0.1, 1.5, 7.0]:
+        center = (40.7, -73.95)
+        positions, distances = grid.query_radius(*center, radius_km)
+        expected = haversine_km(*center, latitude, longitude)
+        assert list(positions) == list(np.flatnonzero(expected <= radius_km))
+        np.testing.assert_allclose(distances, expected[positions])
+
+    assert not grid.covers(40.7, -73.95, 1.0)
+    assert grid.covers(40.7, -73.95, 100.0)
@@ -0,0 +1,53 @@
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import pandas as pd
+import pytest
+
+from src.data_preprocessing import load_data, preprocess_data, feature_engineering
+from src.streaming import build_star_schema_streaming, chunk_rows_for
+
+CATEGORIES_PATH = os.path.join(os.path.dirname(__file__), '../data/categories.zip')
+
+RAW_ROWS = [
+    "1\tA\t4bf58dd8d48988d116941735\tBar\t40.7198\t-74.0025\t-240\tTue Apr 03 18:00:09 +0000 2012",
+    "1\tB\t4bf58dd8d48988d16d941735\tCafé\t40.6068\t-74.0441\t-240\tSat Apr 07 08:59:00 +0000 2012",
+    "2\tA\t4bf58dd8d48988d116941735\tBar\t40.7198\t-74.0025\t-240\tSun Apr 08 16:30:00 +0000 2012",
+    "2\tC\t4bf58dd8d48988d16d941735\tCafé\t40.7161\t-73.8830\t-240\tMon Apr 09 01:15:00 +0000 2012",
+    # Duplicate of the first row, in a later chunk
+    "1\tA\t4bf58dd8d48988d116941735\tBar\t40.7198\t-74.0025\t-240\tTue Apr 03 18:00:09 +0000 2012",
+    "3\tD\t4e51a0c0bd41d3446defbb2e\tFerry\t40.7451\t-73.9825\t-240\tTue Apr 10 12:00:00 +0000 2012",
+    # Malformed timestamp and a missing category id
+    "3\tC\t4bf58dd8d48988d16d941735\tCafé\t40.7161\t-73.8830\t-240\tnot a time",
+    "1\tC\t\tCafé\t40.7161\t-73.8830\t-240\tTue Apr 10 17:00:00 +0000 2012",
+    "1\tC\t4bf58dd8d48988d16d941735\tCafé\t40.7161\t-73.8830\t-240\tTue Apr 10 17:00:00 +0000 2012",
+    "2\tC\t4bf58dd8d48988d16d941735\tCafé\t40.7161\t-73.8830\t-240\tWed Apr 11 13:00:00 +0000 2012",
+    "2\tA\t4bf58dd8d48988d116941735\tBar\t40.7198\t-74.0025\t-240\tSun Apr 08 16:30:00 +0000 2012",
+]
+
+
+@pytest.fixture
+def raw_path(tmp_path):
+    path = tmp_path / 'checkins.txt'
+    path.write_text("\n".join(RAW_ROWS) + "\n", encoding='ISO-8859-1')
+    return str(path)
+
+
+@pytest.mark.parametrize('spill', [False, True])
+def test_streaming_build_matches_in_memory_path(raw_path, tmp_path, spill):
+    expected = feature_engineering(preprocess_data(load_data(raw_path)), CATEGORIES_PATH)
+
+    schema = build_star_schema_streaming(raw_path, CATEGORIES_PATH, chunksize=3,
+                                         spill_dir=str(tmp_path / 'facts') if spill else None)
+
+    pd.testing.assert_frame_equal(schema.to_wide(), expected)
+
+
+def test_chunk_size_respects_memory_ceiling():
+    assert chunk_rows_for(64) > chunk_rows_for(64, state_bytes=32 * 2**20)
+
+    with pytest.raises(MemoryError):
+        chunk_rows_for(64, state_bytes=64 * 2**20)
@@ -0,0 +1,40 @@
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.temporal import VisitHistogram, time_slot
+
+
+@pytest.fixture
+def checkins():
+    """Venue A is busiest on Friday evenings, venue B on Monday mornings."""
+    return pd.DataFrame({
+        'Venue_ID': ['A', 'A', 'A', 'B', 'A', 'B'],
+        'Local_Time': pd.to_datetime(['2012-04-06 21:10', '2012-04-13 21:45', '2012-04-07 13:00',
+                                      '2012-04-09 08:05', '2012-04-09 08:30', '2012-04-16 09:00']),
+    })
+
+
+def test_visit_histogram_counts_hours_of_the_week(checkins):
+    histogram = VisitHistogram(checkins)
+
+    assert histogram.counts.shape == (2, 7, 24)
+    assert histogram.counts.dtype == np.uint16
+    assert histogram.counts.sum() == len(checkins)
+    assert histogram.counts[0, 4, 21] == 2
+    assert list(histogram.peaks) == [2, 1]
+    assert histogram.nbytes == 2 * 168 * 2 + 2 * 2
+
+    positions = histogram.positions(['A', 'B', 'Z'])
+    assert list(histogram.busyness(positions, *time_slot('2012-04-20 21:00'))) == [1.0, 0.0, 0.0]
+    assert list(histogram.busyness(positions, *time_slot('2012-04-23 08:59'))) == [0.5, 1.0, 0.0]
+
+    # Counting in blocks of one venue gives the same histogram
+    blocked = VisitHistogram(checkins, max_memory_mb=1e-6)
+    np.testing.assert_array_equal(blocked.counts, histogram.counts)
@@ -0,0 +1,65 @@
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.visualization import points_to_geojson, visualize_points, _cluster_geojson, _hexbin_geojson
+
+
+@pytest.fixture
+def points():
+    rng = np.random.default_rng(0)
+    n = 20_000
+    return pd.DataFrame({
+        'Venue_ID': [f'v{i}' for i in range(n)],
+        'Category_Name': 'Bar',
+        'Latitude': rng.normal(40.73, 0.05, n),
+        'Longitude': rng.normal(-73.95, 0.06, n),
+    })
+
+
+def test_points_to_geojson(points):
+    head = points.head(3)
+    collection = json.loads(points_to_geojson(head['Latitude'], head['Longitude'], head[['Venue_ID']]))
+
+    assert [feature['properties'] for feature in collection['features']] == [{'Venue_ID': 'v0'}, {'Venue_ID': 'v1'},
+                                                                             {'Venue_ID': 'v2'}]
+    assert collection['features'][1]['geometry']['coordinates'] == pytest.approx(
+        [head['Longitude'].iloc[1], head['Latitude'].iloc[1]], abs=1e-6)
+    assert json.loads(points_to_geojson([], []))['features'] == []
+
+
+def test_aggregated_layers_stay_within_budget(points):
+    latitude, longitude = points['Latitude'].to_numpy(), points['Longitude'].to_numpy()
+    origin = (latitude.mean(), longitude.mean())
+
+    hexagons, _ = _hexbin_geojson(latitude, longitude, origin, max_features=500)
+    clusters, _ = _cluster_geojson(latitude, longitude, origin, max_features=500)
+    clusters = json.loads(clusters)
+    for collection in [hexagons, clusters]:
+        assert 0 < len(collection['features']) <= 500
+        assert sum(feature['properties']['Count'] for feature in collection['features']) == len(points)
+
+    # Over the budget, 'auto' draws hexagons instead of one circle per point
+    html = visualize_points(points, mode='auto', max_features=500).get_root().render()
+    assert '"Polygon"' in html and '"Point"' not in html
+    with pytest.raises(ValueError):
+        visualize_points(points, mode='markers')
+
+
+def test_layer_budget_is_validated(points):
+    # A single feature is reachable in every aggregated mode
+    for mode in ['hexbin', 'cluster', 'heatmap']:
+        visualize_points(points, mode=mode, max_features=1).get_root().render()
+
+    with pytest.raises(ValueError, match='at least 1'):
+        visualize_points(points, max_features=0)
+    with pytest.raises(ValueError, match="mode='auto'"):
+        visualize_points(points, mode='points', max_features=1000)
@@ -2,11 +2,13 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import pandas as pd
 from src.recommendation_point import recommend_meeting_place_random_checkins
-from src.recommendation_unvisisted import recommend_similar_category_locations
-from src.similarity import find_top_similar_users, compute_user_similarity, compute_user_profile
-from src.data_preprocessing import load_data, preprocess_data, feature_engineering
+from src.spatial_index import VenueIndex
+from src.recommendation_unvisisted import recommend_similar_category_locations, build_category_index
+from src.similarity import find_top_similar_users, compute_top_k_similarity, compute_user_profile
+from src.snapshot import load_or_build_snapshot, snapshot_key
+from src.cache import ResultCache
 
-def create_gui(data, user_similarity_df):
+def create_gui(data, user_similarity_df, venue_index=None, category_index=None, cache=None):
     root = tk.Tk()
     root.title("Recommendation System")
     root.geometry("800x600")
@@ -29,7 +31,8 @@ def create_gui(data, user_similarity_df):
             return
 
         try:
-            results = recommend_similar_category_locations(user_id, category_name, data, top_k=10)
+            results = recommend_similar_category_locations(user_id, category_name, data, top_k=10, index=category_index,
+                                                           cache=cache)
             if not isinstance(results, pd.DataFrame) or results.empty:
                 messagebox.showerror("Error", "No recommendations found.")
                 return
@@ -62,7 +65,7 @@ def create_gui(data, user_similarity_df):
             return
 
         try:
-            results = find_top_similar_users(user_id, user_similarity_df, top_n=10)
+            results = find_top_similar_users(user_id, user_similarity_df, top_n=10, cache=cache)
             if results.empty:
                 messagebox.showerror("Error", "No similar users found.")
                 return
@@ -91,7 +94,7 @@ def create_gui(data, user_similarity_df):
             return
 
         try:
-            _, results = recommend_meeting_place_random_checkins(user_ids, data, k=3)
+            _, results = recommend_meeting_place_random_checkins(user_ids, data, k=3, venue_index=venue_index)
             if not isinstance(results, pd.DataFrame) or results.empty:
                 messagebox.showerror("Error", "No meeting places found.")
                 return
@@ -118,24 +121,28 @@ def create_gui(data, user_similarity_df):
     root.mainloop()
 
 if __name__ == "__main__":
-    # Step 1: Load Data
+    # Step 1-2: Load the processed data (built once per set of input files, then memory-mapped)
     filepath = "data/dataset_NYC.zip"
-    print("Loading data...")
-    data = load_data(filepath)
-
-    # Step 2: Preprocess and Feature Engineer
-    #print("Preprocessing data...")
-    data = preprocess_data(data)
     categories_path= "data/categories.zip"
-    #print("Feature engineering...")
-    data = feature_engineering(data,categories_path)
+    print("Loading data...")
+    data = load_or_build_snapshot(filepath, categories_path)
 
     # Step 3: Compute User Profiles
     #print("Computing user profiles...")
-    user_profiles = compute_user_profile(data)
+    user_profiles = compute_user_profile(data, sparse=True)
 
     # Step 4: Compute User Similarity
     #print("Computing user similarity...")
-    user_similarity_df = compute_user_similarity(user_profiles)
+    # Keep only the top neighbours per user instead of the dense N x N matrix
+    user_similarity_df = compute_top_k_similarity(user_profiles, k=50)
+
+    # Build the venue spatial index once for all meeting-place queries
+    venue_index = VenueIndex(data)
+
+    # Build the category query index once for all unvisited-location queries
+    category_index = build_category_index(data)
+
+    # Repeated queries are answered from a cache tied to the snapshot they were computed from
+    cache = ResultCache(version=snapshot_key(filepath, categories_path))
 
-    create_gui(data,user_similarity_df)
+    create_gui(data,user_similarity_df, venue_index, category_index, cache)